@@ -0,0 +1,247 @@
+"""
+Асинхронные представления для чтения рецептов, тегов и ингредиентов.
+
+Подключаются вместо маршрутов вьюсетов при ASYNC_READ_VIEWS = True
+и работают на асинхронном ORM Django: ожидание базы данных не занимает
+поток воркера ASGI-сервера. Ответы совпадают с ответами вьюсетов,
+а запросы на запись передаются синхронным вьюсетам.
+"""
+from asgiref.sync import sync_to_async
+from django.contrib.auth.models import AnonymousUser
+from django.http import HttpResponse
+from django.views import View
+from django_filters import rest_framework as filters
+from rest_framework import exceptions
+from rest_framework.request import Request
+
+from foodgram_backend.routers import read_from_primary
+from recipes.models import Ingredient, Recipe, Tag
+from . import catalog, facets
+from .authentication import CachedTokenAuthentication
+from .filters import IngredientSearchFilter, RecipeFilterBackend
+from .paginators import PageLimitPagination
+from .renderers import ORJSONRenderer
+from .serializers import (IngredientSerializer, RecipeListSerializer,
+                          TagSerializer)
+from .views import (IngredientViewSet, RecipeViewSet, TagViewSet,
+                    query_ids, recipes_by_ids)
+
+READ_METHODS = ('GET', 'HEAD')
+
+
+class AsyncReadView(View):
+    """
+    Базовое асинхронное представление только для чтения.
+
+    GET и HEAD обрабатываются методом read, остальные методы,
+    а также запросы браузера к Browsable API и запросы с явным
+    ?format= передаются синхронному представлению sync_view.
+    """
+    sync_view = None
+    catalog = False
+    authentication_classes = [CachedTokenAuthentication]
+    renderer_class = ORJSONRenderer
+
+    @classmethod
+    def as_view(cls, **initkwargs):
+        view = super().as_view(**initkwargs)
+        # Как и у DRF: CSRF проверяется только при сессионной
+        # аутентификации, которой в API нет.
+        view.csrf_exempt = True
+        return view
+
+    @staticmethod
+    def is_async_read(request):
+        return (
+            request.method in READ_METHODS
+            and 'format' not in request.GET
+            and 'text/html' not in request.headers.get('Accept', '')
+        )
+
+    async def dispatch(self, request, *args, **kwargs):
+        if self.is_async_read(request):
+            return await self.get(request, *args, **kwargs)
+        return await sync_to_async(self.sync_view)(request, *args, **kwargs)
+
+    async def get(self, request, *args, **kwargs):
+        request = Request(
+            request,
+            authenticators=[auth() for auth in self.authentication_classes]
+        )
+        try:
+            await self.authenticate(request)
+            if self.catalog:
+                return await self.catalog_response(request, *args, **kwargs)
+            data = await self.read(request, *args, **kwargs)
+        except exceptions.APIException as exc:
+            return self.handle_exception(request, exc)
+        return self.render(data)
+
+    async def catalog_response(self, request, *args, **kwargs):
+        """Ответ справочника из кеша готовых ответов (api/catalog.py)."""
+        key = catalog.catalog_key(request, await catalog.acatalog_version())
+        response = catalog.get_response(request, key)
+        if response is None:
+            with read_from_primary():
+                data = await self.read(request, *args, **kwargs)
+            # Рендеринг и сжатие всего справочника не должны
+            # блокировать цикл событий.
+            response = await sync_to_async(
+                self.store_catalog_response, thread_sensitive=False
+            )(request, key, data)
+        return response
+
+    def store_catalog_response(self, request, key, data):
+        renderer = self.renderer_class()
+        return catalog.store_response(
+            request, key, renderer.render(data), renderer.media_type
+        )
+
+    async def read(self, request, *args, **kwargs):
+        raise NotImplementedError
+
+    @staticmethod
+    async def authenticate(request):
+        for authenticator in request.authenticators:
+            user_auth = await sync_to_async(authenticator.authenticate)(
+                request
+            )
+            if user_auth is not None:
+                request.user, request.auth = user_auth
+                return
+        request.user, request.auth = AnonymousUser(), None
+
+    def render(self, data, status=200, headers=None):
+        renderer = self.renderer_class()
+        return HttpResponse(
+            renderer.render(data),
+            status=status,
+            content_type=renderer.media_type,
+            headers=headers,
+        )
+
+    def handle_exception(self, request, exc):
+        headers = None
+        if isinstance(exc, (
+            exceptions.NotAuthenticated,
+            exceptions.AuthenticationFailed
+        )):
+            headers = {
+                'WWW-Authenticate':
+                request.authenticators[0].authenticate_header(request)
+            }
+        if isinstance(exc.detail, (list, dict)):
+            data = exc.detail
+        else:
+            data = {'detail': exc.detail}
+        return self.render(data, exc.status_code, headers)
+
+    @staticmethod
+    async def get_object(queryset, pk):
+        try:
+            return await queryset.aget(pk=pk)
+        except queryset.model.DoesNotExist:
+            raise exceptions.NotFound()
+
+
+class AsyncRecipeListView(AsyncReadView):
+    """Список рецептов."""
+    sync_view = staticmethod(
+        RecipeViewSet.as_view({'get': 'list', 'post': 'create'})
+    )
+    filterset_class = RecipeFilterBackend
+
+    async def read(self, request):
+        if 'ids' in request.query_params:
+            return await sync_to_async(recipes_by_ids)(
+                request, query_ids(request)
+            )
+        requested = facets.requested_facets(request)
+        queryset = Recipe.objects.for_user(
+            request.user, RecipeListSerializer.requested_fields(request)
+        )
+        queryset = await sync_to_async(
+            filters.DjangoFilterBackend().filter_queryset
+        )(request, queryset, self)
+        paginator = PageLimitPagination()
+        page = await paginator.apaginate_queryset(queryset, request)
+        serializer = RecipeListSerializer(
+            page, many=True, context={'request': request}
+        )
+        data = paginator.get_paginated_response(serializer.data).data
+        if 'tags' in requested:
+            data['facets'] = {
+                'tags': await sync_to_async(facets.tag_facets)(request)
+            }
+        return data
+
+
+class AsyncRecipeDetailView(AsyncReadView):
+    """Рецепт."""
+    sync_view = staticmethod(RecipeViewSet.as_view({
+        'get': 'retrieve',
+        'put': 'update',
+        'patch': 'partial_update',
+        'delete': 'destroy',
+    }))
+
+    async def read(self, request, pk):
+        recipe = await self.get_object(
+            Recipe.objects.for_user(
+                request.user, RecipeListSerializer.requested_fields(request)
+            ),
+            pk
+        )
+        return RecipeListSerializer(
+            recipe, context={'request': request}
+        ).data
+
+
+class AsyncTagListView(AsyncReadView):
+    """Список тегов."""
+    catalog = True
+    sync_view = staticmethod(TagViewSet.as_view({'get': 'list'}))
+
+    async def read(self, request):
+        return TagSerializer(
+            [tag async for tag in Tag.objects.all()], many=True
+        ).data
+
+
+class AsyncTagDetailView(AsyncReadView):
+    """Тег."""
+    catalog = True
+    sync_view = staticmethod(TagViewSet.as_view({'get': 'retrieve'}))
+
+    async def read(self, request, pk):
+        return TagSerializer(
+            await self.get_object(Tag.objects.all(), pk)
+        ).data
+
+
+class AsyncIngredientListView(AsyncReadView):
+    """Список ингредиентов с поиском по началу названия."""
+    catalog = True
+    sync_view = staticmethod(IngredientViewSet.as_view({'get': 'list'}))
+    search_fields = IngredientViewSet.search_fields
+
+    async def read(self, request):
+        queryset = IngredientSearchFilter().filter_queryset(
+            request, Ingredient.objects.all(), self
+        )
+        return IngredientSerializer(
+            [ingredient async for ingredient in queryset], many=True
+        ).data
+
+
+class AsyncIngredientDetailView(AsyncReadView):
+    """Ингредиент."""
+    catalog = True
+    sync_view = staticmethod(
+        IngredientViewSet.as_view({'get': 'retrieve'})
+    )
+
+    async def read(self, request, pk):
+        return IngredientSerializer(
+            await self.get_object(Ingredient.objects.all(), pk)
+        ).data
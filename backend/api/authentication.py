@@ -0,0 +1,70 @@
+"""
+Модуль настройки аутентификации.
+"""
+import hashlib
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.authtoken.models import Token
+from rest_framework.exceptions import AuthenticationFailed
+
+from foodgram_backend.constants import AUTH_TOKEN_CACHE_TTL
+
+
+def token_cache_key(key) -> str:
+    """Ключ кеша для токена; сам токен в ключ не попадает."""
+    return 'auth-token:' + hashlib.sha256(key.encode()).hexdigest()
+
+
+def invalidate_tokens(*keys):
+    """Удаляет из кеша записи для переданных токенов."""
+    cache.delete_many([token_cache_key(key) for key in keys])
+
+
+def invalidate_user_tokens(user):
+    """Удаляет из кеша записи по всем токенам пользователя."""
+    invalidate_tokens(
+        *Token.objects.filter(user=user).values_list('key', flat=True)
+    )
+
+
+def token_user(user_id):
+    """
+    Пользователь, у которого загружен только первичный ключ.
+
+    Остальные поля читаются из базы при первом обращении, а save()
+    записывает только загруженные и изменённые поля: смена пароля
+    не перезапишет профиль устаревшими данными.
+    """
+    return get_user_model().from_db(DEFAULT_DB_ALIAS, ['id'], [user_id])
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """
+    TokenAuthentication, который хранит в кеше с коротким временем
+    жизни только пару (id пользователя, is_active) для токена.
+
+    Запрос с закешированным токеном не обращается к базе данных, пока
+    вью не прочитает поля пользователя. Записи удаляются после коммита
+    при удалении токена (logout), сохранении пользователя (смена
+    пароля, is_active) и его удалении, см. api/signals.py.
+    """
+
+    def authenticate_credentials(self, key):
+        cache_key = token_cache_key(key)
+        cached = cache.get(cache_key)
+        if cached is None:
+            user, token = super().authenticate_credentials(key)
+            cache.set(
+                cache_key, (user.pk, user.is_active), AUTH_TOKEN_CACHE_TTL
+            )
+            return user, token
+        user_id, is_active = cached
+        if not is_active:
+            raise AuthenticationFailed(
+                'Пользователь неактивен или удалён.'
+            )
+        user = token_user(user_id)
+        return user, self.get_model()(key=key, user=user)
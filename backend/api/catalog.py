@@ -0,0 +1,118 @@
+"""
+Кеш готовых ответов справочников: тегов и ингредиентов.
+
+Справочники меняются только через админку и команды загрузки, поэтому
+тело ответа рендерится и сжимается один раз, а затем отдаётся из памяти
+процесса. Ключ включает версию справочников из общего кеша: сохранение
+или удаление тега либо ингредиента увеличивает её (api/signals.py),
+и все воркеры перестают использовать старые ответы. Ответ для кеша
+строится по основной базе: реплика может отставать от изменения,
+которое сменило версию.
+"""
+import threading
+from collections import OrderedDict
+
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.utils.cache import patch_vary_headers
+
+from foodgram_backend.compression import choose_encoding, compress
+from foodgram_backend.constants import (BROTLI_CATALOG_QUALITY,
+                                        CATALOG_CACHE_MAX_ENTRIES,
+                                        COMPRESSION_MIN_LENGTH,
+                                        GZIP_CATALOG_LEVEL,
+                                        TAG_SLUGS_CACHE_TTL)
+from foodgram_backend.routers import read_from_primary
+from recipes.models import Tag
+
+CATALOG_VERSION_KEY = 'catalog-version'
+TAG_SLUGS_KEY = 'tag-slugs:{}'
+CATALOG_LEVELS = {'br': BROTLI_CATALOG_QUALITY, 'gzip': GZIP_CATALOG_LEVEL}
+
+_entries = OrderedDict()
+_lock = threading.Lock()
+_version = 0
+
+
+def catalog_version() -> int:
+    return cache.get_or_set(CATALOG_VERSION_KEY, 0, None)
+
+
+async def acatalog_version() -> int:
+    return await cache.aget_or_set(CATALOG_VERSION_KEY, 0, None)
+
+
+def bump_catalog_version():
+    """Делает недействительными ответы справочников во всех воркерах."""
+    try:
+        cache.incr(CATALOG_VERSION_KEY)
+    except ValueError:
+        cache.set(CATALOG_VERSION_KEY, 1, None)
+
+
+def tag_slugs() -> dict:
+    """
+    Идентификаторы тегов по slug для фильтра рецептов. Хранятся
+    в общем кеше под текущей версией справочников.
+    """
+    key = TAG_SLUGS_KEY.format(catalog_version())
+    slugs = cache.get(key)
+    if slugs is None:
+        slugs = {}
+        with read_from_primary():
+            for pk, slug in Tag.objects.values_list('id', 'slug'):
+                slugs.setdefault(slug, []).append(pk)
+        cache.set(key, slugs, TAG_SLUGS_CACHE_TTL)
+    return slugs
+
+
+def catalog_key(request, version) -> tuple:
+    """Ключ ответа: версия, путь и параметры запроса без учёта порядка."""
+    return (
+        version,
+        request.path,
+        tuple(sorted((key, tuple(values))
+                     for key, values in request.GET.lists())),
+    )
+
+
+def _response(request, entry):
+    encoding = choose_encoding(request.META.get('HTTP_ACCEPT_ENCODING'))
+    body = entry['identity']
+    if encoding is None or len(body) < COMPRESSION_MIN_LENGTH:
+        encoding = 'identity'
+    elif encoding not in entry:
+        # Гонка двух запросов лишь сожмёт тело дважды.
+        entry[encoding] = compress(body, encoding, CATALOG_LEVELS[encoding])
+
+    response = HttpResponse(entry[encoding], entry['content_type'])
+    response.headers['Content-Length'] = str(len(entry[encoding]))
+    if encoding != 'identity':
+        response.headers['Content-Encoding'] = encoding
+    patch_vary_headers(response, ('Accept-Encoding',))
+    return response
+
+
+def get_response(request, key):
+    """Готовый ответ из кеша или None."""
+    with _lock:
+        entry = _entries.get(key)
+        if entry is None:
+            return None
+        _entries.move_to_end(key)
+    return _response(request, entry)
+
+
+def store_response(request, key, body, content_type):
+    """Сохраняет отрендеренное тело ответа и возвращает ответ."""
+    global _version
+
+    entry = {'identity': body, 'content_type': content_type}
+    with _lock:
+        if key[0] != _version:
+            _entries.clear()
+            _version = key[0]
+        _entries[key] = entry
+        while len(_entries) > CATALOG_CACHE_MAX_ENTRIES:
+            _entries.popitem(last=False)
+    return _response(request, entry)
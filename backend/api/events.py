@@ -0,0 +1,416 @@
+"""
+Поток событий (Server-Sent Events) о новых рецептах авторов,
+на которых подписан пользователь.
+
+Поток отдаёт ASGI-приложение EventStreamApp, которое стоит перед
+Django (foodgram_backend/asgi.py): долгое соединение не проходит через
+промежуточные слои и не держит поток воркера, а отключение клиента
+видно сразу по сообщению http.disconnect.
+
+Каждый воркер один раз в EVENTS_POLL_SECONDS читает из журнала
+RecipeChange новые записи о создании рецептов — журнал заменяет
+брокер сообщений между воркерами — и раскладывает готовые события
+по очередям подписчиков автора в памяти процесса. Опрос идёт, только
+пока у воркера есть соединения.
+
+Очередь каждого соединения ограничена EVENTS_QUEUE_SIZE: медленный
+клиент, который не успевает читать, получает оставшиеся события,
+и соединение закрывается. Клиент переподключается с заголовком
+Last-Event-ID (id события — позиция записи журнала, см.
+RecipeChangeQuerySet) и получает пропущенное из журнала; если
+пропущено больше EVENTS_REPLAY_MAX_SIZE, приходит событие reset,
+и ленту нужно загрузить заново.
+Без событий раз в EVENTS_HEARTBEAT_SECONDS отправляется комментарий,
+чтобы прокси не закрывали простаивающее соединение. Подписки
+пользователей воркер перечитывает одним запросом раз
+в EVENTS_FOLLOWS_REFRESH_SECONDS, поэтому подписка на автора
+и отписка действуют без переподключения.
+"""
+import asyncio
+import json
+import logging
+import time
+from collections import defaultdict, namedtuple
+
+from asgiref.sync import sync_to_async
+from django.db import DatabaseError, close_old_connections
+from rest_framework.exceptions import AuthenticationFailed
+
+from foodgram_backend.constants import (EVENTS_FOLLOWS_REFRESH_SECONDS,
+                                        EVENTS_HEARTBEAT_SECONDS,
+                                        EVENTS_MAX_CONNECTIONS,
+                                        EVENTS_POLL_SECONDS,
+                                        EVENTS_QUEUE_SIZE,
+                                        EVENTS_REPLAY_MAX_SIZE,
+                                        EVENTS_RETRY_MILLISECONDS)
+from recipes.models import Recipe, RecipeChange
+from users.models import Subscription
+from .authentication import CachedTokenAuthentication
+
+logger = logging.getLogger('foodgram.events')
+
+EVENTS_PATH = '/api/recipes/stream/'
+HEARTBEAT = b': ping\n\n'
+RESET = b'event: reset\ndata: {}\n\n'
+STREAM_HEADERS = [
+    (b'content-type', b'text/event-stream; charset=utf-8'),
+    (b'cache-control', b'no-cache'),
+    # nginx не должен буферизовать поток.
+    (b'x-accel-buffering', b'no'),
+]
+
+Event = namedtuple('Event', ('id', 'author_id', 'data'))
+
+
+def encode_event(position, recipe):
+    data = json.dumps(
+        {
+            'id': recipe['id'],
+            'name': recipe['name'],
+            'author': recipe['author_id'],
+        },
+        ensure_ascii=False,
+    )
+    cursor = RecipeChange.cursor(position)
+    return f'id: {cursor}\nevent: recipe\ndata: {data}\n\n'.encode()
+
+
+def recipe_events(changes):
+    """
+    События по записям журнала (txid, id записи, id рецепта).
+    Рецепты, удалённые до отправки события, пропускаются.
+    """
+    recipes = {
+        recipe['id']: recipe
+        for recipe in Recipe.objects
+        .filter(id__in=[recipe_id for _, _, recipe_id in changes])
+        .values('id', 'name', 'author_id')
+    }
+    return [
+        Event(
+            (txid, change_id),
+            recipes[recipe_id]['author_id'],
+            encode_event((txid, change_id), recipes[recipe_id]),
+        )
+        for txid, change_id, recipe_id in changes
+        if recipe_id in recipes
+    ]
+
+
+def latest_position():
+    close_old_connections()
+    return RecipeChange.objects.last_position()
+
+
+def created_after(position):
+    """Записи о создании рецептов после позиции журнала."""
+    return (
+        RecipeChange.objects.committed()
+        .after(position)
+        .filter(action=RecipeChange.CREATED)
+    )
+
+
+def poll_changes(cursor):
+    """
+    Новые события после позиции cursor. Журнал отдаёт только записи
+    завершённых транзакций, поэтому курсор ничего не перескакивает.
+
+    Returns:
+        tuple: События и новая позиция.
+    """
+    close_old_connections()
+    changes = list(
+        created_after(cursor).values_list('txid', 'id', 'recipe_id')
+    )
+    if changes:
+        cursor = changes[-1][:2]
+    return recipe_events(changes), cursor
+
+
+def replay(author_ids, position):
+    """
+    Пропущенные клиентом события из журнала.
+
+    Returns:
+        list | None: События по порядку или None, если их больше
+        EVENTS_REPLAY_MAX_SIZE.
+    """
+    close_old_connections()
+    changes = list(
+        created_after(position)
+        .filter(
+            recipe_id__in=Recipe.objects
+            .filter(author_id__in=author_ids)
+            .values('id'),
+        )
+        .values_list('txid', 'id', 'recipe_id')
+        [:EVENTS_REPLAY_MAX_SIZE + 1]
+    )
+    if len(changes) > EVENTS_REPLAY_MAX_SIZE:
+        return None
+    return recipe_events(changes)
+
+
+def authenticate(authorization):
+    """
+    Пользователь по заголовку Authorization: Token <ключ>.
+
+    Returns:
+        CustomUser | None: Пользователь или None без токена.
+    """
+    keyword, _, key = authorization.partition(' ')
+    if keyword.lower() != CachedTokenAuthentication.keyword.lower():
+        return None
+    if not key.strip() or ' ' in key.strip():
+        raise AuthenticationFailed('Недопустимый заголовок токена.')
+    user, _ = CachedTokenAuthentication().authenticate_credentials(
+        key.strip()
+    )
+    return user
+
+
+def followed_authors(user_ids):
+    """Авторы, на которых подписан каждый из пользователей user_ids."""
+    close_old_connections()
+    follows = defaultdict(set)
+    for user_id, author_id in (
+        Subscription.objects.filter(user_id__in=user_ids)
+        .values_list('user_id', 'following_id')
+        .iterator()
+    ):
+        follows[user_id].add(author_id)
+    return {user_id: frozenset(follows[user_id]) for user_id in user_ids}
+
+
+class Subscriber:
+    """
+    Соединение пользователя user_id с очередью событий от авторов
+    author_ids. После отключения от рассылки (active = False)
+    соединение дочитывает очередь и закрывается.
+    """
+    __slots__ = ('user_id', 'author_ids', 'queue', 'active')
+
+    def __init__(self, user_id, author_ids):
+        self.user_id = user_id
+        self.author_ids = author_ids
+        self.queue = asyncio.Queue(EVENTS_QUEUE_SIZE)
+        self.active = False
+
+
+class Hub:
+    """
+    Подписчики текущего процесса по авторам и опрос журнала изменений.
+    """
+
+    def __init__(self):
+        self.subscribers = defaultdict(set)
+        self.members = set()
+        self.poller = None
+
+    @property
+    def connections(self):
+        return len(self.members)
+
+    def subscribe(self, subscriber):
+        subscriber.active = True
+        self.members.add(subscriber)
+        self.follow(subscriber, subscriber.author_ids)
+        if self.poller is None or self.poller.done():
+            self.poller = asyncio.create_task(self.poll())
+
+    def unsubscribe(self, subscriber):
+        if not subscriber.active:
+            return
+        subscriber.active = False
+        self.members.discard(subscriber)
+        self.unfollow(subscriber, subscriber.author_ids)
+
+    def follow(self, subscriber, author_ids):
+        for author_id in author_ids:
+            self.subscribers[author_id].add(subscriber)
+
+    def unfollow(self, subscriber, author_ids):
+        for author_id in author_ids:
+            subscribers = self.subscribers[author_id]
+            subscribers.discard(subscriber)
+            if not subscribers:
+                del self.subscribers[author_id]
+
+    def resubscribe(self, subscriber, author_ids):
+        """Переводит подписчика на новый набор авторов."""
+        if not subscriber.active:
+            return
+        self.unfollow(subscriber, subscriber.author_ids - author_ids)
+        self.follow(subscriber, author_ids - subscriber.author_ids)
+        subscriber.author_ids = author_ids
+
+    async def refresh(self):
+        """Перечитывает подписки пользователей всех соединений."""
+        members = list(self.members)
+        follows = await sync_to_async(followed_authors)(
+            {subscriber.user_id for subscriber in members}
+        )
+        for subscriber in members:
+            self.resubscribe(subscriber, follows[subscriber.user_id])
+
+    def publish(self, events):
+        """
+        Раскладывает события по очередям. Подписчик с заполненной
+        очередью отключается от рассылки.
+        """
+        for event in events:
+            for subscriber in tuple(self.subscribers.get(event.author_id, ())):
+                try:
+                    subscriber.queue.put_nowait(event)
+                except asyncio.QueueFull:
+                    self.unsubscribe(subscriber)
+
+    async def poll(self):
+        cursor = await sync_to_async(latest_position)()
+        refreshed = time.monotonic()
+        while self.connections:
+            await asyncio.sleep(EVENTS_POLL_SECONDS)
+            try:
+                if (
+                    time.monotonic() - refreshed
+                    >= EVENTS_FOLLOWS_REFRESH_SECONDS
+                ):
+                    await self.refresh()
+                    refreshed = time.monotonic()
+                events, cursor = await sync_to_async(poll_changes)(cursor)
+            except DatabaseError:
+                logger.exception('Не удалось прочитать журнал изменений')
+                continue
+            self.publish(events)
+
+
+hub = Hub()
+
+
+async def wait_disconnect(receive):
+    while (await receive())['type'] != 'http.disconnect':
+        pass
+
+
+class EventStreamApp:
+    """
+    ASGI-приложение: поток событий по адресу EVENTS_PATH,
+    остальные запросы передаются приложению application.
+    """
+
+    def __init__(self, application, hub=hub):
+        self.application = application
+        self.hub = hub
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'http' and scope['path'] == EVENTS_PATH:
+            return await self.handle(scope, receive, send)
+        return await self.application(scope, receive, send)
+
+    @staticmethod
+    async def respond(send, status, detail, headers=()):
+        await send({
+            'type': 'http.response.start',
+            'status': status,
+            'headers': [
+                (b'content-type', b'application/json'),
+                *headers,
+            ],
+        })
+        await send({
+            'type': 'http.response.body',
+            'body': json.dumps(
+                {'detail': detail}, ensure_ascii=False
+            ).encode(),
+        })
+
+    async def handle(self, scope, receive, send):
+        if scope['method'] != 'GET':
+            return await self.respond(
+                send, 405, f'Метод "{scope["method"]}" не разрешен.',
+                [(b'allow', b'GET')],
+            )
+        headers = {
+            name.decode('latin1').lower(): value.decode('latin1')
+            for name, value in scope['headers']
+        }
+        try:
+            user = await sync_to_async(authenticate)(
+                headers.get('authorization', '')
+            )
+        except AuthenticationFailed as exc:
+            user, detail = None, str(exc.detail)
+        else:
+            detail = 'Учетные данные не были предоставлены.'
+        if user is None:
+            return await self.respond(
+                send, 401, detail, [(b'www-authenticate', b'Token')]
+            )
+        if self.hub.connections >= EVENTS_MAX_CONNECTIONS:
+            return await self.respond(
+                send, 503, 'Слишком много подключений.',
+                [(b'retry-after', str(EVENTS_HEARTBEAT_SECONDS).encode())],
+            )
+
+        follows = await sync_to_async(followed_authors)({user.id})
+        subscriber = Subscriber(user.id, follows[user.id])
+        self.hub.subscribe(subscriber)
+        writer = asyncio.ensure_future(
+            self.write(send, subscriber, headers.get('last-event-id'))
+        )
+        watcher = asyncio.ensure_future(wait_disconnect(receive))
+        try:
+            done, _ = await asyncio.wait(
+                (writer, watcher), return_when=asyncio.FIRST_COMPLETED
+            )
+        finally:
+            writer.cancel()
+            watcher.cancel()
+            self.hub.unsubscribe(subscriber)
+        if writer in done:
+            writer.result()
+
+    async def write(self, send, subscriber, last_event_id):
+        await send({
+            'type': 'http.response.start',
+            'status': 200,
+            'headers': STREAM_HEADERS,
+        })
+        await self.send_body(
+            send, f'retry: {EVENTS_RETRY_MILLISECONDS}\n\n'.encode()
+        )
+        # Позиция последнего события, которое клиент уже получил.
+        # Журнал отдаёт записи по возрастанию позиций, поэтому события
+        # из очереди до неё — повторы отправленного из журнала.
+        seen = last_event_id and RecipeChange.parse_cursor(last_event_id)
+        if seen:
+            missed = await sync_to_async(replay)(
+                subscriber.author_ids, seen
+            )
+            if missed is None:
+                await self.send_body(send, RESET)
+            for event in missed or ():
+                await self.send_body(send, event.data)
+                seen = event.id
+
+        while subscriber.active or not subscriber.queue.empty():
+            try:
+                event = await asyncio.wait_for(
+                    subscriber.queue.get(), EVENTS_HEARTBEAT_SECONDS
+                )
+            except asyncio.TimeoutError:
+                await self.send_body(send, HEARTBEAT)
+                continue
+            if seen and event.id <= seen:
+                continue
+            await self.send_body(send, event.data)
+        await send({'type': 'http.response.body'})
+
+    @staticmethod
+    async def send_body(send, body):
+        await send({
+            'type': 'http.response.body',
+            'body': body,
+            'more_body': True,
+        })
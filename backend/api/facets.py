@@ -0,0 +1,115 @@
+"""
+Счётчики рецептов по тегам (фасеты) для списка рецептов.
+
+Для каждого тега считается, сколько рецептов попадёт в выдачу при
+текущих фильтрах, кроме фильтра по тегам и сортировки. Счётчики
+вычисляются одним сгруппированным запросом и кешируются по
+нормализованному набору фильтров. Ключ включает версию фасетов,
+которую увеличивает создание, изменение и удаление рецептов, и версию
+справочников, которую увеличивает изменение тегов. Фасеты
+с фильтрами по избранному и списку покупок зависят от пользователя и
+не кешируются: запрос идёт по его небольшому списку рецептов.
+"""
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count
+from rest_framework.exceptions import ValidationError
+
+from foodgram_backend.constants import FACETS_CACHE_TTL
+from foodgram_backend.routers import read_from_primary
+from recipes.models import Recipe
+from .catalog import catalog_version, tag_slugs
+from .filters import RecipeFilterBackend
+
+FACETS_VERSION_KEY = 'recipe-facets-version'
+FACETS_KEY = 'recipe-facets:{}:{}:{}'
+FACETS = ('tags',)
+FACET_FILTERS = ('author', 'cooking_time__gte', 'cooking_time__lte')
+USER_FILTERS = ('is_favorited', 'is_in_shopping_cart')
+
+
+def requested_facets(request) -> set:
+    """Имена фасетов из параметра ?facets= (через запятую)."""
+    facets = {
+        name.strip()
+        for name in request.query_params.get('facets', '').split(',')
+        if name.strip()
+    }
+    unknown = facets - set(FACETS)
+    if unknown:
+        raise ValidationError(
+            {'facets': f'Неизвестные фасеты: {", ".join(sorted(unknown))}'}
+        )
+    return facets
+
+
+def bump_facets_version():
+    """Делает недействительными закешированные фасеты."""
+    try:
+        cache.incr(FACETS_VERSION_KEY)
+    except ValueError:
+        cache.set(FACETS_VERSION_KEY, 1, None)
+
+
+def recipes_changed():
+    """Сбрасывает фасеты после коммита транзакции."""
+    transaction.on_commit(bump_facets_version)
+
+
+def count_tags(filterset) -> list:
+    counts = dict(
+        Recipe.tags.through.objects
+        .filter(recipe__in=filterset.qs.values('pk'))
+        .order_by()
+        .values('tag_id')
+        .annotate(total=Count('recipe_id'))
+        .values_list('tag_id', 'total')
+    )
+    return [
+        {'slug': slug, 'count': sum(counts.get(pk, 0) for pk in ids)}
+        for slug, ids in sorted(tag_slugs().items())
+    ]
+
+
+def tag_facets(request) -> list:
+    """
+    Количество рецептов с каждым тегом при остальных фильтрах запроса.
+
+    Returns:
+        list: Словари со slug тега и количеством рецептов.
+    """
+    filterset = RecipeFilterBackend(
+        data={
+            name: request.query_params[name]
+            for name in FACET_FILTERS + USER_FILTERS
+            if name in request.query_params
+        },
+        queryset=Recipe.objects.all(),
+        request=request,
+    )
+    if not filterset.is_valid():
+        raise ValidationError(filterset.errors)
+    cleaned = filterset.form.cleaned_data
+    if request.user.is_authenticated and any(
+        cleaned.get(name) for name in USER_FILTERS
+    ):
+        return count_tags(filterset)
+
+    params = sorted(
+        (name, str(getattr(cleaned[name], 'pk', cleaned[name])))
+        for name in FACET_FILTERS
+        if cleaned.get(name) is not None
+    )
+    key = FACETS_KEY.format(
+        catalog_version(),
+        cache.get_or_set(FACETS_VERSION_KEY, 0, None),
+        '&'.join(f'{name}={value}' for name, value in params),
+    )
+    facets = cache.get(key)
+    if facets is None:
+        # Счётчики сохраняются под новой версией, а реплика может ещё
+        # не получить изменение, которое её сменило.
+        with read_from_primary():
+            facets = count_tags(filterset)
+        cache.set(key, facets, FACETS_CACHE_TTL)
+    return facets
@@ -1,11 +1,19 @@
 """
 Настройки фильтрации.
 """
+from django.db.models import Exists, OuterRef
 from django_filters.rest_framework import FilterSet
 from django_filters.rest_framework import filters as djangofilters
 from rest_framework.filters import SearchFilter
 
 from recipes.models import Ingredient, Recipe
+from .catalog import tag_slugs
+
+RECIPE_ORDERINGS = {
+    'newest': ('-pub_date',),
+    'popular': ('-favorites_count', '-pub_date'),
+    'quickest': ('cooking_time', '-pub_date'),
+}
 
 
 class IngredientSearchFilter(SearchFilter):
@@ -39,8 +47,12 @@ class RecipeFilterBackend(FilterSet):
         is_favorited (NumberFilter): Filter for favorited recipes.
         is_in_shopping_cart (NumberFilter): Filter for recipes
             in shopping cart.
-        tags (AllValuesMultipleFilter): Filter for recipes
-            with specific tags.
+        tags (MultipleChoiceFilter): Filter for recipes with any of
+            the given tag slugs. Choices come from the cached tag slugs.
+        cooking_time__gte (NumberFilter): Minimum cooking time.
+        cooking_time__lte (NumberFilter): Maximum cooking time.
+        ordering (ChoiceFilter): Sort order, one of `RECIPE_ORDERINGS`.
+            Each order matches a composite index on `Recipe`.
 
     Meta:
         model (class): The model class to filter.
@@ -52,6 +64,9 @@ class RecipeFilterBackend(FilterSet):
         authenticated user.
         get_favorite_recipes(queryset, name, value): Filters the queryset
         based on whether the recipes are favorited by the authenticated user.
+        filter_tags(queryset, name, value): Filters the queryset by tag
+        slugs with an EXISTS subquery.
+        order_recipes(queryset, name, value): Orders the queryset.
 
     """
 
@@ -61,8 +76,21 @@ class RecipeFilterBackend(FilterSet):
     is_in_shopping_cart = djangofilters.NumberFilter(
         method='get_is_in_shopping_cart'
     )
-    tags = djangofilters.AllValuesMultipleFilter(
-        field_name='tags__slug'
+    tags = djangofilters.MultipleChoiceFilter(
+        choices=lambda: [(slug, slug) for slug in sorted(tag_slugs())],
+        method='filter_tags'
+    )
+    cooking_time__gte = djangofilters.NumberFilter(
+        field_name='cooking_time',
+        lookup_expr='gte'
+    )
+    cooking_time__lte = djangofilters.NumberFilter(
+        field_name='cooking_time',
+        lookup_expr='lte'
+    )
+    ordering = djangofilters.ChoiceFilter(
+        choices=[(name, name) for name in RECIPE_ORDERINGS],
+        method='order_recipes'
     )
 
     class Meta:
@@ -71,7 +99,10 @@ class RecipeFilterBackend(FilterSet):
             'author',
             'is_favorited',
             'is_in_shopping_cart',
-            'tags'
+            'tags',
+            'cooking_time__gte',
+            'cooking_time__lte',
+            'ordering',
         )
 
     def get_is_in_shopping_cart(self, queryset, name, value) -> any:
@@ -113,3 +144,44 @@ class RecipeFilterBackend(FilterSet):
                 favorite_recipes__user=self.request.user
             )
         return queryset
+
+    def filter_tags(self, queryset, name, value) -> any:
+        """
+        Filters the queryset to recipes having any of the given tags.
+
+        The tag condition is an EXISTS subquery on the recipe-tag table,
+        so a recipe with several matching tags is returned once and no
+        DISTINCT is needed.
+
+        Args:
+            self: The instance of the filter backend.
+            queryset: The queryset to filter.
+            name: The name of the filter.
+            value: The list of tag slugs.
+
+        Returns:
+            QuerySet: The filtered queryset.
+        """
+        slugs = tag_slugs()
+        return queryset.filter(Exists(
+            Recipe.tags.through.objects.filter(
+                recipe=OuterRef('pk'),
+                tag_id__in=[pk for slug in value for pk in slugs.get(slug, ())]
+            )
+        ))
+
+    def order_recipes(self, queryset, name, value) -> any:
+        """
+        Orders the queryset: newest first, most favorited first
+        or quickest to cook first, newest first among equals.
+
+        Args:
+            self: The instance of the filter backend.
+            queryset: The queryset to filter.
+            name: The name of the filter.
+            value: The key of `RECIPE_ORDERINGS`.
+
+        Returns:
+            QuerySet: The ordered queryset.
+        """
+        return queryset.order_by(*RECIPE_ORDERINGS[value])
@@ -0,0 +1,180 @@
+"""
+Инвертированный индекс «ингредиент → рецепты» для поиска рецептов
+по имеющимся продуктам.
+
+Каждый процесс держит в памяти для каждого ингредиента отсортированный
+массив numpy с идентификаторами рецептов и массив с количеством
+ингредиентов в каждом рецепте. Запрос считает совпадения одним
+np.bincount по объединению массивов выбранных ингредиентов, поэтому
+не обращается к RecipeIngredient.
+
+Изменения рецептов публикуются в общем кеше: номер версии индекса и
+идентификаторы изменённых рецептов под номерами изменений. Воркер,
+отставший от версии, перечитывает из базы только изменённые рецепты;
+если изменений слишком много или часть уже вытеснена из кеша,
+индекс строится заново.
+"""
+import threading
+from collections import defaultdict
+
+import numpy as np
+from django.core.cache import cache
+from django.db import transaction
+
+from foodgram_backend.constants import (INGREDIENT_INDEX_CHANGES_TTL,
+                                        INGREDIENT_INDEX_MAX_DELTA)
+from foodgram_backend.routers import read_from_primary
+from recipes.models import RecipeIngredient
+
+VERSION_KEY = 'ingredient-index-version'
+CHANGE_KEY = 'ingredient-index-change:{}'
+
+EMPTY = np.zeros(0, dtype=np.int64)
+
+
+class IngredientIndex:
+    """Индекс одного процесса."""
+
+    def __init__(self):
+        self.version = None
+        # Снимок (postings, sizes) заменяется целиком, поэтому чтение
+        # идёт без блокировки.
+        self.state = ({}, EMPTY)
+        self.lock = threading.Lock()
+
+    def sync(self):
+        """Приводит индекс к версии из общего кеша, возвращает снимок."""
+        version = cache.get_or_set(VERSION_KEY, 0, None)
+        if version == self.version:
+            return self.state
+        # Индекс помечается версией, поэтому читается с основной базы:
+        # отставшая реплика оставила бы старые ингредиенты до полной
+        # перестройки.
+        with self.lock, read_from_primary():
+            if version == self.version:
+                return self.state
+            if (
+                self.version is None
+                or not 0 < version - self.version <= INGREDIENT_INDEX_MAX_DELTA
+            ):
+                self.build()
+            else:
+                keys = [
+                    CHANGE_KEY.format(number)
+                    for number in range(self.version + 1, version + 1)
+                ]
+                changes = cache.get_many(keys)
+                if len(changes) < len(keys):
+                    self.build()
+                else:
+                    self.apply(set(changes.values()))
+            self.version = version
+        return self.state
+
+    def build(self):
+        """Строит индекс по всем рецептам."""
+        pairs = np.fromiter(
+            (
+                value
+                for pair in RecipeIngredient.objects
+                .order_by('ingredient_id', 'recipe_id')
+                .values_list('ingredient_id', 'recipe_id')
+                .iterator()
+                for value in pair
+            ),
+            dtype=np.int64,
+        ).reshape(-1, 2)
+        ingredients, recipes = pairs[:, 0], pairs[:, 1]
+        keys, starts = np.unique(ingredients, return_index=True)
+        postings = {
+            int(key): np.unique(posting)
+            for key, posting in zip(keys, np.split(recipes, starts[1:]))
+        }
+        self.state = (postings, np.bincount(recipes))
+
+    def apply(self, recipe_ids):
+        """Перечитывает из базы ингредиенты изменённых рецептов."""
+        postings, sizes = self.state
+        postings = dict(postings)
+        changed = np.array(sorted(recipe_ids), dtype=np.int64)
+        added = defaultdict(list)
+        for ingredient_id, recipe_id in (
+            RecipeIngredient.objects
+            .filter(recipe_id__in=recipe_ids)
+            .values_list('ingredient_id', 'recipe_id')
+        ):
+            added[ingredient_id].append(recipe_id)
+
+        known = changed[changed < len(sizes)]
+        known = known[sizes[known] > 0]
+        if known.size:
+            for ingredient_id, posting in postings.items():
+                kept = np.setdiff1d(posting, known, assume_unique=True)
+                if kept.size != posting.size:
+                    postings[ingredient_id] = kept
+
+        sizes = np.pad(sizes, (0, max(0, changed[-1] + 1 - len(sizes))))
+        sizes[changed] = 0
+        for ingredient_id, ids in added.items():
+            ids = np.array(ids, dtype=np.int64)
+            postings[ingredient_id] = np.union1d(
+                postings.get(ingredient_id, EMPTY), ids
+            )
+            np.add.at(sizes, ids, 1)
+        self.state = (postings, sizes)
+
+    def match(self, include, exclude=()):
+        """
+        Рецепты, в которых есть хотя бы один из ингредиентов include и
+        нет ни одного из exclude.
+
+        Сортировка: доля имеющихся ингредиентов рецепта по убыванию,
+        затем число совпавших ингредиентов, затем более новые рецепты.
+
+        Returns:
+            tuple: Массивы идентификаторов рецептов, числа совпавших
+            и числа недостающих ингредиентов.
+        """
+        postings, sizes = self.sync()
+        included = [postings[pk] for pk in include if pk in postings]
+        if not included:
+            return EMPTY, EMPTY, EMPTY
+        counts = np.bincount(np.concatenate(included), minlength=len(sizes))
+        excluded = [postings[pk] for pk in exclude if pk in postings]
+        if excluded:
+            counts[np.concatenate(excluded)] = 0
+
+        ids = np.flatnonzero(counts)
+        matched = counts[ids]
+        missing = sizes[ids] - matched
+        order = np.lexsort((-ids, -matched, -(matched / sizes[ids])))
+        return ids[order], matched[order], missing[order]
+
+
+index = IngredientIndex()
+
+
+def publish(recipe_ids):
+    """Сообщает всем воркерам об изменении ингредиентов рецептов."""
+    recipe_ids = list(recipe_ids)
+    if not recipe_ids:
+        return
+    try:
+        version = cache.incr(VERSION_KEY, len(recipe_ids))
+    except ValueError:
+        version = len(recipe_ids)
+        cache.set(VERSION_KEY, version, None)
+    first = version - len(recipe_ids) + 1
+    cache.set_many(
+        {
+            CHANGE_KEY.format(first + number): recipe_id
+            for number, recipe_id in enumerate(recipe_ids)
+        },
+        INGREDIENT_INDEX_CHANGES_TTL,
+    )
+
+
+def recipes_changed(recipe_ids):
+    """Публикует изменения рецептов после коммита транзакции."""
+    recipe_ids = list(recipe_ids)
+    transaction.on_commit(lambda: publish(recipe_ids))
@@ -0,0 +1,123 @@
+"""
+Команда нагрузочного сравнения эндпоинтов API.
+"""
+import statistics
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from django.core.management.base import BaseCommand
+
+DEFAULT_PATHS = (
+    '/api/recipes/',
+    '/api/recipes/?limit=6&page=2',
+    '/api/tags/',
+    '/api/ingredients/?name=мол',
+)
+
+
+class Command(BaseCommand):
+    """
+    Отправляет запросы на чтение к одному или нескольким запущенным
+    серверам и сравнивает пропускную способность и задержки.
+
+    Пример: сервер WSGI на :8000 и ASGI на :8001
+        python manage.py benchmark_api --url http://127.0.0.1:8000 \\
+            --url http://127.0.0.1:8001 --concurrency 200
+    """
+    help = 'Сравнивает пропускную способность API при высокой конкуренции'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--url',
+            action='append',
+            help='Адрес сервера; можно указать несколько для сравнения',
+        )
+        parser.add_argument(
+            '--path',
+            action='append',
+            help='Путь запроса; по умолчанию рецепты, теги и ингредиенты',
+        )
+        parser.add_argument(
+            '--requests',
+            type=int,
+            default=2000,
+            help='Количество запросов к каждому серверу',
+        )
+        parser.add_argument(
+            '--concurrency',
+            type=int,
+            default=100,
+            help='Количество одновременных клиентов',
+        )
+        parser.add_argument(
+            '--token',
+            help='Токен для заголовка Authorization',
+        )
+
+    def handle(self, *args, **options):
+        urls = options['url'] or ['http://127.0.0.1:8000']
+        paths = options['path'] or DEFAULT_PATHS
+        headers = {}
+        if options['token']:
+            headers['Authorization'] = f'Token {options["token"]}'
+
+        results = []
+        for url in urls:
+            result = self.run(
+                url.rstrip('/'),
+                paths,
+                headers,
+                options['requests'],
+                options['concurrency'],
+            )
+            results.append(result)
+            self.report(url, result, results[0])
+
+    @staticmethod
+    def run(url, paths, headers, total, concurrency):
+        local = threading.local()
+
+        def fetch(number):
+            if not hasattr(local, 'session'):
+                local.session = requests.Session()
+                local.session.headers.update(headers)
+            started = time.perf_counter()
+            try:
+                response = local.session.get(
+                    url + paths[number % len(paths)], timeout=30
+                )
+                ok = response.status_code == 200
+            except requests.RequestException:
+                ok = False
+            return time.perf_counter() - started, ok
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            samples = list(executor.map(fetch, range(total)))
+        elapsed = time.perf_counter() - started
+
+        latencies = sorted(latency for latency, _ in samples)
+        quantiles = statistics.quantiles(latencies, n=100)
+        return {
+            'rps': total / elapsed,
+            'errors': sum(not ok for _, ok in samples),
+            'p50': quantiles[49] * 1000,
+            'p95': quantiles[94] * 1000,
+            'p99': quantiles[98] * 1000,
+        }
+
+    def report(self, url, result, baseline):
+        self.stdout.write(
+            f'{url}: {result["rps"]:.1f} запросов/с, '
+            f'ошибок {result["errors"]}, '
+            f'p50 {result["p50"]:.1f} мс, '
+            f'p95 {result["p95"]:.1f} мс, '
+            f'p99 {result["p99"]:.1f} мс'
+        )
+        if result is not baseline:
+            self.stdout.write(
+                f'  к {baseline["rps"]:.1f} запросов/с первого сервера: '
+                f'x{result["rps"] / baseline["rps"]:.2f}'
+            )
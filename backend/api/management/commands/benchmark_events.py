@@ -0,0 +1,145 @@
+"""
+Команда нагрузочной проверки потока событий о новых рецептах.
+"""
+import asyncio
+import resource
+import statistics
+import time
+from collections import Counter
+from urllib.parse import urlsplit
+
+from django.core.management.base import BaseCommand
+
+from api.events import EVENTS_PATH
+
+
+class Command(BaseCommand):
+    """
+    Открывает много одновременных соединений с потоком событий,
+    держит их открытыми и считает полученные события и heartbeat.
+
+    Пример: 5000 простаивающих соединений к одному воркеру на :8001
+        python manage.py benchmark_events --url http://127.0.0.1:8001 \\
+            --token <токен> --connections 5000 --duration 60
+    """
+    help = 'Проверяет поток событий на большом числе соединений'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--url',
+            default='http://127.0.0.1:8000',
+            help='Адрес сервера',
+        )
+        parser.add_argument(
+            '--token',
+            required=True,
+            help='Токен для заголовка Authorization',
+        )
+        parser.add_argument(
+            '--connections',
+            type=int,
+            default=1000,
+            help='Количество одновременных соединений',
+        )
+        parser.add_argument(
+            '--duration',
+            type=float,
+            default=60,
+            help='Сколько секунд держать соединения после подключения всех',
+        )
+        parser.add_argument(
+            '--rate',
+            type=int,
+            default=500,
+            help='Новых соединений в секунду',
+        )
+
+    def handle(self, *args, **options):
+        # Каждое соединение — файловый дескриптор.
+        soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+        if hard == resource.RLIM_INFINITY or hard > soft:
+            resource.setrlimit(resource.RLIMIT_NOFILE, (hard, hard))
+        url = urlsplit(options['url'])
+        stats = asyncio.run(self.run(
+            url.hostname,
+            url.port or 80,
+            options['token'],
+            options['connections'],
+            options['duration'],
+            options['rate'],
+        ))
+        self.report(stats)
+
+    async def run(self, host, port, token, connections, duration, rate):
+        request = (
+            f'GET {EVENTS_PATH} HTTP/1.1\r\n'
+            f'Host: {host}:{port}\r\n'
+            f'Authorization: Token {token}\r\n'
+            'Accept: text/event-stream\r\n'
+            '\r\n'
+        ).encode()
+        stats = {
+            'latencies': [],
+            'errors': Counter(),
+            'lines': Counter(),
+            'dropped': 0,
+        }
+        tasks = []
+        for _ in range(connections):
+            tasks.append(asyncio.create_task(
+                self.listen(host, port, request, stats)
+            ))
+            await asyncio.sleep(1 / rate)
+        await asyncio.sleep(duration)
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        stats['connections'] = connections
+        return stats
+
+    @staticmethod
+    async def listen(host, port, request, stats):
+        started = time.perf_counter()
+        try:
+            reader, writer = await asyncio.open_connection(host, port)
+            writer.write(request)
+            status = await reader.readline()
+            while (await reader.readline()).strip():
+                pass
+        except OSError as exc:
+            stats['errors'][type(exc).__name__] += 1
+            return
+        if status.split()[1:2] != [b'200']:
+            stats['errors'][status.decode().strip()] += 1
+            writer.close()
+            return
+        stats['latencies'].append(time.perf_counter() - started)
+        try:
+            while line := await reader.readline():
+                if line.startswith(b': ping'):
+                    stats['lines']['heartbeat'] += 1
+                elif line.startswith(b'event: '):
+                    stats['lines'][line[7:].strip().decode()] += 1
+            stats['dropped'] += 1
+        except OSError:
+            stats['dropped'] += 1
+        finally:
+            writer.close()
+
+    def report(self, stats):
+        latencies = sorted(stats['latencies'])
+        self.stdout.write(
+            f'Подключено {len(latencies)} из {stats["connections"]}, '
+            f'закрыто сервером {stats["dropped"]}'
+        )
+        if len(latencies) > 1:
+            quantiles = statistics.quantiles(latencies, n=100)
+            self.stdout.write(
+                f'Подключение: p50 {quantiles[49] * 1000:.1f} мс, '
+                f'p95 {quantiles[94] * 1000:.1f} мс, '
+                f'p99 {quantiles[98] * 1000:.1f} мс'
+            )
+        for error, count in stats['errors'].most_common():
+            self.stdout.write(f'Ошибка {error}: {count}')
+        for name, count in sorted(stats['lines'].items()):
+            self.stdout.write(f'Получено {name}: {count}')
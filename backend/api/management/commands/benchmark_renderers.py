@@ -0,0 +1,89 @@
+"""
+Команда сравнения скорости рендереров JSON.
+"""
+import io
+import timeit
+
+from django.contrib.auth.models import AnonymousUser
+from django.core.management.base import BaseCommand
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from api.parsers import ORJSONParser
+from api.renderers import ORJSONRenderer
+from api.serializers import IngredientSerializer, RecipeListSerializer
+from recipes.models import Ingredient, Recipe
+
+
+class Command(BaseCommand):
+    """
+    Рендерит и разбирает ответы /api/ingredients/ и /api/recipes/
+    стандартными JSONRenderer/JSONParser и их версиями на orjson.
+    Данные сериализуются один раз, замеряется только работа с JSON.
+    """
+    help = 'Сравнивает JSONRenderer и ORJSONRenderer на данных API'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--limit',
+            type=int,
+            default=50,
+            help='Количество рецептов на странице',
+        )
+        parser.add_argument(
+            '--repeat',
+            type=int,
+            default=200,
+            help='Количество повторов каждого замера',
+        )
+
+    def payloads(self, limit):
+        request = Request(APIRequestFactory().get('/api/recipes/'))
+        request.user = AnonymousUser()
+        recipes = Recipe.objects.for_user(request.user)[:limit]
+        return {
+            '/api/ingredients/': IngredientSerializer(
+                Ingredient.objects.all(), many=True
+            ).data,
+            f'/api/recipes/?limit={limit}': {
+                'count': len(recipes),
+                'next': None,
+                'previous': None,
+                'results': RecipeListSerializer(
+                    recipes, many=True, context={'request': request}
+                ).data,
+            },
+        }
+
+    def measure(self, func, repeat):
+        return min(timeit.repeat(func, number=repeat, repeat=3)) / repeat
+
+    def handle(self, *args, **options):
+        repeat = options['repeat']
+        for path, data in self.payloads(options['limit']).items():
+            body = JSONRenderer().render(data)
+            if ORJSONRenderer().render(data) != body:
+                self.stderr.write(f'{path}: ответы рендереров различаются')
+            self.stdout.write(f'{path} ({len(body)} байт)')
+            cases = (
+                (
+                    'рендеринг',
+                    lambda: JSONRenderer().render(data),
+                    lambda: ORJSONRenderer().render(data),
+                ),
+                (
+                    'разбор',
+                    lambda: JSONParser().parse(io.BytesIO(body)),
+                    lambda: ORJSONParser().parse(io.BytesIO(body)),
+                ),
+            )
+            for action, baseline, fast in cases:
+                baseline_time = self.measure(baseline, repeat)
+                fast_time = self.measure(fast, repeat)
+                self.stdout.write(
+                    f'  {action}: json {baseline_time * 1000:.3f} мс, '
+                    f'orjson {fast_time * 1000:.3f} мс, '
+                    f'x{baseline_time / fast_time:.1f}'
+                )
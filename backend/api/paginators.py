@@ -1,9 +1,17 @@
 """
 Модуль настройки пагинации.
 """
-from rest_framework.pagination import PageNumberPagination
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from datetime import datetime
 
-from foodgram_backend.constants import PAGE_SIZE_PAGINATORS
+from django.core.paginator import InvalidPage, Page
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination, PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+from foodgram_backend.constants import (FEED_PAGE_MAX_SIZE,
+                                        PAGE_SIZE_PAGINATORS)
 
 
 class PageLimitPagination(PageNumberPagination):
@@ -18,3 +26,130 @@ class PageLimitPagination(PageNumberPagination):
     """
     page_size = PAGE_SIZE_PAGINATORS
     page_size_query_param = 'limit'
+
+    async def apaginate_queryset(self, queryset, request):
+        """
+        Async counterpart of `paginate_queryset` built on the async ORM.
+
+        The count and the page are fetched with `acount()` and
+        `async for`, the resulting page is the same as the sync one,
+        so `get_paginated_response` can be used afterwards.
+
+        Args:
+            queryset: The queryset to paginate.
+            request: The request object.
+
+        Returns:
+            list: Objects of the requested page or None.
+        """
+        page_size = self.get_page_size(request)
+        if not page_size:
+            return None
+
+        paginator = self.django_paginator_class(queryset, page_size)
+        paginator.count = await queryset.acount()
+        page_number = self.get_page_number(request, paginator)
+        try:
+            number = paginator.validate_number(page_number)
+        except InvalidPage as exc:
+            raise NotFound(self.invalid_page_message.format(
+                page_number=page_number, message=str(exc)
+            ))
+
+        bottom = (number - 1) * paginator.per_page
+        object_list = [
+            item async for item in queryset[bottom:bottom + page_size]
+        ]
+        self.page = Page(object_list, number, paginator)
+        if paginator.num_pages > 1 and self.template is not None:
+            self.display_page_controls = True
+        self.request = request
+        return object_list
+
+
+class FeedPagination(BasePagination):
+    """
+    A keyset pagination class for the subscription feed.
+
+    The cursor is the `(pub_date, id)` position of the last item on the
+    page, so every page costs the same regardless of how far the client
+    has scrolled. Only forward navigation is supported.
+
+    Attributes:
+        page_size (int): The default number of items per page.
+        page_size_query_param (str): The query parameter
+        name for specifying the page size.
+        max_page_size (int): The upper bound for the page size.
+        cursor_query_param (str): The query parameter name for the cursor.
+    """
+    page_size = PAGE_SIZE_PAGINATORS
+    page_size_query_param = 'limit'
+    max_page_size = FEED_PAGE_MAX_SIZE
+    cursor_query_param = 'cursor'
+    invalid_cursor_message = 'Invalid cursor'
+
+    def get_page_size(self, request):
+        try:
+            page_size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        if page_size <= 0:
+            return self.page_size
+        return min(page_size, self.max_page_size)
+
+    def decode_cursor(self, request):
+        cursor = request.query_params.get(self.cursor_query_param)
+        if cursor is None:
+            return None
+        try:
+            position = urlsafe_b64decode(cursor.encode()).decode()
+            pub_date, pk = position.split('|')
+            return datetime.fromisoformat(pub_date), int(pk)
+        except (TypeError, ValueError):
+            raise NotFound(self.invalid_cursor_message)
+
+    def encode_cursor(self, position):
+        pub_date, pk = position
+        position = f'{pub_date.isoformat()}|{pk}'
+        cursor = urlsafe_b64encode(position.encode()).decode()
+        return replace_query_param(
+            self.request.build_absolute_uri(), self.cursor_query_param, cursor
+        )
+
+    def paginate_positions(self, fetch, request):
+        """
+        Fetches one page of positions.
+
+        Args:
+            fetch: A callable `fetch(before, limit)` returning at most
+                `limit` `(pub_date, id)` positions after `before`,
+                newest first.
+            request: The request object.
+
+        Returns:
+            list: Positions of the requested page.
+        """
+        self.request = request
+        page_size = self.get_page_size(request)
+        positions = fetch(self.decode_cursor(request), page_size + 1)
+        self.next_position = (
+            positions[page_size - 1] if len(positions) > page_size else None
+        )
+        return positions[:page_size]
+
+    def get_next_link(self):
+        if self.next_position is None:
+            return None
+        return self.encode_cursor(self.next_position)
+
+    def get_paginated_response(self, data):
+        return Response({'next': self.get_next_link(), 'results': data})
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'results': schema,
+            },
+        }
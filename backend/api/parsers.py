@@ -0,0 +1,75 @@
+"""
+Модуль настройки парсеров.
+"""
+import codecs
+import json
+
+from django.conf import settings
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import DataAndFiles, JSONParser, MultiPartParser
+
+from .renderers import ORJSONRenderer, orjson
+
+
+class ORJSONParser(JSONParser):
+    """
+    A JSON parser backed by orjson.
+
+    UTF-8 request bodies are parsed by orjson, other encodings and
+    a missing orjson package fall back to the stdlib parser.
+    Errors are reported the same way as by `JSONParser`.
+    """
+    renderer_class = ORJSONRenderer
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        parser_context = parser_context or {}
+        encoding = parser_context.get('encoding', settings.DEFAULT_CHARSET)
+        if orjson is None or codecs.lookup(encoding).name != 'utf-8':
+            return super().parse(stream, media_type, parser_context)
+
+        try:
+            return orjson.loads(stream.read())
+        except orjson.JSONDecodeError as exc:
+            raise ParseError('JSON parse error - %s' % str(exc))
+
+
+class UploadedFiles(dict):
+    """
+    Uploaded files of a request, one per field.
+
+    `Request` merges files into the data with `dict.update`, which would
+    copy the value lists out of a `MultiValueDict`. `lists()` lets Django
+    close the temporary files when the request is finished.
+    """
+
+    def lists(self):
+        return ((name, [file]) for name, file in self.items())
+
+
+class MultiPartJSONParser(MultiPartParser):
+    """
+    A multipart parser that also accepts a JSON document in a form field.
+
+    A recipe with an image can be sent as multipart/form-data: the
+    `data` field holds the same JSON document as a JSON request body,
+    and the image is sent as a file field (e.g. `image`). Files are
+    streamed by the upload handlers instead of being embedded as
+    Base64 and are added to the parsed document. Requests without
+    a `data` field are parsed as usual form data.
+    """
+    json_field = 'data'
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        result = super().parse(stream, media_type, parser_context)
+        if self.json_field not in result.data:
+            return result
+        document = result.data[self.json_field]
+        try:
+            data = orjson.loads(document) if orjson else json.loads(document)
+        except ValueError as exc:
+            raise ParseError('JSON parse error - %s' % str(exc))
+        if not isinstance(data, dict):
+            raise ParseError(
+                f'JSON parse error - {self.json_field} must be an object'
+            )
+        return DataAndFiles(data, UploadedFiles(result.files.items()))
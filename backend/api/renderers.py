@@ -0,0 +1,51 @@
+"""
+Модуль настройки рендереров.
+"""
+from rest_framework.renderers import JSONRenderer
+from rest_framework.utils import encoders
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+class ORJSONRenderer(JSONRenderer):
+    """
+    A JSON renderer backed by orjson.
+
+    Produces the same compact UTF-8 output as `JSONRenderer`. Types
+    orjson does not know (Decimal, lazy translation strings, querysets)
+    are converted by DRF's `JSONEncoder.default`. Indented output
+    requested by the browsable API or `; indent=N`, data orjson refuses
+    (e.g. integers wider than 64 bits) and a missing orjson package fall
+    back to the stdlib renderer.
+    """
+    options = (
+        orjson.OPT_NON_STR_KEYS | orjson.OPT_UTC_Z if orjson else None
+    )
+    default = staticmethod(encoders.JSONEncoder().default)
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        if orjson is None or self.get_indent(
+            accepted_media_type, renderer_context or {}
+        ) is not None:
+            return super().render(
+                data, accepted_media_type, renderer_context
+            )
+
+        try:
+            ret = orjson.dumps(data, default=self.default, option=self.options)
+        except orjson.JSONEncodeError:
+            return super().render(
+                data, accepted_media_type, renderer_context
+            )
+        # Same strict javascript subset as JSONRenderer.
+        if b'\xe2\x80\xa8' in ret or b'\xe2\x80\xa9' in ret:
+            ret = (
+                ret.replace(b'\xe2\x80\xa8', b'\\u2028')
+                .replace(b'\xe2\x80\xa9', b'\\u2029')
+            )
+        return ret
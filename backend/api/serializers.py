@@ -2,23 +2,135 @@
 Модуль серелизаторов.
 """
 
-import contextlib
+from django.core.files.storage import default_storage
+from django.db import transaction
 from rest_framework import serializers
 
 from drf_extra_fields.fields import Base64ImageField
 
-from users.models import CustomUser, Subscription
+from foodgram_backend import constants
+from foodgram_backend.db import update_counter
+
+from users.models import CustomUser
+from recipes import images, similarity
 from recipes.models import (
-    FavoriteRecipe,
+    FeedEntry,
     Ingredient,
     Recipe,
+    RecipeChange,
     RecipeIngredient,
-    ShoppingCart,
     Tag
 )
+from . import facets, ingredient_index, uploads
+
+
+def positive_int(value):
+    """Положительное целое из параметра запроса или None."""
+    try:
+        value = int(value)
+    except (TypeError, ValueError):
+        return None
+    return value if value > 0 else None
+
+
+def split_param(value) -> set:
+    return {name.strip() for name in (value or '').split(',') if name.strip()}
+
+
+class SparseFieldsMixin:
+    """
+    Ограничивает поля ответа параметрами ?fields= и ?omit=
+    (имена полей через запятую).
+
+    Применяется только к корневому сериализатору ответа, вложенные
+    сериализаторы (например, автор рецепта) отдаются целиком.
+    """
+
+    @classmethod
+    def requested_fields(cls, request):
+        """
+        Имена полей, которые нужно отдать, или None, если отдаются все.
+        Неизвестные имена полей — ошибка валидации.
+        """
+        if request is None:
+            return None
+        fields = split_param(request.query_params.get('fields'))
+        omit = split_param(request.query_params.get('omit'))
+        if not fields and not omit:
+            return None
+
+        available = set(cls.Meta.fields)
+        unknown = (fields | omit) - available
+        if unknown:
+            raise serializers.ValidationError(
+                {'fields': f'Неизвестные поля: {", ".join(sorted(unknown))}'}
+            )
+        return (fields or available) - omit
+
+    def get_fields(self):
+        fields = super().get_fields()
+        root = self.root
+        if root is not self and getattr(root, 'child', None) is not self:
+            return fields
+        requested = self.requested_fields(self.context.get('request'))
+        if requested is None:
+            return fields
+        return {
+            name: field
+            for name, field in fields.items()
+            if name in requested
+        }
+
+
+class ImageVariantsField(serializers.ReadOnlyField):
+    """
+    Уменьшенные копии изображения рецепта с адресами файлов;
+    пустой словарь, пока копии не построены.
+    """
+
+    def to_representation(self, value):
+        request = self.context.get('request')
 
-
-class CustomUserSerializer(serializers.ModelSerializer):
+        def url(name):
+            url = default_storage.url(name)
+            return request.build_absolute_uri(url) if request else url
+
+        return {
+            name: {
+                key: url(item) if key in images.FORMATS else item
+                for key, item in variant.items()
+            }
+            for name, variant in value.items()
+        }
+
+
+class RecipeImageField(Base64ImageField):
+    """
+    Изображение рецепта строкой Base64 или файлом из multipart-запроса.
+
+    Размер, формат и число пикселей проверяются до декодирования
+    изображения: у строки Base64 размер оценивается по её длине,
+    формат и размеры читаются из заголовка файла.
+    """
+
+    def to_internal_value(self, data):
+        if isinstance(data, str):
+            payload = data.partition(';base64,')[2] or data
+            uploads.check_size(len(payload) * 3 // 4)
+            image = super().to_internal_value(data)
+        else:
+            image = serializers.ImageField.to_internal_value(self, data)
+        if image is None:
+            return None
+        uploads.check_size(image.size)
+        image.seek(0)
+        header = image.read(constants.IMAGE_HEADER_MAX_SIZE)
+        image.seek(0)
+        uploads.check_header(header, image.size <= len(header))
+        return image
+
+
+class CustomUserSerializer(SparseFieldsMixin, serializers.ModelSerializer):
 
     is_subscribed = serializers.SerializerMethodField(read_only=True)
 
@@ -31,14 +143,22 @@ class CustomUserSerializer(serializers.ModelSerializer):
             'first_name',
             'last_name',
             'is_subscribed',
+            'recipes_count',
+            'followers_count',
+        )
+        read_only_fields = (
+            'recipes_count',
+            'followers_count',
         )
 
     def get_is_subscribed(self, obj):
+        if hasattr(obj, 'is_subscribed'):
+            return obj.is_subscribed
         request = self.context.get('request')
         return bool(
             request
             and request.user.is_authenticated
-            and request.user.follower.filter(user=obj).exists()
+            and request.user.follower.filter(following=obj).exists()
         )
 
 
@@ -93,7 +213,7 @@ class AddIngredientSerializer(serializers.ModelSerializer):
         )
 
 
-class RecipeListSerializer(serializers.ModelSerializer):
+class RecipeListSerializer(SparseFieldsMixin, serializers.ModelSerializer):
 
     author = CustomUserSerializer(
         read_only=True
@@ -108,6 +228,7 @@ class RecipeListSerializer(serializers.ModelSerializer):
     )
     is_favorited = serializers.SerializerMethodField()
     is_in_shopping_cart = serializers.SerializerMethodField()
+    image_variants = ImageVariantsField()
 
     class Meta:
         model = Recipe
@@ -120,11 +241,16 @@ class RecipeListSerializer(serializers.ModelSerializer):
             'is_in_shopping_cart',
             'name',
             'image',
+            'image_variants',
             'text',
-            'cooking_time'
+            'cooking_time',
+            'favorites_count',
+            'in_carts_count',
         )
 
     def get_is_favorited(self, obj):
+        if hasattr(obj, 'is_favorited'):
+            return obj.is_favorited
         request = self.context.get('request')
         return bool(
             request
@@ -133,6 +259,8 @@ class RecipeListSerializer(serializers.ModelSerializer):
         )
 
     def get_is_in_shopping_cart(self, obj):
+        if hasattr(obj, 'is_in_shopping_cart'):
+            return obj.is_in_shopping_cart
         request = self.context.get('request')
         return bool(
             request
@@ -141,6 +269,71 @@ class RecipeListSerializer(serializers.ModelSerializer):
         )
 
 
+class RecipeMatchSerializer(RecipeListSerializer):
+    """Рецепт в поиске по ингредиентам: сколько из них есть и нет."""
+    matched_count = serializers.IntegerField(read_only=True)
+    missing_count = serializers.IntegerField(read_only=True)
+
+    class Meta(RecipeListSerializer.Meta):
+        fields = RecipeListSerializer.Meta.fields + (
+            'matched_count',
+            'missing_count',
+        )
+
+
+class RecipeChangesSerializer(serializers.Serializer):
+    """
+    Параметры запроса изменений рецептов: время начала синхронизации
+    или курсор из предыдущего ответа и размер страницы журнала.
+    """
+    since = serializers.DateTimeField(required=False)
+    cursor = serializers.CharField(required=False)
+    limit = serializers.IntegerField(
+        min_value=1,
+        max_value=constants.CHANGES_MAX_PAGE_SIZE,
+        default=constants.CHANGES_PAGE_SIZE,
+    )
+
+    def validate_cursor(self, value):
+        position = RecipeChange.parse_cursor(value)
+        if position is None:
+            raise serializers.ValidationError('Некорректный курсор.')
+        return position
+
+
+class IngredientMatchSerializer(serializers.Serializer):
+    """
+    Параметры поиска рецептов по ингредиентам: id имеющихся и
+    исключённых ингредиентов через запятую.
+    """
+    ingredients = serializers.CharField()
+    exclude = serializers.CharField(required=False, default='')
+
+    @staticmethod
+    def ingredient_ids(value):
+        try:
+            ids = list(dict.fromkeys(int(pk) for pk in split_param(value)))
+        except ValueError:
+            raise serializers.ValidationError(
+                'Укажите id ингредиентов через запятую.'
+            )
+        if len(ids) > constants.INGREDIENT_MATCH_MAX_SIZE:
+            raise serializers.ValidationError(
+                f'Не больше {constants.INGREDIENT_MATCH_MAX_SIZE} '
+                'ингредиентов.'
+            )
+        return ids
+
+    def validate_ingredients(self, value):
+        ids = self.ingredient_ids(value)
+        if not ids:
+            raise serializers.ValidationError('Укажите ингредиенты.')
+        return ids
+
+    def validate_exclude(self, value):
+        return self.ingredient_ids(value)
+
+
 class RecipeAddSerializer(serializers.ModelSerializer):
     author = CustomUserSerializer(
         read_only=True
@@ -152,7 +345,7 @@ class RecipeAddSerializer(serializers.ModelSerializer):
     ingredients = AddIngredientSerializer(
         many=True,
     )
-    image = Base64ImageField()
+    image = RecipeImageField()
 
     class Meta:
         model = Recipe
@@ -197,6 +390,7 @@ class RecipeAddSerializer(serializers.ModelSerializer):
 
         return attrs
 
+    @transaction.atomic
     def create(self, validated_data):
         tags = validated_data.pop('tags')
         ingredients = validated_data.pop('ingredients')
@@ -205,17 +399,21 @@ class RecipeAddSerializer(serializers.ModelSerializer):
             author=request.user,
             **validated_data
         )
+        images.images_changed([recipe.id])
         recipe.tags.set(tags)
         return self._make_recipe(ingredients, recipe)
 
+    @transaction.atomic
     def update(self, instance, validated_data):
         tags = validated_data.pop('tags')
         ingredients = validated_data.pop('ingredients')
         instance.tags.clear()
         instance.tags.set(tags)
         instance.ingredients.clear()
+        image = instance.image.name
 
         super().update(instance, validated_data)
+        images.image_saved(instance, image)
 
         return self._make_recipe(ingredients, instance)
 
@@ -235,8 +433,197 @@ class RecipeAddSerializer(serializers.ModelSerializer):
         return RecipeListSerializer(instance).data
 
 
+class BulkAddIngredientSerializer(AddIngredientSerializer):
+    id = serializers.IntegerField()
+
+
+class RecipeBulkItemSerializer(RecipeAddSerializer):
+    """
+    Рецепт из пакетной загрузки.
+
+    Теги и ингредиенты принимаются как идентификаторы и проверяются
+    общими запросами в RecipeBulkCreateSerializer.
+    """
+    tags = serializers.ListField(
+        child=serializers.IntegerField(),
+    )
+    ingredients = BulkAddIngredientSerializer(
+        many=True,
+    )
+
+
+class RecipeBulkCreateSerializer(serializers.Serializer):
+    """
+    Пакетное создание рецептов.
+
+    Все элементы проверяются независимо, теги и ингредиенты
+    загружаются двумя запросами на весь пакет. Корректные рецепты
+    сохраняются через bulk_create. В режиме atomic пакет сохраняется
+    только если корректны все элементы.
+    """
+    recipes = serializers.ListField(
+        child=serializers.DictField(),
+        allow_empty=False,
+        max_length=constants.RECIPE_BULK_MAX_SIZE,
+    )
+    atomic = serializers.BooleanField(default=False)
+
+    def validate(self, attrs):
+        items = [
+            RecipeBulkItemSerializer(data=item, context=self.context)
+            for item in attrs['recipes']
+        ]
+        valid_items = [item for item in items if item.is_valid()]
+        tags = Tag.objects.in_bulk({
+            tag
+            for item in valid_items
+            for tag in item.validated_data['tags']
+        })
+        ingredients = Ingredient.objects.in_bulk({
+            ingredient['id']
+            for item in valid_items
+            for ingredient in item.validated_data['ingredients']
+        })
+
+        attrs['items'] = []
+        for item in items:
+            if item.errors:
+                attrs['items'].append((None, item.errors))
+                continue
+            attrs['items'].append(
+                self._resolve(item.validated_data, tags, ingredients)
+            )
+        return attrs
+
+    @staticmethod
+    def _resolve(data, tags, ingredients):
+        missing_tags = [tag for tag in data['tags'] if tag not in tags]
+        missing_ingredients = [
+            ingredient['id']
+            for ingredient in data['ingredients']
+            if ingredient['id'] not in ingredients
+        ]
+        errors = {}
+        if missing_tags:
+            errors['tags'] = f'Несуществующие теги: {missing_tags}'
+        if missing_ingredients:
+            errors['ingredients'] = (
+                f'Несуществующие ингредиенты: {missing_ingredients}'
+            )
+        if errors:
+            return None, errors
+
+        data['tags'] = [tags[tag] for tag in data['tags']]
+        for ingredient in data['ingredients']:
+            ingredient['id'] = ingredients[ingredient['id']]
+        return data, None
+
+    @property
+    def has_errors(self):
+        return any(errors for _, errors in self.validated_data['items'])
+
+    @transaction.atomic
+    def create(self, validated_data):
+        request = self.context.get('request')
+        entries = [data for data, _ in validated_data['items'] if data]
+        recipes = Recipe.objects.bulk_create(
+            [
+                Recipe(
+                    author=request.user,
+                    name=data['name'],
+                    text=data['text'],
+                    image=data['image'],
+                    cooking_time=data['cooking_time'],
+                )
+                for data in entries
+            ],
+            batch_size=constants.BULK_CREATE_BATCH_SIZE,
+        )
+        recipe_tags = Recipe.tags.through
+        recipe_tags.objects.bulk_create(
+            (
+                recipe_tags(recipe_id=recipe.id, tag_id=tag.id)
+                for recipe, data in zip(recipes, entries)
+                for tag in data['tags']
+            ),
+            batch_size=constants.BULK_CREATE_BATCH_SIZE,
+        )
+        RecipeIngredient.objects.bulk_create(
+            (
+                RecipeIngredient(
+                    recipe=recipe,
+                    ingredient=ingredient['id'],
+                    amount=ingredient['amount'],
+                )
+                for recipe, data in zip(recipes, entries)
+                for ingredient in data['ingredients']
+            ),
+            batch_size=constants.BULK_CREATE_BATCH_SIZE,
+        )
+        update_counter(
+            CustomUser.objects.filter(pk=request.user.pk),
+            'recipes_count',
+            len(recipes)
+        )
+        FeedEntry.objects.fan_out([recipe.id for recipe in recipes])
+        RecipeChange.objects.bulk_create(
+            [
+                RecipeChange(recipe_id=recipe.id, action=RecipeChange.CREATED)
+                for recipe in recipes
+            ],
+            batch_size=constants.BULK_CREATE_BATCH_SIZE,
+        )
+        ingredient_index.recipes_changed(recipe.id for recipe in recipes)
+        images.images_changed(recipe.id for recipe in recipes)
+        similarity.recipes_changed(recipe.id for recipe in recipes)
+        facets.recipes_changed()
+        return recipes
+
+    def get_results(self, recipes=()):
+        """
+        Возвращает результат по каждому элементу пакета в исходном
+        порядке: созданный рецепт либо ошибки валидации.
+        """
+        created = iter(
+            RecipeListSerializer(
+                recipes,
+                many=True,
+                context=self.context
+            ).data
+        )
+        results = []
+        for index, (data, errors) in enumerate(
+            self.validated_data['items']
+        ):
+            if errors:
+                results.append(
+                    {'index': index, 'status': 'error', 'errors': errors}
+                )
+            elif recipes:
+                results.append(
+                    {'index': index, 'status': 'created',
+                     'recipe': next(created)}
+                )
+            else:
+                results.append({'index': index, 'status': 'skipped'})
+        return results
+
+
+class BulkIdsSerializer(serializers.Serializer):
+    """Список идентификаторов для пакетных операций без повторов."""
+    ids = serializers.ListField(
+        child=serializers.IntegerField(min_value=1),
+        allow_empty=False,
+        max_length=constants.BULK_IDS_MAX_SIZE,
+    )
+
+    def validate_ids(self, value):
+        return list(dict.fromkeys(value))
+
+
 class RecipeMinifiedSerializer(serializers.ModelSerializer):
     image = Base64ImageField()
+    image_variants = ImageVariantsField()
 
     class Meta:
         model = Recipe
@@ -244,6 +631,7 @@ class RecipeMinifiedSerializer(serializers.ModelSerializer):
             'id',
             'name',
             'image',
+            'image_variants',
             'cooking_time'
         )
         read_only_fields = (
@@ -253,105 +641,31 @@ class RecipeMinifiedSerializer(serializers.ModelSerializer):
         )
 
 
+class SimilarRecipeSerializer(RecipeMinifiedSerializer):
+    """Похожий рецепт с оценкой сходства от 0 до 1."""
+    similarity = serializers.FloatField(read_only=True)
+
+    class Meta(RecipeMinifiedSerializer.Meta):
+        fields = RecipeMinifiedSerializer.Meta.fields + ('similarity',)
+
+
 class SubscriptionListSerializer(CustomUserSerializer):
     recipes = serializers.SerializerMethodField()
-    recipes_count = serializers.ReadOnlyField(source='recipes.count')
 
     class Meta(CustomUserSerializer.Meta):
         fields = CustomUserSerializer.Meta.fields + (
             'recipes',
-            'recipes_count'
         )
 
     def get_recipes(self, obj):
         request = self.context.get('request')
-        recipes = obj.recipes.all()
-        if recipes_limit := request.query_params.get('recipes_limit'):
-            with contextlib.suppress(ValueError):
-                recipes = recipes[:int(recipes_limit)]
+        recipes = getattr(obj, 'prefetched_recipes', None)
+        if recipes is None:
+            recipes = obj.recipes.all()
+        if limit := positive_int(request.query_params.get('recipes_limit')):
+            recipes = recipes[:limit]
         return RecipeMinifiedSerializer(
             recipes,
             many=True,
             context=self.context
         ).data
-
-
-class SubscriptionCreateSerializer(serializers.ModelSerializer):
-
-    class Meta:
-        model = Subscription
-        fields = (
-            'user',
-            'following'
-        )
-
-    def validate(self, attrs):
-        user = attrs['user']
-        following = attrs['following']
-        if user == following:
-            raise serializers.ValidationError(
-                {'following': 'Нельзя подписаться на себя.'}
-            )
-
-        if user.follower.filter(following=following).exists():
-            raise serializers.ValidationError(
-                {'following': 'Уже подписан.'}
-            )
-
-        return attrs
-
-    def to_representation(self, instance):
-        return SubscriptionListSerializer(
-            instance.following,
-            context={'request': self.context.get('request')}
-        ).data
-
-
-class ShoppingCartSerializer(serializers.ModelSerializer):
-    class Meta:
-        model = ShoppingCart
-        fields = (
-            'user',
-            'recipe'
-        )
-
-    def validate(self, attrs):
-        user = attrs['user']
-        recipe = attrs['recipe']
-
-        if user.shopping_carts.filter(recipe=recipe).exists():
-            raise serializers.ValidationError(
-                {'recipe': 'Уже в корзине.'}
-            )
-        return attrs
-
-    def to_representation(self, instance):
-        return RecipeMinifiedSerializer(
-            instance.recipe,
-            context={'request': self.context.get('request')}
-        ).data
-
-
-class FavoriteRecipeSerializer(serializers.ModelSerializer):
-    class Meta:
-        model = FavoriteRecipe
-        fields = (
-            'user',
-            'recipe'
-        )
-
-    def validate(self, attrs):
-        user = attrs['user']
-        recipe = attrs['recipe']
-
-        if user.favorite_recipes.filter(recipe=recipe).exists():
-            raise serializers.ValidationError(
-                {'recipe': 'Уже добавлен.'}
-            )
-        return attrs
-
-    def to_representation(self, instance):
-        return RecipeMinifiedSerializer(
-            instance.recipe,
-            context={'request': self.context.get('request')}
-        ).data
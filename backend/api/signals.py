@@ -0,0 +1,77 @@
+"""
+Обработчики сигналов API.
+"""
+from functools import partial
+
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from rest_framework.authtoken.models import Token
+
+from recipes import similarity
+from recipes.models import Ingredient, Recipe, RecipeChange, Tag
+from users.models import CustomUser
+from .authentication import invalidate_tokens, invalidate_user_tokens
+from . import facets
+from .catalog import bump_catalog_version
+from .ingredient_index import recipes_changed
+
+
+@receiver(post_delete, sender=Token)
+def token_deleted(sender, instance, **kwargs):
+    """Выход из системы: токен больше не должен приниматься из кеша."""
+    transaction.on_commit(partial(invalidate_tokens, instance.key))
+
+
+@receiver(post_save, sender=CustomUser)
+def user_saved(sender, instance, update_fields=None, **kwargs):
+    """
+    Смена пароля, is_active или профиля сбрасывает кеш токенов.
+    Обновление только last_login при входе кеш не трогает.
+
+    Кеш сбрасывается после коммита: иначе параллельный запрос успеет
+    положить в него старые данные до фиксации транзакции.
+    """
+    if update_fields and set(update_fields) <= {'last_login'}:
+        return
+    transaction.on_commit(partial(invalidate_user_tokens, instance.pk))
+
+
+@receiver(post_save, sender=Tag)
+@receiver(post_delete, sender=Tag)
+@receiver(post_save, sender=Ingredient)
+@receiver(post_delete, sender=Ingredient)
+def catalog_changed(sender, **kwargs):
+    """Изменение справочника сбрасывает готовые ответы после коммита."""
+    transaction.on_commit(bump_catalog_version)
+
+
+@receiver(post_save, sender=Recipe)
+@receiver(post_delete, sender=Recipe)
+def recipe_changed(sender, instance, **kwargs):
+    """
+    Рецепт создан, изменён или удалён: индекс ингредиентов, сигнатура
+    похожих рецептов и фасеты обновятся после коммита, когда сохранены
+    и ингредиенты с тегами.
+    """
+    recipes_changed([instance.pk])
+    similarity.recipes_changed([instance.pk])
+    facets.recipes_changed()
+
+
+@receiver(post_save, sender=Recipe)
+def recipe_saved(sender, instance, created, **kwargs):
+    """Запись в журнал изменений в той же транзакции."""
+    RecipeChange.objects.create(
+        recipe_id=instance.pk,
+        action=RecipeChange.CREATED if created else RecipeChange.UPDATED
+    )
+
+
+@receiver(post_delete, sender=Recipe)
+def recipe_deleted(sender, instance, **kwargs):
+    """Удалённый рецепт остаётся в журнале изменений."""
+    RecipeChange.objects.create(
+        recipe_id=instance.pk,
+        action=RecipeChange.DELETED
+    )
@@ -0,0 +1,152 @@
+"""
+Тесты API.
+"""
+import json
+import threading
+from unittest import skipUnless
+
+from django.core.cache import cache
+from django.db import connection, transaction
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APITestCase, APITransactionTestCase
+
+from recipes.models import Ingredient, RecipeChange
+from recipes.tests import make_recipe
+from users.models import CustomUser
+from . import events
+
+
+class CachedTokenAuthenticationTests(APITestCase):
+    """Кеш токенов аутентификации."""
+
+    def setUp(self):
+        cache.clear()
+        self.user = CustomUser.objects.create_user(
+            email='user@example.com',
+            username='user',
+            first_name='Имя',
+            last_name='Фамилия',
+            password='old-Passw0rd',
+        )
+        token = Token.objects.create(user=self.user)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {token.key}')
+
+    def test_set_password_keeps_fresh_profile(self):
+        self.assertEqual(self.client.get('/api/users/me/').status_code, 200)
+        CustomUser.objects.filter(pk=self.user.pk).update(first_name='Новое')
+        response = self.client.post('/api/users/set_password/', {
+            'current_password': 'old-Passw0rd',
+            'new_password': 'new-Passw0rd',
+        })
+        self.assertEqual(response.status_code, 204)
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.first_name, 'Новое')
+        self.assertTrue(self.user.check_password('new-Passw0rd'))
+
+    def test_invalidated_after_commit(self):
+        self.assertEqual(self.client.get('/api/users/me/').status_code, 200)
+        with self.captureOnCommitCallbacks() as callbacks:
+            self.user.is_active = False
+            self.user.save()
+        self.assertEqual(self.client.get('/api/users/me/').status_code, 200)
+        for callback in callbacks:
+            callback()
+        self.assertEqual(self.client.get('/api/users/me/').status_code, 401)
+
+
+class CompressionTests(APITestCase):
+    """Выбор алгоритма сжатия ответов."""
+
+    def test_admin_html_not_brotli(self):
+        response = self.client.get(
+            '/admin/login/', HTTP_ACCEPT_ENCODING='br, gzip'
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+
+    def test_api_json_brotli(self):
+        Ingredient.objects.bulk_create(
+            Ingredient(name=f'Ингредиент {number}', measurement_unit='г')
+            for number in range(20)
+        )
+        response = self.client.get(
+            '/api/ingredients/', HTTP_ACCEPT_ENCODING='br, gzip'
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Encoding'], 'br')
+
+
+@skipUnless(
+    connection.vendor == 'postgresql',
+    'Параллельные транзакции проверяются на PostgreSQL.'
+)
+class RecipeChangesOrderTests(APITransactionTestCase):
+    """Курсор журнала изменений и незакоммиченные транзакции."""
+
+    def hold_transaction(self, write):
+        """
+        Выполняет write в транзакции другого соединения и держит её
+        открытой до выхода из контекста.
+        """
+        inserted, release = threading.Event(), threading.Event()
+
+        def long_transaction():
+            try:
+                with transaction.atomic():
+                    write()
+                    inserted.set()
+                    release.wait(10)
+            finally:
+                connection.close()
+
+        thread = threading.Thread(target=long_transaction)
+        thread.start()
+        self.assertTrue(inserted.wait(10))
+        self.addCleanup(thread.join)
+        self.addCleanup(release.set)
+        return release, thread
+
+    def changes(self, cursor):
+        response = self.client.get(
+            '/api/recipes/changes/', {'cursor': cursor}
+        )
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_uncommitted_lower_id(self):
+        release, thread = self.hold_transaction(
+            lambda: RecipeChange.objects.create(
+                recipe_id=1, action=RecipeChange.DELETED
+            )
+        )
+        RecipeChange.objects.create(recipe_id=2, action=RecipeChange.DELETED)
+        first = self.changes('0')
+        release.set()
+        thread.join()
+        self.assertEqual(first['deleted'], [])
+        second = self.changes(first['cursor'])
+        self.assertEqual(second['deleted'], [1, 2])
+
+    def test_events_wait_for_uncommitted_lower_id(self):
+        first_author, second_author = (
+            CustomUser.objects.create_user(
+                email=f'{name}@example.com', username=name,
+                first_name='Имя', last_name='Фамилия', password='Passw0rd-1',
+            )
+            for name in ('first', 'second')
+        )
+        cursor = events.latest_position()
+        release, thread = self.hold_transaction(
+            lambda: make_recipe(first_author, 'Первый')
+        )
+        make_recipe(second_author, 'Второй')
+        first, cursor = events.poll_changes(cursor)
+        release.set()
+        thread.join()
+        second, cursor = events.poll_changes(cursor)
+        self.assertEqual(first, [])
+        self.assertEqual(
+            [json.loads(event.data.split(b'data: ')[1])['name']
+             for event in second],
+            ['Первый', 'Второй']
+        )
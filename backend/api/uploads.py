@@ -0,0 +1,103 @@
+"""
+Модуль проверки загружаемых изображений.
+"""
+import io
+
+from django.core.files.uploadhandler import FileUploadHandler
+from PIL import Image
+from rest_framework.exceptions import ValidationError
+
+from foodgram_backend.constants import (IMAGE_HEADER_MAX_SIZE,
+                                        IMAGE_MAX_PIXELS,
+                                        IMAGE_UPLOAD_FORMATS,
+                                        IMAGE_UPLOAD_MAX_SIZE)
+
+INVALID_IMAGE = 'Загрузите корректное изображение.'
+IMAGE_TOO_LARGE = f'Изображение больше {IMAGE_MAX_PIXELS // 1_000_000} Мп.'
+
+
+def check_size(size):
+    if size > IMAGE_UPLOAD_MAX_SIZE:
+        raise ValidationError(
+            f'Размер файла больше '
+            f'{IMAGE_UPLOAD_MAX_SIZE // (1024 * 1024)} МБ.'
+        )
+
+
+def check_header(data, complete=True):
+    """
+    Checks the image format and dimensions using only the beginning
+    of the file.
+
+    Pillow reads the header lazily and does not decode pixels, so
+    the check costs the same for any image size.
+
+    Args:
+        data: The first bytes of the file.
+        complete: Whether `data` is the whole file. An incomplete
+            header is an error only when no more data is coming
+            or IMAGE_HEADER_MAX_SIZE bytes have already been read.
+
+    Returns:
+        bool: True if the header was checked, False if more data
+        is needed.
+    """
+    try:
+        with Image.open(io.BytesIO(data)) as image:
+            image_format, (width, height) = image.format, image.size
+    except Image.DecompressionBombError:
+        raise ValidationError(IMAGE_TOO_LARGE)
+    except OSError:
+        if complete or len(data) >= IMAGE_HEADER_MAX_SIZE:
+            raise ValidationError(INVALID_IMAGE)
+        return False
+    if image_format not in IMAGE_UPLOAD_FORMATS:
+        raise ValidationError(
+            f'Допустимые форматы: {", ".join(IMAGE_UPLOAD_FORMATS)}.'
+        )
+    if width * height > IMAGE_MAX_PIXELS:
+        raise ValidationError(IMAGE_TOO_LARGE)
+    return True
+
+
+class ImageUploadHandler(FileUploadHandler):
+    """
+    Checks uploaded files while multipart data is being parsed.
+
+    The size limit and the header check (`check_header`) run on the
+    first chunks of each file, so an oversized or invalid image fails
+    the request before the rest of it is parsed and written to disk.
+    The chunks are passed on unchanged to the next handler
+    (TemporaryFileUploadHandler), which streams them into a temporary
+    file, so the memory used per upload does not depend on its size.
+
+    The handler raises DRF's `ValidationError`, so it is installed only
+    for the recipe create and update actions (see
+    `RecipeViewSet.initialize_request`). Other views keep Django's
+    default upload handlers.
+    """
+
+    def new_file(self, *args, **kwargs):
+        super().new_file(*args, **kwargs)
+        self.size = 0
+        self.header = bytearray()
+
+    def receive_data_chunk(self, raw_data, start):
+        self.size += len(raw_data)
+        self.check(check_size, self.size)
+        if self.header is not None:
+            self.header += raw_data[:IMAGE_HEADER_MAX_SIZE]
+            if self.check(check_header, bytes(self.header), False):
+                self.header = None
+        return raw_data
+
+    def file_complete(self, file_size):
+        if self.header is not None:
+            self.check(check_header, bytes(self.header))
+        return None
+
+    def check(self, check, *args):
+        try:
+            return check(*args)
+        except ValidationError as exc:
+            raise ValidationError({self.field_name: exc.detail})
@@ -2,9 +2,13 @@
 Модуль настройки URL для API.
 """
 
+from django.conf import settings
 from django.urls import include, path
 from rest_framework.routers import DefaultRouter
 
+from .async_views import (AsyncIngredientDetailView, AsyncIngredientListView,
+                          AsyncRecipeDetailView, AsyncRecipeListView,
+                          AsyncTagDetailView, AsyncTagListView)
 from .views import (CustomUserViewSet, IngredientViewSet, RecipeViewSet,
                     TagViewSet)
 
@@ -17,7 +21,29 @@ v1_router.register('ingredients', IngredientViewSet)
 v1_router.register('recipes', RecipeViewSet)
 v1_router.register('users', CustomUserViewSet)
 
+async_read_urls = [
+    path('tags/', AsyncTagListView.as_view(), name='tags-list'),
+    path('tags/<int:pk>/', AsyncTagDetailView.as_view(), name='tags-detail'),
+    path(
+        'ingredients/',
+        AsyncIngredientListView.as_view(),
+        name='ingredients-list'
+    ),
+    path(
+        'ingredients/<int:pk>/',
+        AsyncIngredientDetailView.as_view(),
+        name='ingredients-detail'
+    ),
+    path('recipes/', AsyncRecipeListView.as_view(), name='recipes-list'),
+    path(
+        'recipes/<int:pk>/',
+        AsyncRecipeDetailView.as_view(),
+        name='recipes-detail'
+    ),
+]
+
 urlpatterns = [
+    *(async_read_urls if settings.ASYNC_READ_VIEWS else []),
     path('', include(v1_router.urls)),
     path('auth/', include('djoser.urls.authtoken')),
     path('auth/', include('djoser.urls')),
@@ -4,31 +4,120 @@
 import io
 
 from django.conf import settings
+from django.core.files.uploadhandler import TemporaryFileUploadHandler
+from django.db.models import Exists, OuterRef, Prefetch, Value
 from django.http import FileResponse
 from django.shortcuts import get_object_or_404
 from django_filters import rest_framework as filters
 from djoser.views import UserViewSet
-from recipes.models import (FavoriteRecipe, Ingredient, Recipe,
-                            RecipeIngredient, ShoppingCart, Tag)
+from recipes import similarity
+from recipes.models import (FavoriteRecipe, FeedEntry, Ingredient, Recipe,
+                            RecipeChange, RecipeIngredient, ShoppingCart, Tag)
 from reportlab.lib.pagesizes import A4
 from reportlab.pdfbase import pdfmetrics
 from reportlab.pdfbase.ttfonts import TTFont
 from reportlab.pdfgen import canvas
 from rest_framework import status, viewsets
 from rest_framework.decorators import action
-from rest_framework.permissions import (IsAuthenticated,
+from rest_framework.permissions import (AllowAny, IsAuthenticated,
                                         IsAuthenticatedOrReadOnly)
 from rest_framework.response import Response
 
-from users.models import CustomUser
+from foodgram_backend.constants import (PAGE_SIZE_PAGINATORS,
+                                        SIMILAR_RECIPES_MAX_SIZE)
+from foodgram_backend.middleware import read_only_request
+from foodgram_backend.routers import read_from_primary
+from users.models import CustomUser, Subscription
+from . import catalog, facets, ingredient_index
 from .filters import IngredientSearchFilter, RecipeFilterBackend
-from .paginators import PageLimitPagination
+from .paginators import FeedPagination, PageLimitPagination
 from .permissions import isAdminOrAuthorOrReadOnly
-from .serializers import (CustomUserSerializer, FavoriteRecipeSerializer,
-                          IngredientSerializer, RecipeAddSerializer,
-                          RecipeListSerializer, ShoppingCartSerializer,
-                          SubscriptionCreateSerializer,
-                          SubscriptionListSerializer, TagSerializer)
+from .serializers import (BulkIdsSerializer, CustomUserSerializer,
+                          IngredientMatchSerializer, IngredientSerializer,
+                          RecipeAddSerializer, RecipeBulkCreateSerializer,
+                          RecipeChangesSerializer,
+                          RecipeListSerializer, RecipeMatchSerializer,
+                          RecipeMinifiedSerializer, SimilarRecipeSerializer,
+                          SubscriptionListSerializer, TagSerializer,
+                          positive_int)
+from .uploads import ImageUploadHandler
+
+
+def bulk_membership(request, model, targets):
+    """
+    Пакетно добавляет или удаляет связи пользователя с объектами.
+
+    Добавление выполняется одним INSERT ... ON CONFLICT DO NOTHING,
+    удаление одним DELETE. Возвращает итоговое состояние связей
+    для переданных идентификаторов.
+
+    Args:
+        request: The request object.
+        model: Модель связи с UserLinkQuerySet в качестве менеджера.
+        targets: QuerySet допустимых целевых объектов.
+
+    Returns:
+        Response: Связанные идентификаторы и ненайденные объекты.
+    """
+    serializer = BulkIdsSerializer(data=request.data)
+    serializer.is_valid(raise_exception=True)
+    ids = serializer.validated_data['ids']
+
+    if request.method == 'DELETE':
+        removed = model.objects.remove_many(request.user, ids)
+        return Response({'ids': [], 'removed': len(removed)})
+
+    found = set(targets.filter(id__in=ids).values_list('id', flat=True))
+    model.objects.add_many(
+        request.user, [pk for pk in ids if pk in found]
+    )
+    lookup = f'{model.target_field}_id'
+    members = set(
+        model.objects
+        .filter(user=request.user, **{f'{lookup}__in': ids})
+        .values_list(lookup, flat=True)
+    )
+    return Response({
+        'ids': [pk for pk in ids if pk in members],
+        'not_found': [pk for pk in ids if pk not in found],
+    })
+
+
+def recipes_by_ids(request, data) -> list:
+    """
+    Рецепты по списку идентификаторов в порядке запроса.
+
+    Используется тот же запрос, что и для списка рецептов, ненайденные
+    идентификаторы пропускаются.
+
+    Args:
+        request: The request object.
+        data: Данные с ключом ids для BulkIdsSerializer.
+
+    Returns:
+        list: Сериализованные рецепты.
+    """
+    serializer = BulkIdsSerializer(data=data)
+    serializer.is_valid(raise_exception=True)
+    ids = serializer.validated_data['ids']
+    recipes = Recipe.objects.for_user(
+        request.user,
+        RecipeListSerializer.requested_fields(request)
+    ).in_bulk(ids)
+    return RecipeListSerializer(
+        [recipes[pk] for pk in ids if pk in recipes],
+        many=True,
+        context={'request': request}
+    ).data
+
+
+def query_ids(request) -> dict:
+    """Параметр ?ids=1,2,3 в виде данных для BulkIdsSerializer."""
+    return {'ids': [
+        pk.strip()
+        for pk in request.query_params['ids'].split(',')
+        if pk.strip()
+    ]}
 
 
 class CustomUserViewSet(UserViewSet):
@@ -36,12 +125,34 @@ class CustomUserViewSet(UserViewSet):
     queryset = CustomUser.objects.all()
     serializer_class = CustomUserSerializer
     pagination_class = PageLimitPagination
+    lookup_value_regex = r'\d+'
 
     def get_permissions(self):
         if self.action == 'me':
             self.permission_classes = [IsAuthenticated]
         return super().get_permissions()
 
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        user = self.request.user
+        fields = CustomUserSerializer.requested_fields(self.request)
+        if (
+            self.action in ('list', 'retrieve')
+            and user.is_authenticated
+            and (fields is None or 'is_subscribed' in fields)
+        ):
+            queryset = queryset.annotate(
+                is_subscribed=Exists(Subscription.objects.filter(
+                    user=user, following=OuterRef('pk')
+                ))
+            )
+        return queryset
+
+    def get_instance(self):
+        # request.user может быть снимком из кеша аутентификации,
+        # профиль отдаём по актуальной строке.
+        return CustomUser.objects.get(pk=self.request.user.pk)
+
     @action(
         detail=False,
         methods=['get'],
@@ -51,6 +162,20 @@ class CustomUserViewSet(UserViewSet):
         queryset = CustomUser.objects.filter(
             following__user=self.request.user
         )
+        fields = SubscriptionListSerializer.requested_fields(request)
+        if fields is None or 'is_subscribed' in fields:
+            queryset = queryset.annotate(is_subscribed=Value(True))
+        if fields is None or 'recipes' in fields:
+            recipes = Recipe.objects.only(
+                'id', 'name', 'image', 'image_variants', 'cooking_time',
+                'author'
+            )
+            limit = positive_int(request.query_params.get('recipes_limit'))
+            queryset = queryset.prefetch_related(Prefetch(
+                'recipes',
+                queryset=recipes[:limit] if limit else recipes,
+                to_attr='prefetched_recipes'
+            ))
         pages = self.paginate_queryset(queryset)
         serializer = SubscriptionListSerializer(
             pages,
@@ -65,36 +190,82 @@ class CustomUserViewSet(UserViewSet):
         permission_classes=[IsAuthenticated]
     )
     def subscribe(self, request, id):
-        user = request.user
-        following = get_object_or_404(CustomUser, pk=id)
-        serializer = SubscriptionCreateSerializer(
-            data={
-                'user': user.id,
-                'following': following.id
-            },
+        if int(id) == request.user.id:
+            return Response(
+                {'following': 'Нельзя подписаться на себя.'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        if not Subscription.objects.add(request.user, id):
+            get_object_or_404(CustomUser, pk=id)
+            return Response(
+                {'following': 'Уже подписан.'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        serializer = SubscriptionListSerializer(
+            get_object_or_404(CustomUser, pk=id),
             context={'request': request}
         )
-        serializer.is_valid(raise_exception=True)
-        serializer.save()
         return Response(serializer.data, status=status.HTTP_201_CREATED)
 
+    @action(
+        detail=False,
+        methods=['post', 'delete'],
+        permission_classes=[IsAuthenticated],
+        url_path='subscribe/bulk',
+        url_name='subscribe-bulk',
+    )
+    def bulk_subscribe(self, request):
+        return bulk_membership(
+            request,
+            Subscription,
+            CustomUser.objects.exclude(id=request.user.id)
+        )
+
     @subscribe.mapping.delete
     def delete_subscribe(self, request, id):
-        following = get_object_or_404(CustomUser, pk=id)
-
-        delete_cnt, _ = (
-            request.user
-            .follower.filter(following=following)
-            .delete()
-        )
-        if not delete_cnt:
+        if not Subscription.objects.remove(request.user, id):
+            get_object_or_404(CustomUser, pk=id)
             return Response(
                 {'subscribe': 'Нет подписки.'},
                 status=status.HTTP_400_BAD_REQUEST)
         return Response(status=status.HTTP_204_NO_CONTENT)
 
 
-class TagViewSet(viewsets.ReadOnlyModelViewSet):
+class CatalogCacheMixin:
+    """
+    Отдаёт ответы справочника в JSON из кеша готовых ответов
+    (api/catalog.py), Browsable API рендерится как обычно.
+    """
+
+    def cached(self, request, handler, *args, **kwargs):
+        renderer = request.accepted_renderer
+        if (
+            renderer.format != 'json'
+            or request.accepted_media_type != renderer.media_type
+        ):
+            return handler(request, *args, **kwargs)
+
+        key = catalog.catalog_key(request, catalog.catalog_version())
+        response = catalog.get_response(request, key)
+        if response is None:
+            with read_from_primary():
+                data = handler(request, *args, **kwargs).data
+            response = catalog.store_response(
+                request,
+                key,
+                renderer.render(data, renderer.media_type),
+                renderer.media_type
+            )
+        return response
+
+    def list(self, request, *args, **kwargs):
+        return self.cached(request, super().list, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.cached(request, super().retrieve, *args, **kwargs)
+
+
+class TagViewSet(CatalogCacheMixin, viewsets.ReadOnlyModelViewSet):
     """Вьюсет тега."""
     queryset = Tag.objects.all()
     serializer_class = TagSerializer
@@ -102,7 +273,7 @@ class TagViewSet(viewsets.ReadOnlyModelViewSet):
     pagination_class = None
 
 
-class IngredientViewSet(viewsets.ReadOnlyModelViewSet):
+class IngredientViewSet(CatalogCacheMixin, viewsets.ReadOnlyModelViewSet):
     """Вьюсет ингридиента."""
     queryset = Ingredient.objects.all()
     permission_classes = [IsAuthenticatedOrReadOnly]
@@ -120,46 +291,254 @@ class RecipeViewSet(viewsets.ModelViewSet):
     permission_classes = [isAdminOrAuthorOrReadOnly]
     filter_backends = [filters.DjangoFilterBackend]
     filterset_class = RecipeFilterBackend
+    lookup_value_regex = r'\d+'
+
+    def initialize_request(self, request, *args, **kwargs):
+        if self.action_map.get(request.method.lower()) in (
+            'create', 'update', 'partial_update'
+        ):
+            # Изображение из multipart-запроса проверяется по мере
+            # чтения и пишется во временный файл, а не в память.
+            request.upload_handlers = [
+                ImageUploadHandler(request),
+                TemporaryFileUploadHandler(request),
+            ]
+        return super().initialize_request(request, *args, **kwargs)
+
+    def get_queryset(self):
+        if self.action in ('list', 'retrieve'):
+            return Recipe.objects.for_user(
+                self.request.user,
+                RecipeListSerializer.requested_fields(self.request)
+            )
+        return super().get_queryset()
 
     def get_serializer_class(self):
-        if self.action in ('list', 'retrive'):
+        if self.action in ('list', 'retrieve'):
             return RecipeListSerializer
         return RecipeAddSerializer
 
+    def list(self, request, *args, **kwargs):
+        if 'ids' in request.query_params:
+            return Response(recipes_by_ids(request, query_ids(request)))
+        requested = facets.requested_facets(request)
+        response = super().list(request, *args, **kwargs)
+        if 'tags' in requested:
+            response.data['facets'] = {'tags': facets.tag_facets(request)}
+        return response
+
     @action(
-        detail=True,
+        detail=False,
+        methods=['get'],
+        permission_classes=[IsAuthenticated],
+        pagination_class=FeedPagination,
+    )
+    def feed(self, request):
+        positions = self.paginator.paginate_positions(
+            lambda before, limit: FeedEntry.objects.timeline(
+                request.user, before, limit
+            ),
+            request
+        )
+        recipes = Recipe.objects.for_user(
+            request.user,
+            RecipeListSerializer.requested_fields(request)
+        ).in_bulk([pk for _, pk in positions])
+        serializer = RecipeListSerializer(
+            [recipes[pk] for _, pk in positions if pk in recipes],
+            many=True,
+            context={'request': request}
+        )
+        return self.paginator.get_paginated_response(serializer.data)
+
+    @action(detail=False, methods=['get'])
+    def changes(self, request):
+        """
+        Изменения рецептов по журналу: созданные и изменённые рецепты
+        целиком, удалённые — идентификаторами.
+
+        Первая синхронизация начинается с ?since=<время>, следующие —
+        с ?cursor= из предыдущего ответа. Отдаются только записи
+        завершённых транзакций (RecipeChangeQuerySet.committed), поэтому
+        курсор не перескакивает транзакцию, которая закоммитится позже.
+        """
+        params = RecipeChangesSerializer(data=request.query_params)
+        params.is_valid(raise_exception=True)
+        data = params.validated_data
+        queryset = RecipeChange.objects.committed()
+        if 'cursor' in data:
+            queryset = queryset.after(data['cursor'])
+        elif 'since' in data:
+            queryset = queryset.filter(created_at__gte=data['since'])
+        limit = data['limit']
+        rows = list(
+            queryset.values_list('txid', 'id', 'recipe_id', 'action')
+            [:limit + 1]
+        )
+        page = rows[:limit]
+        position = page[-1][:2] if page else data.get('cursor')
+
+        actions, created = {}, set()
+        for _, _, recipe_id, change in page:
+            actions[recipe_id] = change
+            if change == RecipeChange.CREATED:
+                created.add(recipe_id)
+        alive = [
+            recipe_id for recipe_id, change in actions.items()
+            if change != RecipeChange.DELETED
+        ]
+        recipes = Recipe.objects.for_user(
+            request.user,
+            RecipeListSerializer.requested_fields(request)
+        ).in_bulk(alive)
+
+        def payloads(ids):
+            return RecipeListSerializer(
+                [recipes[pk] for pk in ids if pk in recipes],
+                many=True,
+                context={'request': request}
+            ).data
+
+        return Response({
+            'cursor': position and RecipeChange.cursor(position),
+            'has_more': len(rows) > limit,
+            'created': payloads(
+                [pk for pk in alive if pk in created]
+            ),
+            'updated': payloads(
+                [pk for pk in alive if pk not in created]
+            ),
+            'deleted': [
+                recipe_id for recipe_id, change in actions.items()
+                if change == RecipeChange.DELETED
+            ],
+        })
+
+    @read_only_request
+    @action(detail=False, methods=['post'], permission_classes=[AllowAny])
+    def lookup(self, request):
+        return Response(recipes_by_ids(request, request.data))
+
+    @action(detail=True, methods=['get'])
+    def similar(self, request, pk):
+        get_object_or_404(Recipe, pk=pk)
+        limit = min(
+            positive_int(request.query_params.get('limit'))
+            or PAGE_SIZE_PAGINATORS,
+            SIMILAR_RECIPES_MAX_SIZE
+        )
+        scores = dict(similarity.similar(int(pk), limit))
+        recipes = Recipe.objects.only(
+            'id', 'name', 'image', 'image_variants', 'cooking_time'
+        ).in_bulk(scores)
+        results = []
+        for recipe_id, score in scores.items():
+            if recipe_id in recipes:
+                recipe = recipes[recipe_id]
+                recipe.similarity = round(score, 3)
+                results.append(recipe)
+        serializer = SimilarRecipeSerializer(
+            results,
+            many=True,
+            context={'request': request}
+        )
+        return Response(serializer.data)
+
+    @action(detail=False, methods=['get'])
+    def match(self, request):
+        params = IngredientMatchSerializer(data=request.query_params)
+        params.is_valid(raise_exception=True)
+        ids, matched, missing = ingredient_index.index.match(
+            params.validated_data['ingredients'],
+            params.validated_data['exclude']
+        )
+        page = self.paginate_queryset(range(len(ids)))
+        recipes = Recipe.objects.for_user(
+            request.user,
+            RecipeMatchSerializer.requested_fields(request)
+        ).in_bulk(ids[page].tolist())
+        results = []
+        for position in page:
+            recipe = recipes.get(int(ids[position]))
+            if recipe is not None:
+                recipe.matched_count = int(matched[position])
+                recipe.missing_count = int(missing[position])
+                results.append(recipe)
+        serializer = RecipeMatchSerializer(
+            results,
+            many=True,
+            context={'request': request}
+        )
+        return self.get_paginated_response(serializer.data)
+
+    @action(
+        detail=False,
         methods=['post'],
         permission_classes=[IsAuthenticated]
     )
-    def favorite(self, request, pk):
-        serializer = FavoriteRecipeSerializer(
-            data={
-                'user': request.user.id,
-                'recipe': pk
-            },
+    def bulk(self, request):
+        data = request.data
+        if isinstance(data, list):
+            data = {
+                'recipes': data,
+                'atomic': request.query_params.get('atomic', False)
+            }
+        serializer = RecipeBulkCreateSerializer(
+            data=data,
             context={'request': request}
         )
         serializer.is_valid(raise_exception=True)
-        serializer.save()
-        return Response(
-            serializer.data,
-            status=status.HTTP_201_CREATED,
+        if serializer.validated_data['atomic'] and serializer.has_errors:
+            return Response(
+                serializer.get_results(),
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        created = serializer.save()
+        recipes = (
+            Recipe.objects
+            .select_related('author')
+            .prefetch_related('tags', 'recipe__ingredient')
+            .in_bulk([recipe.id for recipe in created])
+        )
+        results = serializer.get_results(
+            [recipes[recipe.id] for recipe in created]
+        )
+        if not created:
+            response_status = status.HTTP_400_BAD_REQUEST
+        elif serializer.has_errors:
+            response_status = status.HTTP_207_MULTI_STATUS
+        else:
+            response_status = status.HTTP_201_CREATED
+        return Response(results, status=response_status)
+
+    @action(
+        detail=True,
+        methods=['post'],
+        permission_classes=[IsAuthenticated]
+    )
+    def favorite(self, request, pk):
+        return self._add_user_recipe(
+            request, FavoriteRecipe, pk, 'Уже добавлен.'
+        )
+
+    @action(
+        detail=False,
+        methods=['post', 'delete'],
+        permission_classes=[IsAuthenticated],
+        url_path='favorite/bulk',
+        url_name='favorite-bulk',
+    )
+    def bulk_favorite(self, request):
+        return bulk_membership(
+            request, FavoriteRecipe, Recipe.objects.all()
         )
 
     @favorite.mapping.delete
     def delete_favorite(self, request, pk):
-        get_object_or_404(Recipe, id=pk)
-        user_id = request.user.id
-        delete_cnt, _ = FavoriteRecipe.objects.filter(
-            user__id=user_id,
-            recipe__id=pk
-        ).delete()
-        if not delete_cnt:
-            return Response(
-                {'subcribe': 'Нет избранного.'},
-                status=status.HTTP_400_BAD_REQUEST
-            )
-        return Response(status=status.HTTP_204_NO_CONTENT)
+        return self._remove_user_recipe(
+            request, FavoriteRecipe, pk, {'subcribe': 'Нет избранного.'}
+        )
 
     @action(
         detail=True,
@@ -167,30 +546,57 @@ class RecipeViewSet(viewsets.ModelViewSet):
         permission_classes=[IsAuthenticated]
     )
     def shopping_cart(self, request, pk):
-        user = request.user
-        serializer = ShoppingCartSerializer(
-            data={
-                'user': user.id,
-                'recipe': pk
-            },
-            context={'request': request}
+        return self._add_user_recipe(
+            request, ShoppingCart, pk, 'Уже в корзине.'
+        )
+
+    @action(
+        detail=False,
+        methods=['post', 'delete'],
+        permission_classes=[IsAuthenticated],
+        url_path='shopping_cart/bulk',
+        url_name='shopping_cart-bulk',
+    )
+    def bulk_shopping_cart(self, request):
+        return bulk_membership(
+            request, ShoppingCart, Recipe.objects.all()
         )
-        serializer.is_valid(raise_exception=True)
-        serializer.save()
-        return Response(serializer.data, status=status.HTTP_201_CREATED)
 
     @shopping_cart.mapping.delete
     def delete_shopping_cart(self, request, pk):
-        get_object_or_404(ShoppingCart, recipe_id=pk)
-        delete_cnt, _ = ShoppingCart.objects.filter(
-            user__id=request.user.id,
-            recipe__id=pk
-        ).delete()
-        if not delete_cnt:
+        return self._remove_user_recipe(
+            request, ShoppingCart, pk, {'subcribe': 'Нет покупок.'}
+        )
+
+    @staticmethod
+    def _add_user_recipe(request, model, pk, error):
+        """
+        Добавляет рецепт в избранное или корзину одним INSERT.
+        Если строка не вставлена, различает отсутствие рецепта (404)
+        и повторное добавление (400).
+        """
+        if not model.objects.add(request.user, pk):
+            get_object_or_404(Recipe, pk=pk)
             return Response(
-                {'subcribe': 'Нет покупок.'},
+                {'recipe': error},
                 status=status.HTTP_400_BAD_REQUEST
             )
+        serializer = RecipeMinifiedSerializer(
+            get_object_or_404(Recipe, pk=pk),
+            context={'request': request}
+        )
+        return Response(serializer.data, status=status.HTTP_201_CREATED)
+
+    @staticmethod
+    def _remove_user_recipe(request, model, pk, error):
+        """
+        Удаляет рецепт из избранного или корзины одним DELETE.
+        Если строка не удалена, различает отсутствие рецепта (404)
+        и отсутствие связи (400).
+        """
+        if not model.objects.remove(request.user, pk):
+            get_object_or_404(Recipe, pk=pk)
+            return Response(error, status=status.HTTP_400_BAD_REQUEST)
         return Response(status=status.HTTP_204_NO_CONTENT)
 
     @action(
@@ -4,4 +4,9 @@ from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'foodgram_backend.settings')
 
-application = get_asgi_application()
+django_application = get_asgi_application()
+
+# Поток событий подключается после настройки Django: модулю нужны модели.
+from api.events import EventStreamApp  # noqa: E402
+
+application = EventStreamApp(django_application)
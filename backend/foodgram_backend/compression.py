@@ -0,0 +1,53 @@
+"""
+Сжатие ответов gzip и brotli.
+
+brotli используется, если установлен пакет Brotli и клиент передал
+br в Accept-Encoding, иначе gzip.
+"""
+import gzip
+
+from foodgram_backend.constants import BROTLI_QUALITY, GZIP_LEVEL
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+
+def accepted_encodings(accept_encoding) -> set:
+    """Кодировки из заголовка Accept-Encoding, кроме запрещённых q=0."""
+    encodings = set()
+    for item in accept_encoding.split(','):
+        coding, _, params = item.strip().partition(';')
+        quality = params.strip().removeprefix('q=')
+        try:
+            if params and float(quality) <= 0:
+                continue
+        except ValueError:
+            continue
+        encodings.add(coding.strip().lower())
+    return encodings
+
+
+def choose_encoding(accept_encoding):
+    """Возвращает 'br', 'gzip' или None."""
+    encodings = accepted_encodings(accept_encoding or '')
+    if brotli is not None and 'br' in encodings:
+        return 'br'
+    if 'gzip' in encodings:
+        return 'gzip'
+    return None
+
+
+def compress(content, encoding, level=None) -> bytes:
+    """
+    Сжимает тело ответа. Результат детерминирован, поэтому его можно
+    кешировать.
+    """
+    if encoding == 'br':
+        return brotli.compress(
+            content, quality=BROTLI_QUALITY if level is None else level
+        )
+    return gzip.compress(
+        content, GZIP_LEVEL if level is None else level, mtime=0
+    )
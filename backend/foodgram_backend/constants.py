@@ -22,6 +22,9 @@ PAGE_SIZE_PAGINATORS = 6
 COOKING_TIME_MIN_VALUE = AMOUNT_MIN_VALUE = 1
 COOKING_TIME_MAX_VALUE = AMOUNT_MAХ_VALUE = 32000
 
+# Журнал изменений рецептов
+RECIPE_CHANGE_ACTION_LENGTH = 7
+
 # RecipeIngredient
 """
 Константы для моделей users
@@ -32,3 +35,115 @@ COOKING_TIME_MAX_VALUE = AMOUNT_MAХ_VALUE = 32000
     USERNAME_MAX_LENGTH,
     PASSWORD_MAX_LENGTH
 ) = [150 for _ in range(4)]
+
+"""
+Константы для пакетных операций
+"""
+RECIPE_BULK_MAX_SIZE = 100
+BULK_CREATE_BATCH_SIZE = 500
+BULK_IDS_MAX_SIZE = 100
+
+"""
+Константы для authentication.py
+"""
+AUTH_TOKEN_CACHE_TTL = 60
+
+"""
+Константы для пула соединений с базой данных
+"""
+DB_POOL_STATS_INTERVAL = 60
+
+"""
+Константы для маршрутизации на реплики
+"""
+REPLICA_PIN_SECONDS = 5
+REPLICA_PIN_COOKIE = 'db_primary'
+
+"""
+Константы для сжатия ответов
+"""
+COMPRESSION_MIN_LENGTH = 200
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 5
+GZIP_CATALOG_LEVEL = 9
+BROTLI_CATALOG_QUALITY = 9
+# brotli только для JSON API: HTML админки и browsable API с CSRF-токеном
+# сжимает GZipMiddleware с защитой от BREACH.
+BROTLI_PATH_PREFIX = '/api/'
+BROTLI_CONTENT_TYPE = 'application/json'
+CATALOG_CACHE_MAX_ENTRIES = 256
+
+"""
+Константы для ленты подписок
+"""
+FEED_FANOUT_MAX_FOLLOWERS = 10000
+FEED_BACKFILL_SIZE = 50
+FEED_PAGE_MAX_SIZE = 50
+
+"""
+Константы для поиска рецептов по ингредиентам
+"""
+INGREDIENT_MATCH_MAX_SIZE = 50
+INGREDIENT_INDEX_MAX_DELTA = 1000
+INGREDIENT_INDEX_CHANGES_TTL = 60 * 60
+
+"""
+Константы для поиска похожих рецептов
+"""
+MINHASH_PERMUTATIONS = 64
+MINHASH_SEED = 20231201
+LSH_BANDS = 16
+LSH_MAX_CANDIDATES = 500
+SIMILARITY_BATCH_SIZE = 1000
+SIMILAR_RECIPES_MAX_SIZE = 20
+
+"""
+Константы для фильтров
+"""
+TAG_SLUGS_CACHE_TTL = 24 * 60 * 60
+FACETS_CACHE_TTL = 10 * 60
+
+"""
+Константы для синхронизации изменений рецептов
+"""
+CHANGES_PAGE_SIZE = 100
+CHANGES_MAX_PAGE_SIZE = 500
+
+"""
+Константы для потока событий о новых рецептах
+"""
+EVENTS_QUEUE_SIZE = 64
+EVENTS_HEARTBEAT_SECONDS = 15
+EVENTS_POLL_SECONDS = 1
+EVENTS_RETRY_MILLISECONDS = 3000
+EVENTS_REPLAY_MAX_SIZE = 100
+EVENTS_MAX_CONNECTIONS = 10000
+EVENTS_FOLLOWS_REFRESH_SECONDS = 15
+
+"""
+Константы для вариантов изображений рецептов
+"""
+IMAGE_VARIANT_SIZES = {'card': 480, 'detail': 960, 'retina': 1920}
+IMAGE_WEBP_QUALITY = 80
+IMAGE_JPEG_QUALITY = 82
+IMAGE_WORKERS = 2
+
+"""
+Константы для загрузки изображений
+"""
+IMAGE_UPLOAD_MAX_SIZE = 10 * 1024 * 1024
+IMAGE_MAX_PIXELS = 40_000_000
+IMAGE_HEADER_MAX_SIZE = 256 * 1024
+IMAGE_UPLOAD_FORMATS = ('JPEG', 'PNG', 'WEBP', 'GIF')
+
+"""
+Константы для хранения медиафайлов
+"""
+MEDIA_HASH_LENGTH = 32
+
+"""
+Константы для очистки медиафайлов
+"""
+MEDIA_GC_GRACE_HOURS = 24
+MEDIA_GC_CHUNK_SIZE = 10000
+MEDIA_GC_MAX_RATE = 200
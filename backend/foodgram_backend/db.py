@@ -0,0 +1,319 @@
+"""
+Вспомогательные функции для работы с базой данных.
+"""
+from django.db import connections, migrations, models, router, transaction
+from django.db.models import F
+from django.db.models.functions import Greatest
+
+
+def insert_existing(model, target_field, target_ids, **values) -> list:
+    """
+    Добавляет записи связи одним запросом
+    INSERT ... SELECT ... ON CONFLICT DO NOTHING RETURNING.
+
+    Записи вставляются только для существующих объектов, на которые
+    ссылается `target_field`, и только если таких связей ещё нет.
+    Вставленные идентификаторы берутся из самого INSERT, поэтому
+    параллельные запросы не могут получить одну и ту же связь.
+
+    Args:
+        model: Модель связи.
+        target_field: Имя внешнего ключа, существование цели
+            которого проверяется.
+        target_ids: Идентификаторы целевых объектов.
+        **values: Значения остальных внешних ключей записи
+            по именам полей.
+
+    Returns:
+        list: Идентификаторы целей, связи с которыми добавлены.
+    """
+    if not target_ids:
+        return []
+    connection = connections[router.db_for_write(model)]
+    quote_name = connection.ops.quote_name
+    target = model._meta.get_field(target_field).related_model._meta
+    target_table = quote_name(target.db_table)
+    target_pk = f'{target_table}.{quote_name(target.pk.column)}'
+    target_column = quote_name(model._meta.get_field(target_field).column)
+
+    columns, selects, params = [target_column], [target_pk], []
+    for name, value in values.items():
+        field = model._meta.get_field(name)
+        columns.append(quote_name(field.column))
+        selects.append(f'CAST(%s AS {field.db_type(connection)})')
+        params.append(value)
+    params.extend(target.pk.get_prep_value(pk) for pk in target_ids)
+
+    sql = (
+        f'INSERT INTO {quote_name(model._meta.db_table)} '
+        f'({", ".join(columns)}) '
+        f'SELECT {", ".join(selects)} FROM {target_table} '
+        f'WHERE {target_pk} IN ({", ".join(["%s"] * len(target_ids))}) '
+        f'ON CONFLICT DO NOTHING RETURNING {target_column}'
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        return [row[0] for row in cursor.fetchall()]
+
+
+def delete_returning(queryset, field) -> list:
+    """
+    Удаляет записи queryset одним запросом DELETE ... RETURNING.
+
+    Сигналы удаления не отправляются, поэтому подходит только для
+    моделей связей без обработчиков и зависимых записей.
+
+    Args:
+        queryset: Удаляемые записи.
+        field: Имя поля, значения которого вернуть.
+
+    Returns:
+        list: Значения поля `field` удалённых записей.
+    """
+    model = queryset.model
+    connection = connections[router.db_for_write(model)]
+    quote_name = connection.ops.quote_name
+    table = quote_name(model._meta.db_table)
+    column = quote_name(model._meta.get_field(field).column)
+    pk = quote_name(model._meta.pk.column)
+    subquery, params = (
+        queryset.values('pk').query
+        .get_compiler(connection=connection).as_sql()
+    )
+    sql = (
+        f'DELETE FROM {table} WHERE {pk} IN ({subquery}) '
+        f'RETURNING {column}'
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        return [row[0] for row in cursor.fetchall()]
+
+
+def update_counter(queryset, field, delta) -> int:
+    """
+    Атомарно изменяет денормализованный счётчик F()-выражением,
+    не опуская его ниже нуля.
+    """
+    if not delta:
+        return 0
+    return queryset.update(**{field: Greatest(F(field) + delta, 0)})
+
+
+class CommitBatch:
+    """Отложенный вызов функции со всеми накопленными id."""
+
+    def __init__(self, func):
+        self.func = func
+        self.ids = set()
+
+    def __call__(self):
+        self.func(sorted(self.ids))
+
+
+def on_commit_batch(func, ids, using=None):
+    """
+    Копит id до коммита текущей транзакции и вызывает `func` один раз
+    со всеми id, сколько бы раз за транзакцию ни изменялись объекты.
+
+    Если накопленный вызов пропал из очереди после отката транзакции
+    или точки сохранения, регистрируется новый. Вне транзакции `func`
+    вызывается сразу, как в transaction.on_commit.
+    """
+    connection = transaction.get_connection(using)
+    batches = connection.__dict__.setdefault('commit_batches', {})
+    batch = batches.get(func)
+    if batch is None or not any(
+        callback is batch for _, callback, _ in connection.run_on_commit
+    ):
+        batch = batches[func] = CommitBatch(func)
+        batch.ids.update(ids)
+        transaction.on_commit(batch, using=using)
+    else:
+        batch.ids.update(ids)
+
+
+class CounterFieldsMixin:
+    """
+    Примесь для моделей с денормализованными счётчиками.
+
+    Счётчики из `counter_fields` меняются только F()-выражениями,
+    поэтому save() существующего объекта их не перезаписывает:
+    экземпляр мог быть загружен раньше (или взят из кеша) и хранить
+    устаревшие значения.
+    """
+    counter_fields = ()
+
+    def save(self, *args, **kwargs):
+        if (
+            not self._state.adding
+            and not args
+            and kwargs.get('update_fields') is None
+            and not kwargs.get('force_insert')
+        ):
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key
+                and field.name not in self.counter_fields
+            ]
+        super().save(*args, **kwargs)
+
+
+class UserLinkQuerySet(models.QuerySet):
+    """
+    QuerySet связей пользователя с объектами: избранное, корзина,
+    подписки.
+
+    Модель связи задаёт `target_field` — внешний ключ на целевой объект
+    и `counter_field` — счётчик связей на целевой модели. Добавление и
+    удаление выполняются одним запросом, который сам возвращает
+    изменённые связи: счётчик и обработчики получают только их, даже
+    если параллельный запрос меняет те же связи. Счётчик обновляется
+    в той же транзакции.
+
+    Эти запросы не отправляют сигналы моделей. Связи, сохранённые
+    или удалённые через ORM (админка, каскадное удаление), обновляют
+    счётчики через links_added/links_removed из recipes/signals.py.
+    """
+
+    def _atomic(self):
+        return transaction.atomic(using=router.db_for_write(self.model))
+
+    def _update_counter(self, target_ids, delta):
+        target = self.model._meta.get_field(self.model.target_field)
+        update_counter(
+            target.related_model.objects.filter(pk__in=target_ids),
+            self.model.counter_field,
+            delta
+        )
+
+    def _linked(self, user, target_ids):
+        """Вызывается в транзакции после добавления связей."""
+
+    def _unlinked(self, user, target_ids):
+        """Вызывается в транзакции после удаления связей."""
+
+    def links_added(self, user, target_ids):
+        """Обновляет счётчики и вызывает обработчики добавленных связей."""
+        self._update_counter(target_ids, 1)
+        if target_ids:
+            self._linked(user, target_ids)
+
+    def links_removed(self, user, target_ids):
+        """Обновляет счётчики и вызывает обработчики удалённых связей."""
+        self._update_counter(target_ids, -1)
+        if target_ids:
+            self._unlinked(user, target_ids)
+
+    def _links(self, user, target_ids):
+        return self.filter(**{
+            'user': user,
+            f'{self.model.target_field}_id__in': target_ids,
+        })
+
+    def add(self, user, target_id) -> bool:
+        """Добавляет связь, если цель существует и связи ещё нет."""
+        return bool(self.add_many(user, [target_id]))
+
+    def remove(self, user, target_id) -> bool:
+        """Удаляет связь, возвращает False если её не было."""
+        return bool(self.remove_many(user, [target_id]))
+
+    def add_many(self, user, target_ids) -> list:
+        """
+        Добавляет связи одним INSERT ... ON CONFLICT DO NOTHING.
+        Возвращает идентификаторы добавленных связей.
+        """
+        with self._atomic():
+            added = insert_existing(
+                self.model, self.model.target_field, target_ids,
+                user=user.id,
+            )
+            self.links_added(user, added)
+        return added
+
+    def remove_many(self, user, target_ids) -> list:
+        """
+        Удаляет связи одним DELETE ... RETURNING.
+        Возвращает идентификаторы удалённых связей.
+        """
+        with self._atomic():
+            removed = delete_returning(
+                self._links(user, target_ids), self.model.target_field
+            )
+            self.links_removed(user, removed)
+        return removed
+
+
+class CommitOrder(models.Expression):
+    """
+    Номер транзакции, которая вставляет строку, для журналов, читаемых
+    по курсору.
+
+    На PostgreSQL это pg_current_xact_id(): транзакции, которые ещё
+    не завершились, имеют номер не меньше pg_snapshot_xmin текущего
+    снимка, поэтому строки с меньшим номером уже не появятся. SQLite
+    выполняет записывающие транзакции по одной: номер — следующий
+    за наибольшим в таблице.
+    """
+    output_field = models.BigIntegerField()
+
+    def __init__(self, target):
+        super().__init__()
+        self.target = target
+
+    def as_sql(self, compiler, connection):
+        quote = connection.ops.quote_name
+        return (
+            f'(SELECT COALESCE(MAX({quote(self.target.column)}), 0) + 1 '
+            f'FROM {quote(self.target.model._meta.db_table)})'
+        ), []
+
+    def as_postgresql(self, compiler, connection):
+        return 'pg_current_xact_id()::text::bigint', []
+
+
+class CommitOrderField(models.BigIntegerField):
+    """
+    Поле, которое при вставке заполняет база данных значением
+    CommitOrder и возвращает его в объект.
+    """
+    db_returning = True
+
+    def __init__(self, *args, **kwargs):
+        kwargs.setdefault('editable', False)
+        super().__init__(*args, **kwargs)
+
+    def pre_save(self, model_instance, add):
+        if add:
+            return CommitOrder(self)
+        return super().pre_save(model_instance, add)
+
+
+class AddIndexConcurrently(migrations.AddIndex):
+    """
+    AddIndex, который на PostgreSQL строит индекс через
+    CREATE INDEX CONCURRENTLY, не блокируя запись в таблицу.
+    На остальных СУБД работает как обычный AddIndex.
+
+    Миграция с этой операцией должна объявлять atomic = False.
+    """
+
+    def database_forwards(self, app_label, schema_editor, from_state,
+                          to_state):
+        if schema_editor.connection.vendor != 'postgresql':
+            return super().database_forwards(
+                app_label, schema_editor, from_state, to_state
+            )
+        model = to_state.apps.get_model(app_label, self.model_name)
+        if self.allow_migrate_model(schema_editor.connection.alias, model):
+            schema_editor.add_index(model, self.index, concurrently=True)
+
+    def database_backwards(self, app_label, schema_editor, from_state,
+                           to_state):
+        if schema_editor.connection.vendor != 'postgresql':
+            return super().database_backwards(
+                app_label, schema_editor, from_state, to_state
+            )
+        model = from_state.apps.get_model(app_label, self.model_name)
+        if self.allow_migrate_model(schema_editor.connection.alias, model):
+            schema_editor.remove_index(model, self.index, concurrently=True)
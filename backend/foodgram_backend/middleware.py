@@ -0,0 +1,179 @@
+"""
+Промежуточные слои проекта.
+"""
+import hashlib
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.cache import cache
+from django.middleware.gzip import GZipMiddleware
+from django.urls import Resolver404, resolve
+from django.utils.cache import patch_vary_headers
+from rest_framework.permissions import SAFE_METHODS
+
+from foodgram_backend.compression import choose_encoding, compress
+from foodgram_backend.constants import (BROTLI_CONTENT_TYPE,
+                                        BROTLI_PATH_PREFIX,
+                                        COMPRESSION_MIN_LENGTH,
+                                        REPLICA_PIN_COOKIE,
+                                        REPLICA_PIN_SECONDS)
+from foodgram_backend.routers import use_replica
+
+
+def read_only_request(view):
+    """
+    Помечает представление или действие вьюсета, которое принимает
+    небезопасный метод (например, POST со списком id в теле), но только
+    читает данные: такой запрос идёт на реплику и не закрепляет клиента
+    за основной базой.
+    """
+    view.read_only_request = True
+    return view
+
+
+class ReplicaRoutingMiddleware:
+    """
+    Разрешает чтение с реплик для безопасных запросов к API и для
+    представлений, помеченных read_only_request.
+
+    После запроса на запись клиент на REPLICA_PIN_SECONDS закрепляется
+    за основной базой (read-your-writes): по токену из заголовка
+    Authorization через кеш и по cookie для браузера, поэтому только
+    что созданный рецепт или избранное видны сразу.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    @staticmethod
+    def pin_key(request):
+        authorization = request.META.get('HTTP_AUTHORIZATION')
+        if not authorization:
+            return None
+        digest = hashlib.sha256(authorization.encode()).hexdigest()
+        return f'db-pin:{digest}'
+
+    @staticmethod
+    def is_read(request):
+        """Запрос не меняет данные: безопасный метод или read_only_request."""
+        if request.method in SAFE_METHODS:
+            return True
+        try:
+            view = resolve(request.path_info).func
+        except Resolver404:
+            return False
+        # Вьюсеты DRF: обработчик действия по методу запроса.
+        actions = getattr(view, 'actions', None)
+        if actions and request.method.lower() in actions:
+            view = getattr(view.cls, actions[request.method.lower()], None)
+        return getattr(view, 'read_only_request', False)
+
+    @staticmethod
+    def may_use_replica(request, is_read):
+        return (
+            is_read
+            and request.path.startswith('/api/')
+            and not request.COOKIES.get(REPLICA_PIN_COOKIE)
+        )
+
+    @staticmethod
+    def set_pin_cookie(response):
+        response.set_cookie(
+            REPLICA_PIN_COOKIE,
+            '1',
+            max_age=REPLICA_PIN_SECONDS,
+            httponly=True,
+            samesite='Lax',
+        )
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        if not settings.REPLICA_DATABASES:
+            return self.get_response(request)
+
+        pin_key = self.pin_key(request)
+        is_read = self.is_read(request)
+        token = use_replica.set(
+            self.may_use_replica(request, is_read)
+            and not (pin_key and cache.get(pin_key))
+        )
+        try:
+            response = self.get_response(request)
+        finally:
+            use_replica.reset(token)
+
+        if not is_read:
+            if pin_key:
+                cache.set(pin_key, True, REPLICA_PIN_SECONDS)
+            self.set_pin_cookie(response)
+        return response
+
+    async def __acall__(self, request):
+        if not settings.REPLICA_DATABASES:
+            return await self.get_response(request)
+
+        pin_key = self.pin_key(request)
+        is_read = self.is_read(request)
+        token = use_replica.set(
+            self.may_use_replica(request, is_read)
+            and not (pin_key and await cache.aget(pin_key))
+        )
+        try:
+            response = await self.get_response(request)
+        finally:
+            use_replica.reset(token)
+
+        if not is_read:
+            if pin_key:
+                await cache.aset(pin_key, True, REPLICA_PIN_SECONDS)
+            self.set_pin_cookie(response)
+        return response
+
+
+class CompressionMiddleware(GZipMiddleware):
+    """
+    Сжимает ответы brotli или gzip в зависимости от Accept-Encoding.
+
+    brotli применяется к обычным JSON-ответам API. HTML (админка,
+    browsable API), потоковые ответы и клиенты без br обрабатываются
+    GZipMiddleware, который маскирует CSRF-токен от атаки BREACH.
+    Ответы с готовым Content-Encoding (например, из кеша справочников)
+    не трогаются.
+    """
+
+    @staticmethod
+    def is_api_json(request, response) -> bool:
+        content_type = response.get('Content-Type', '').split(';')[0]
+        return (
+            request.path.startswith(BROTLI_PATH_PREFIX)
+            and content_type.strip() == BROTLI_CONTENT_TYPE
+        )
+
+    def process_response(self, request, response):
+        if (
+            response.streaming
+            or response.has_header('Content-Encoding')
+            or not self.is_api_json(request, response)
+            or len(response.content) < COMPRESSION_MIN_LENGTH
+            or choose_encoding(
+                request.META.get('HTTP_ACCEPT_ENCODING')
+            ) != 'br'
+        ):
+            return super().process_response(request, response)
+
+        patch_vary_headers(response, ('Accept-Encoding',))
+        compressed = compress(response.content, 'br')
+        if len(compressed) >= len(response.content):
+            return response
+        response.content = compressed
+        response.headers['Content-Length'] = str(len(compressed))
+        etag = response.get('ETag')
+        if etag and etag.startswith('"'):
+            response.headers['ETag'] = 'W/' + etag
+        response.headers['Content-Encoding'] = 'br'
+        return response
@@ -0,0 +1,3 @@
+"""
+Бэкенд PostgreSQL с пулом соединений psycopg_pool.
+"""
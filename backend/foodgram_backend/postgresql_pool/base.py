@@ -0,0 +1,113 @@
+"""
+Бэкенд PostgreSQL, который берёт соединения из пула psycopg_pool.
+
+Пул создаётся лениво в каждом процессе (после fork воркера gunicorn)
+и настраивается через DATABASES[alias]['OPTIONS']['pool']: любые
+аргументы psycopg_pool.ConnectionPool (min_size, max_size, timeout,
+max_idle, max_lifetime). При закрытии соединения Django возвращает
+его в пул; сломанные соединения (например, после перезапуска базы)
+пул отбрасывает, а перед выдачей каждое соединение проверяется.
+"""
+import logging
+import threading
+import time
+
+from django.core.exceptions import ImproperlyConfigured
+from django.db.backends.postgresql import base
+from psycopg import IsolationLevel
+from psycopg_pool import ConnectionPool
+
+from foodgram_backend.constants import DB_POOL_STATS_INTERVAL
+
+logger = logging.getLogger('foodgram.db.pool')
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def pool_stats() -> dict:
+    """
+    Статистика пулов текущего процесса по алиасам баз данных.
+
+    in_use — выданные соединения, waiting — запросы, ожидающие сейчас;
+    waits и wait_ms — количество и суммарное время ожиданий с момента
+    предыдущего вызова.
+    """
+    stats = {}
+    for alias, pool in _pools.items():
+        raw = pool.pop_stats()
+        stats[alias] = {
+            'size': raw.get('pool_size', 0),
+            'max_size': raw.get('pool_max', pool.max_size),
+            'in_use': raw.get('pool_size', 0) - raw.get('pool_available', 0),
+            'waiting': raw.get('requests_waiting', 0),
+            'requests': raw.get('requests_num', 0),
+            'waits': raw.get('requests_queued', 0),
+            'wait_ms': raw.get('requests_wait_ms', 0),
+            'timeouts': raw.get('requests_errors', 0),
+            'connections_lost': raw.get('connections_lost', 0),
+        }
+    return stats
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    """Соединение PostgreSQL, выдаваемое пулом."""
+    stats_logged_at = 0.0
+
+    def get_connection_params(self):
+        params = super().get_connection_params()
+        params.pop('pool', None)
+        return params
+
+    @property
+    def pool(self):
+        pool = _pools.get(self.alias)
+        if pool is not None:
+            return pool
+        with _pools_lock:
+            if self.alias not in _pools:
+                options = self.settings_dict['OPTIONS'].get('pool', {})
+                _pools[self.alias] = ConnectionPool(
+                    kwargs=self.get_connection_params(),
+                    check=ConnectionPool.check_connection,
+                    name=self.alias,
+                    open=True,
+                    **options
+                )
+            return _pools[self.alias]
+
+    def get_new_connection(self, conn_params):
+        isolation_level = self.settings_dict['OPTIONS'].get('isolation_level')
+        try:
+            self.isolation_level = IsolationLevel(
+                isolation_level or IsolationLevel.READ_COMMITTED
+            )
+        except ValueError:
+            raise ImproperlyConfigured(
+                f'Invalid transaction isolation level {isolation_level} '
+                f'specified. Use one of the psycopg.IsolationLevel values.'
+            )
+        connection = self.pool.getconn()
+        if isolation_level is not None:
+            connection.isolation_level = self.isolation_level
+        self.log_stats()
+        return connection
+
+    def _close(self):
+        if self.connection is not None:
+            with self.wrap_database_errors:
+                self.pool.putconn(self.connection)
+
+    @classmethod
+    def log_stats(cls):
+        """Раз в DB_POOL_STATS_INTERVAL секунд пишет статистику в лог."""
+        now = time.monotonic()
+        if now - cls.stats_logged_at < DB_POOL_STATS_INTERVAL:
+            return
+        cls.stats_logged_at = now
+        for alias, stats in pool_stats().items():
+            logger.info(
+                'pool %s: %s',
+                alias,
+                ' '.join(f'{key}={value}' for key, value in stats.items())
+            )
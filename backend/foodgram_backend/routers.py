@@ -0,0 +1,53 @@
+"""
+Маршрутизация запросов между основной базой и репликами.
+"""
+import random
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+
+use_replica = ContextVar('use_replica', default=False)
+
+
+@contextmanager
+def read_from_primary():
+    """
+    Чтение внутри блока идёт с основной базы. Нужно там, где
+    прочитанное сохраняется в кеш под новой версией данных: реплика
+    может ещё не получить изменение, из-за которого версия сменилась.
+    """
+    token = use_replica.set(False)
+    try:
+        yield
+    finally:
+        use_replica.reset(token)
+
+
+class PrimaryReplicaRouter:
+    """
+    Отправляет чтение на реплики, если текущий запрос это разрешает
+    (см. ReplicaRoutingMiddleware), запись и всё остальное — на основную
+    базу. Токены авторизации всегда читаются с основной базы, чтобы
+    только что выданный токен сразу принимался.
+    """
+    primary_only_apps = {'authtoken'}
+
+    def db_for_read(self, model, **hints):
+        if (
+            settings.REPLICA_DATABASES
+            and use_replica.get()
+            and model._meta.app_label not in self.primary_only_apps
+        ):
+            return random.choice(settings.REPLICA_DATABASES)
+        return 'default'
+
+    def db_for_write(self, model, **hints):
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # Реплики получают схему и данные репликацией.
+        return db == 'default'
@@ -36,6 +36,8 @@ AUTH_USER_MODEL = 'users.CustomUser'
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'foodgram_backend.middleware.CompressionMiddleware',
+    'foodgram_backend.middleware.ReplicaRoutingMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -77,8 +79,39 @@ if os.environ.get('DJANGO_SERVER_TYPE') == 'prod':
             'PASSWORD': os.environ.get('POSTGRES_PASSWORD', ''),
             'HOST': os.environ.get('DB_HOST', ''),
             'PORT': os.environ.get('DB_PORT', 5432),
+            # Постоянные соединения с проверкой перед повторным
+            # использованием: переживают перезапуск базы. Под ASGI
+            # каждый запрос выполняется в своём потоке и постоянные
+            # соединения копятся, поэтому там нужен пул DB_POOL_MAX_SIZE.
+            'CONN_MAX_AGE': int(os.environ.get('DB_CONN_MAX_AGE', 0)),
+            'CONN_HEALTH_CHECKS': True,
         }
     }
+    if os.environ.get('DB_POOL_MAX_SIZE'):
+        # Пул psycopg_pool на каждый процесс воркера, размер задаётся
+        # под число одновременных запросов воркера.
+        DATABASES['default'].update({
+            'ENGINE': 'foodgram_backend.postgresql_pool',
+            'CONN_MAX_AGE': 0,
+            'OPTIONS': {
+                'pool': {
+                    'min_size': int(os.environ.get('DB_POOL_MIN_SIZE', 1)),
+                    'max_size': int(os.environ.get('DB_POOL_MAX_SIZE')),
+                    'timeout': float(os.environ.get('DB_POOL_TIMEOUT', 10)),
+                    'max_idle': float(os.environ.get('DB_POOL_MAX_IDLE', 600)),
+                },
+            },
+        })
+    # Реплики только для чтения: хосты PostgreSQL через запятую.
+    for number, host in enumerate(
+        filter(None, os.environ.get('DB_REPLICA_HOSTS', '').split(',')),
+        start=1
+    ):
+        DATABASES[f'replica_{number}'] = {
+            **DATABASES['default'],
+            'HOST': host,
+            'TEST': {'MIRROR': 'default'},
+        }
 else:
 
     DATABASES = {
@@ -87,6 +120,38 @@ else:
             'NAME': BASE_DIR / 'db.sqlite3',
         }
     }
+    if os.environ.get('DB_SQLITE_REPLICA') == 'True':
+        # Локальная проверка маршрутизации: реплика — копия db.sqlite3.
+        DATABASES['replica'] = {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': BASE_DIR / 'db_replica.sqlite3',
+            'TEST': {'MIRROR': 'default'},
+        }
+
+REPLICA_DATABASES = [alias for alias in DATABASES if alias != 'default']
+
+DATABASE_ROUTERS = ['foodgram_backend.routers.PrimaryReplicaRouter']
+
+# Асинхронные представления для чтения рецептов, тегов и ингредиентов
+# (api/async_views.py), рассчитаны на запуск под ASGI.
+ASYNC_READ_VIEWS = os.environ.get('DJANGO_ASYNC_READ_VIEWS', 'True') == 'True'
+
+# Cache
+# https://docs.djangoproject.com/en/4.2/topics/cache/
+
+if os.environ.get('REDIS_URL'):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': os.environ.get('REDIS_URL'),
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }
+    }
 
 # Password validation
 # https://docs.djangoproject.com/en/4.2/ref/settings/#auth-password-validators
@@ -124,6 +189,15 @@ STATIC_ROOT = '/static_backend'
 MEDIA_URL = '/media/'
 MEDIA_ROOT = '/media_files'
 
+STORAGES = {
+    'default': {
+        'BACKEND': 'foodgram_backend.storage.ContentHashStorage',
+    },
+    'staticfiles': {
+        'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage',
+    },
+}
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/4.2/ref/settings/#default-auto-field
 
@@ -135,11 +209,20 @@ REST_FRAMEWORK = {
         'rest_framework.permissions.AllowAny',
     ],
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework.authentication.TokenAuthentication',
+        'api.authentication.CachedTokenAuthentication',
     ],
     'DEFAULT_FILTER_BACKENDS': [
         'django_filters.rest_framework.DjangoFilterBackend',
     ],
+    'DEFAULT_RENDERER_CLASSES': [
+        'api.renderers.ORJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
+    'DEFAULT_PARSER_CLASSES': [
+        'api.parsers.ORJSONParser',
+        'rest_framework.parsers.FormParser',
+        'api.parsers.MultiPartJSONParser',
+    ],
 }
 
 DJOSER = {
@@ -185,5 +268,10 @@ LOGGING = {
             'level': os.getenv('DJANGO_LOG_LEVEL', 'DEBUG'),
             'propagate': False,
         },
+        'foodgram.db.pool': {
+            'handlers': ['console'],
+            'level': os.getenv('DB_POOL_LOG_LEVEL', 'INFO'),
+            'propagate': False,
+        },
     },
 }
@@ -0,0 +1,55 @@
+"""
+Хранилище медиафайлов с именами по содержимому.
+
+Имя файла — начало SHA-256 его содержимого, каталог из upload_to
+сохраняется, а файлы раскладываются по подкаталогам из первых двух
+символов хеша, чтобы в одном каталоге не копились миллионы файлов:
+    recipes/9f/9f86d081884c7d659a2feaa0c55ad015.jpg
+Одинаковые файлы сохраняются один раз, а содержимое файла под
+данным именем никогда не меняется. Поэтому nginx отдаёт /media/
+с Cache-Control: immutable, а новое изображение всегда получает
+новый адрес.
+"""
+import hashlib
+import os
+import posixpath
+
+from django.core.files import File
+from django.core.files.storage import FileSystemStorage
+
+from foodgram_backend.constants import MEDIA_HASH_LENGTH
+
+
+class ContentHashStorage(FileSystemStorage):
+    """Файловое хранилище, которое называет файлы хешем содержимого."""
+
+    @staticmethod
+    def content_hash(content):
+        digest = hashlib.sha256()
+        for chunk in content.chunks():
+            digest.update(chunk)
+        content.seek(0)
+        return digest.hexdigest()[:MEDIA_HASH_LENGTH]
+
+    def hashed_name(self, name, content):
+        directory, filename = posixpath.split(name.replace('\\', '/'))
+        extension = os.path.splitext(filename)[1].lower()
+        digest = self.content_hash(content)
+        return posixpath.join(directory, digest[:2], digest + extension)
+
+    def save(self, name, content, max_length=None):
+        if name is None:
+            name = content.name
+        if not hasattr(content, 'chunks'):
+            content = File(content, name)
+        name = self.hashed_name(name, content)
+        if self.exists(name):
+            # Повторно использованный файл не должен выглядеть старым
+            # для очистки медиафайлов (collect_orphaned_media).
+            try:
+                os.utime(self.path(name))
+                return name
+            except FileNotFoundError:
+                # Очистка удалила файл после проверки, сохраняем заново.
+                pass
+        return super().save(name, content, max_length)
@@ -3,6 +3,7 @@
 """
 from django.contrib import admin
 
+from .images import image_saved
 from .models import (
     Ingredient,
     FavoriteRecipe,
@@ -26,6 +27,12 @@ class RecipeAdmin(admin.ModelAdmin):
         'name',
         'author',
         'pub_date',
+        'favorites_count',
+        'in_carts_count',
+    )
+    readonly_fields = (
+        'favorites_count',
+        'in_carts_count',
     )
     list_filter = (
         'author',
@@ -34,6 +41,11 @@ class RecipeAdmin(admin.ModelAdmin):
     )
     inlines = [IngredientInline]
 
+    def save_model(self, request, obj, form, change):
+        image = form.initial.get('image')
+        super().save_model(request, obj, form, change)
+        image_saved(obj, getattr(image, 'name', image))
+
 
 @admin.register(Ingredient)
 class IngredientAdmin(admin.ModelAdmin):
@@ -0,0 +1,176 @@
+"""
+Уменьшенные копии изображений рецептов.
+
+Для каждого размера из IMAGE_VARIANT_SIZES (наибольшая сторона
+в пикселях) изображение сохраняется в WebP и JPEG без EXIF, с учётом
+ориентации снимка. Копии строятся после коммита транзакции в пуле
+потоков процесса: PIL отпускает GIL при декодировании, масштабировании
+и сжатии, поэтому работа не занимает поток запроса и не блокирует
+остальные потоки. Размеры, которые не меньше исходного изображения,
+не увеличиваются: такие варианты совпадают с предыдущим.
+
+Хранилище называет копии по содержимому (foodgram_backend/storage.py),
+их пути хранятся в Recipe.image_variants:
+    {"card": {"width": 480, "height": 284,
+              "webp": "recipes/variants/3b/3b5d...webp",
+              "jpeg": "recipes/variants/a1/a1f0...jpg"}, ...}
+Поле записывается, только если изображение рецепта не сменилось,
+пока строились копии. Запись обновляет updated_at и журнал изменений,
+как обычное сохранение рецепта, чтобы клиенты синхронизации получили
+новые варианты.
+"""
+import io
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import connections, transaction
+from django.utils import timezone
+from PIL import Image, ImageOps
+
+from foodgram_backend.constants import (IMAGE_JPEG_QUALITY,
+                                        IMAGE_VARIANT_SIZES,
+                                        IMAGE_WEBP_QUALITY, IMAGE_WORKERS)
+from .models import Recipe, RecipeChange
+
+logger = logging.getLogger('foodgram.images')
+
+VARIANTS_DIR = 'recipes/variants'
+FORMATS = {
+    'webp': ('WEBP', 'webp', {'quality': IMAGE_WEBP_QUALITY, 'method': 4}),
+    'jpeg': ('JPEG', 'jpg', {
+        'quality': IMAGE_JPEG_QUALITY, 'optimize': True, 'progressive': True,
+    }),
+}
+
+_executor = None
+
+
+def executor():
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            IMAGE_WORKERS, thread_name_prefix='recipe-images'
+        )
+    return _executor
+
+
+def flatten(image):
+    """RGB-копия изображения; прозрачные области — на белом фоне."""
+    if image.mode in ('RGBA', 'LA') or 'transparency' in image.info:
+        image = image.convert('RGBA')
+        background = Image.new('RGB', image.size, 'white')
+        background.paste(image, mask=image.getchannel('A'))
+        return background
+    return image.convert('RGB')
+
+
+def render_variants(source):
+    """
+    Строит копии изображения из файла source.
+
+    Returns:
+        tuple: Варианты по размерам и содержимое файлов по путям.
+    """
+    largest = max(IMAGE_VARIANT_SIZES.values())
+    with Image.open(source) as image:
+        # JPEG декодируется сразу в уменьшенном виде (1/2 … 1/8).
+        image.draft('RGB', (largest, largest))
+        # Профиль CMYK к RGB-копии не подходит.
+        icc_profile = (
+            image.info.get('icc_profile') if image.mode == 'RGB' else None
+        )
+        image = flatten(ImageOps.exif_transpose(image))
+
+    variants, files = {}, {}
+    previous = None
+    for variant, size in sorted(
+        IMAGE_VARIANT_SIZES.items(), key=lambda item: -item[1]
+    ):
+        image = image.copy()
+        image.thumbnail((size, size), Image.LANCZOS)
+        if previous and variants[previous]['width'] == image.width:
+            variants[variant] = dict(variants[previous])
+            continue
+        variants[variant] = {'width': image.width, 'height': image.height}
+        for key, (image_format, extension, options) in FORMATS.items():
+            path = f'{VARIANTS_DIR}/{variant}.{extension}'
+            content = io.BytesIO()
+            image.save(
+                content, image_format, icc_profile=icc_profile, **options
+            )
+            variants[variant][key] = path
+            files[path] = content.getvalue()
+        previous = variant
+    return {name: variants[name] for name in IMAGE_VARIANT_SIZES}, files
+
+
+def build_variants(recipe_id):
+    """
+    Строит и сохраняет копии изображения рецепта.
+
+    Returns:
+        bool: Сохранены ли варианты.
+    """
+    name = (
+        Recipe.objects.filter(pk=recipe_id)
+        .values_list('image', flat=True)
+        .first()
+    )
+    if not name:
+        return False
+    with default_storage.open(name) as source:
+        variants, files = render_variants(source)
+    saved = {
+        path: default_storage.save(path, ContentFile(content))
+        for path, content in files.items()
+    }
+    for variant in variants.values():
+        for key in FORMATS:
+            variant[key] = saved[variant[key]]
+    with transaction.atomic():
+        updated = (
+            Recipe.objects.filter(pk=recipe_id, image=name)
+            .update(image_variants=variants, updated_at=timezone.now())
+        )
+        if updated:
+            RecipeChange.objects.create(
+                recipe_id=recipe_id, action=RecipeChange.UPDATED
+            )
+    return bool(updated)
+
+
+def build_in_background(recipe_id):
+    try:
+        build_variants(recipe_id)
+    except Exception:
+        logger.exception(
+            'Не удалось построить варианты изображения рецепта %s',
+            recipe_id
+        )
+    finally:
+        # Соединения потока пула не закрываются обработчиком запросов.
+        connections.close_all()
+
+
+def image_saved(recipe, previous_name):
+    """
+    Сбрасывает варианты сохранённого рецепта и строит их заново, если
+    у него другой файл изображения. Повторная загрузка того же снимка
+    получает то же имя файла, и готовые варианты остаются.
+    """
+    if recipe.image.name == previous_name:
+        return
+    recipe.image_variants = {}
+    Recipe.objects.filter(pk=recipe.pk).update(image_variants={})
+    images_changed([recipe.pk])
+
+
+def images_changed(recipe_ids):
+    """Строит копии изображений рецептов после коммита транзакции."""
+    recipe_ids = list(recipe_ids)
+    transaction.on_commit(lambda: [
+        executor().submit(build_in_background, recipe_id)
+        for recipe_id in recipe_ids
+    ])
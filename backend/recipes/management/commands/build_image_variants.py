@@ -0,0 +1,57 @@
+"""
+Команда построения уменьшенных копий изображений рецептов.
+"""
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from foodgram_backend.constants import IMAGE_WORKERS
+from recipes.images import build_variants
+from recipes.models import Recipe
+
+
+class Command(BaseCommand):
+    """
+    Строит варианты изображений рецептов, у которых их ещё нет.
+    Новые и изменённые изображения обрабатываются сами при
+    сохранении, команда нужна для существующих рецептов и после смены
+    размеров или качества вариантов (--all).
+    """
+    help = 'Строит уменьшенные копии изображений рецептов'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--all',
+            action='store_true',
+            help='Перестроить варианты всех рецептов',
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=IMAGE_WORKERS,
+            help='Количество потоков',
+        )
+
+    def handle(self, *args, **options):
+        recipes = Recipe.objects.exclude(image='')
+        if not options['all']:
+            recipes = recipes.filter(image_variants={})
+        recipe_ids = list(recipes.order_by('id').values_list('id', flat=True))
+        started = time.perf_counter()
+        with ThreadPoolExecutor(options['workers']) as executor:
+            results = list(executor.map(self.build, recipe_ids))
+        self.stdout.write(self.style.SUCCESS(
+            f'Обработано рецептов: {sum(results)} из {len(recipe_ids)}, '
+            f'{time.perf_counter() - started:.1f} с'
+        ))
+
+    def build(self, recipe_id):
+        try:
+            return build_variants(recipe_id)
+        except Exception as exc:
+            self.stderr.write(f'Рецепт {recipe_id}: {exc}')
+            return False
+        finally:
+            connections.close_all()
@@ -0,0 +1,49 @@
+"""
+Команда построения индекса похожих рецептов.
+"""
+import time
+
+from django.core.management.base import BaseCommand
+
+from foodgram_backend.constants import SIMILARITY_BATCH_SIZE
+from recipes.models import Recipe
+from recipes.similarity import update_signatures
+
+
+class Command(BaseCommand):
+    """
+    Пересчитывает MinHash-сигнатуры и корзины LSH всех рецептов
+    пакетами. Новые и изменённые рецепты обновляются сами при
+    сохранении, команда нужна для первичного построения и после
+    смены параметров MinHash.
+    """
+    help = 'Строит индекс похожих рецептов (MinHash/LSH)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=SIMILARITY_BATCH_SIZE,
+            help='Количество рецептов в пакете',
+        )
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        started = time.perf_counter()
+        total = last_id = 0
+        while True:
+            batch = list(
+                Recipe.objects
+                .filter(id__gt=last_id)
+                .order_by('id')
+                .values_list('id', flat=True)[:batch_size]
+            )
+            if not batch:
+                break
+            total += update_signatures(batch)
+            last_id = batch[-1]
+            self.stdout.write(f'Обработано рецептов до id {last_id}')
+        self.stdout.write(self.style.SUCCESS(
+            f'Сигнатур: {total}, '
+            f'{time.perf_counter() - started:.1f} с'
+        ))
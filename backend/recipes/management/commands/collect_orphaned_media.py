@@ -0,0 +1,231 @@
+"""
+Команда удаления медиафайлов рецептов, на которые нет ссылок.
+"""
+import hashlib
+import os
+import shutil
+import time
+from array import array
+from pathlib import Path
+
+import numpy as np
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from foodgram_backend.constants import (MEDIA_GC_CHUNK_SIZE,
+                                        MEDIA_GC_GRACE_HOURS,
+                                        MEDIA_GC_MAX_RATE)
+from recipes.models import Recipe
+
+MEDIA_DIR = 'recipes'
+
+
+def path_hash(name):
+    """64-битный хеш пути файла относительно MEDIA_ROOT."""
+    return int.from_bytes(
+        hashlib.blake2b(name.encode(), digest_size=8).digest(), 'little'
+    )
+
+
+def scan(root, exclude=None):
+    """Файлы каталога root и его подкаталогов без чтения списка целиком."""
+    stack = [root]
+    while stack:
+        with os.scandir(stack.pop()) as entries:
+            for entry in entries:
+                if entry.is_dir(follow_symlinks=False):
+                    if entry.path != exclude:
+                        stack.append(entry.path)
+                elif entry.is_file(follow_symlinks=False):
+                    yield entry
+
+
+class Command(BaseCommand):
+    """
+    Удаляет или переносит в карантин файлы из MEDIA_ROOT/recipes/,
+    на которые не ссылается ни один рецепт: ни Recipe.image, ни
+    варианты изображения из Recipe.image_variants.
+
+    Ссылки загружаются из базы пакетами в отсортированный массив
+    64-битных хешей путей (8 байт на файл), каталог читается потоком
+    через os.scandir и сверяется пакетами, поэтому память не зависит
+    от числа файлов на диске. Совпадение хешей может только оставить
+    лишний файл, но не удалить нужный. Файлы моложе --grace-hours
+    не трогаются: их рецепт мог ещё не закоммититься. Хранилище
+    обновляет время изменения файла при повторной загрузке того же
+    содержимого.
+
+    Пример: посмотреть, что будет удалено
+        python manage.py collect_orphaned_media --dry-run
+    """
+    help = 'Удаляет медиафайлы рецептов, на которые нет ссылок'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Только показать файлы, ничего не удаляя',
+        )
+        parser.add_argument(
+            '--quarantine',
+            help='Каталог, куда переносить файлы вместо удаления',
+        )
+        parser.add_argument(
+            '--grace-hours',
+            type=float,
+            default=MEDIA_GC_GRACE_HOURS,
+            help='Не трогать файлы моложе этого количества часов',
+        )
+        parser.add_argument(
+            '--rate',
+            type=int,
+            default=MEDIA_GC_MAX_RATE,
+            help='Не больше стольких удалений в секунду',
+        )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=MEDIA_GC_CHUNK_SIZE,
+            help='Размер пакета при чтении базы и каталога',
+        )
+
+    def handle(self, *args, **options):
+        media_root = os.path.abspath(settings.MEDIA_ROOT)
+        root = os.path.join(media_root, MEDIA_DIR)
+        quarantine = options['quarantine']
+        if quarantine:
+            quarantine = os.path.abspath(quarantine)
+        if not os.path.isdir(root):
+            raise CommandError(f'Каталог {root} не найден')
+
+        started = time.monotonic()
+        referenced = self.referenced(options['chunk_size'])
+        self.stdout.write(f'Ссылок на файлы: {len(referenced)}')
+
+        self.dry_run = options['dry_run']
+        self.quarantine = quarantine
+        self.media_root = media_root
+        self.rate = options['rate']
+        self.stats = dict.fromkeys(
+            ('scanned', 'young', 'orphans', 'removed', 'bytes', 'errors'), 0
+        )
+        self.removals_started = None
+        deadline = time.time() - options['grace_hours'] * 60 * 60
+
+        batch = []
+        for entry in scan(root, exclude=quarantine):
+            batch.append(entry)
+            if len(batch) == options['chunk_size']:
+                self.collect(batch, referenced, deadline)
+                batch = []
+        self.collect(batch, referenced, deadline)
+        self.report(time.monotonic() - started)
+
+    @staticmethod
+    def referenced(chunk_size):
+        """Отсортированные хеши путей всех файлов, на которые есть ссылки."""
+        hashes = array('Q')
+        rows = (
+            Recipe.objects
+            .values_list('image', 'image_variants')
+            .iterator(chunk_size=chunk_size)
+        )
+        for image, variants in rows:
+            if image:
+                hashes.append(path_hash(image))
+            for variant in (variants or {}).values():
+                hashes.extend(
+                    path_hash(value) for value in variant.values()
+                    if isinstance(value, str)
+                )
+        return np.unique(np.frombuffer(hashes, dtype=np.uint64))
+
+    def collect(self, entries, referenced, deadline):
+        if not entries:
+            return
+        names = [
+            Path(os.path.relpath(entry.path, self.media_root)).as_posix()
+            for entry in entries
+        ]
+        hashes = np.fromiter(
+            (path_hash(name) for name in names),
+            dtype=np.uint64,
+            count=len(names),
+        )
+        if len(referenced):
+            positions = np.minimum(
+                np.searchsorted(referenced, hashes), len(referenced) - 1
+            )
+            found = referenced[positions] == hashes
+        else:
+            found = np.zeros(len(names), dtype=bool)
+        self.stats['scanned'] += len(entries)
+        for entry, name, is_referenced in zip(entries, names, found):
+            if is_referenced:
+                continue
+            try:
+                stat = entry.stat(follow_symlinks=False)
+            except FileNotFoundError:
+                continue
+            if stat.st_mtime > deadline:
+                self.stats['young'] += 1
+                continue
+            self.stats['orphans'] += 1
+            if self.dry_run:
+                self.stdout.write(name)
+                self.stats['bytes'] += stat.st_size
+                continue
+            self.throttle()
+            try:
+                # Файл могли загрузить повторно, пока длилась пауза.
+                if os.stat(entry.path).st_mtime > deadline:
+                    self.stats['orphans'] -= 1
+                    self.stats['young'] += 1
+                    continue
+                self.remove(entry.path, name)
+            except FileNotFoundError:
+                self.stats['orphans'] -= 1
+                continue
+            except OSError as exc:
+                self.stats['errors'] += 1
+                self.stderr.write(f'{name}: {exc}')
+                continue
+            self.stats['removed'] += 1
+            self.stats['bytes'] += stat.st_size
+
+    def throttle(self):
+        """Ограничивает удаления скоростью --rate в секунду."""
+        now = time.monotonic()
+        if self.removals_started is None:
+            self.removals_started = now
+        delay = (
+            self.removals_started + self.stats['removed'] / self.rate - now
+        )
+        if delay > 0:
+            time.sleep(delay)
+
+    def remove(self, path, name):
+        if not self.quarantine:
+            os.remove(path)
+            return
+        target = os.path.join(self.quarantine, name)
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        shutil.move(path, target)
+
+    def report(self, elapsed):
+        stats = self.stats
+        action = (
+            'будет удалено' if self.dry_run
+            else 'перенесено в карантин' if self.quarantine
+            else 'удалено'
+        )
+        count = stats['orphans'] if self.dry_run else stats['removed']
+        self.stdout.write(self.style.SUCCESS(
+            f'Просмотрено файлов: {stats["scanned"]}, '
+            f'без ссылок: {stats["orphans"]}, '
+            f'моложе срока: {stats["young"]}, '
+            f'{action}: {count} '
+            f'({stats["bytes"] / (1024 * 1024):.1f} МБ), '
+            f'ошибок: {stats["errors"]}, '
+            f'{elapsed:.1f} с'
+        ))
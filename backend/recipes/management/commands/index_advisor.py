@@ -0,0 +1,144 @@
+"""
+Команда для проверки покрытия индексами основных запросов API.
+"""
+import re
+from types import SimpleNamespace
+
+from django.contrib.auth.models import AnonymousUser
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from api.filters import RecipeFilterBackend
+from foodgram_backend.constants import PAGE_SIZE_PAGINATORS
+from recipes.models import (FavoriteRecipe, Ingredient, Recipe,
+                            RecipeIngredient, ShoppingCart, Tag)
+from users.models import CustomUser, Subscription
+
+SEQ_SCAN_PATTERNS = {
+    'postgresql': re.compile(r'Seq Scan on (\w+)'),
+    'sqlite': re.compile(r'\bSCAN (\w+)$', re.MULTILINE),
+}
+
+
+class Command(BaseCommand):
+    """
+    Прогоняет типовые запросы API через EXPLAIN и сообщает
+    о последовательном чтении больших таблиц.
+    """
+    help = 'Проверка покрытия индексами запросов API через EXPLAIN'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--min-rows',
+            type=int,
+            default=10000,
+            help='Сканирование таблиц меньше этого размера не считается '
+                 'проблемой',
+        )
+        parser.add_argument(
+            '--verbose-plans',
+            action='store_true',
+            help='Печатать планы запросов целиком',
+        )
+        parser.add_argument(
+            '--fail',
+            action='store_true',
+            help='Завершиться с ошибкой при найденных проблемах (для CI)',
+        )
+
+    @staticmethod
+    def filtered_recipes(user, **params):
+        """Запрос так же, как его строит RecipeViewSet."""
+        return RecipeFilterBackend(
+            data=params,
+            queryset=Recipe.objects.all(),
+            request=SimpleNamespace(user=user or AnonymousUser()),
+        ).qs[:PAGE_SIZE_PAGINATORS]
+
+    def get_shapes(self):
+        user = CustomUser.objects.order_by('pk').first()
+        author_id = (
+            Recipe.objects.values_list('author_id', flat=True).first() or 1
+        )
+        tag = Tag.objects.values_list('slug', flat=True).first() or 'tag'
+        user_id = user.pk if user else 1
+        return {
+            'recipes_list': Recipe.objects.all()[:PAGE_SIZE_PAGINATORS],
+            'recipes_by_author': self.filtered_recipes(
+                user, author=author_id
+            ),
+            'recipes_by_tag': self.filtered_recipes(user, tags=[tag]),
+            'recipes_popular': self.filtered_recipes(
+                user, ordering='popular'
+            ),
+            'recipes_quickest': self.filtered_recipes(
+                user, ordering='quickest', cooking_time__lte=30
+            ),
+            'recipes_favorited': self.filtered_recipes(
+                user, is_favorited=1
+            ),
+            'recipes_in_shopping_cart': self.filtered_recipes(
+                user, is_in_shopping_cart=1
+            ),
+            'favorite_exists': FavoriteRecipe.objects.filter(
+                user_id=user_id, recipe_id=1
+            ),
+            'shopping_cart_ingredients': RecipeIngredient.objects.filter(
+                recipe__shopping_carts__user_id=user_id
+            ).values_list('ingredient__name', 'amount'),
+            'subscriptions': CustomUser.objects.filter(
+                following__user_id=user_id
+            )[:PAGE_SIZE_PAGINATORS],
+            'followers': Subscription.objects.filter(
+                following_id=author_id
+            ).values_list('user_id', flat=True),
+            'ingredient_search': Ingredient.objects.filter(
+                name__istartswith='а'
+            ),
+        }
+
+    @staticmethod
+    def table_rows():
+        """Размеры таблиц: оценка планировщика или точный подсчёт."""
+        models = (Recipe, RecipeIngredient, FavoriteRecipe, ShoppingCart,
+                  Ingredient, Tag, CustomUser, Subscription,
+                  Recipe.tags.through)
+        if connection.vendor == 'postgresql':
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    'SELECT relname, reltuples::bigint FROM pg_class '
+                    'WHERE relname = ANY(%s)',
+                    [[model._meta.db_table for model in models]]
+                )
+                return dict(cursor.fetchall())
+        return {
+            model._meta.db_table: model.objects.count() for model in models
+        }
+
+    def handle(self, *args, **options):
+        pattern = SEQ_SCAN_PATTERNS.get(connection.vendor)
+        if pattern is None:
+            raise CommandError(
+                f'EXPLAIN для {connection.vendor} не поддерживается'
+            )
+        rows = self.table_rows()
+        problems = 0
+        for name, queryset in self.get_shapes().items():
+            plan = queryset.explain()
+            scans = [
+                table for table in pattern.findall(plan)
+                if rows.get(table, 0) >= options['min_rows']
+            ]
+            if scans:
+                problems += 1
+                self.stdout.write(self.style.WARNING(
+                    f'{name}: последовательное чтение {", ".join(scans)}'
+                ))
+            else:
+                self.stdout.write(f'{name}: ok')
+            if options['verbose_plans']:
+                self.stdout.write(plan)
+
+        if problems and options['fail']:
+            raise CommandError(f'Запросов без индекса: {problems}')
+        self.stdout.write(self.style.SUCCESS('Проверка индексов завершена'))
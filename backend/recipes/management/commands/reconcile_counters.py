@@ -0,0 +1,73 @@
+"""
+Команда для сверки денормализованных счётчиков.
+"""
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+from recipes.models import FavoriteRecipe, Recipe, ShoppingCart
+from users.models import CustomUser, Subscription
+
+COUNTERS = (
+    (Recipe, 'favorites_count', FavoriteRecipe, 'recipe'),
+    (Recipe, 'in_carts_count', ShoppingCart, 'recipe'),
+    (CustomUser, 'recipes_count', Recipe, 'author'),
+    (CustomUser, 'followers_count', Subscription, 'following'),
+)
+
+
+class Command(BaseCommand):
+    """Команда пересчёта счётчиков, разошедшихся с данными."""
+    help = (
+        'Пересчитывает favorites_count, in_carts_count, '
+        'recipes_count и followers_count'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Только показать расхождения, не исправляя их',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Количество строк в одном UPDATE',
+        )
+
+    @staticmethod
+    def actual_count(related, fk):
+        return Coalesce(Subquery(
+            related.objects
+            .filter(**{fk: OuterRef('pk')})
+            .order_by()
+            .values(fk)
+            .annotate(total=Count('pk'))
+            .values('total')
+        ), 0)
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        for model, field, related, fk in COUNTERS:
+            actual = self.actual_count(related, fk)
+            drifted = list(
+                model.objects
+                .alias(actual=actual)
+                .exclude(**{field: F('actual')})
+                .values_list('pk', flat=True)
+            )
+            label = f'{model._meta.model_name}.{field}'
+            if options['dry_run']:
+                self.stdout.write(f'{label}: расхождений {len(drifted)}')
+                continue
+
+            for start in range(0, len(drifted), batch_size):
+                with transaction.atomic():
+                    model.objects.filter(
+                        pk__in=drifted[start:start + batch_size]
+                    ).update(**{field: actual})
+            self.stdout.write(f'{label}: исправлено {len(drifted)}')
+
+        self.stdout.write(self.style.SUCCESS('Сверка счётчиков завершена'))
@@ -0,0 +1,44 @@
+# Generated by Django 4.2.7 on 2026-10-19 08:55
+
+from django.db import migrations, models
+from django.db.models import Min
+
+
+def remove_duplicates(apps, schema_editor):
+    """Оставляет по одной записи на пару пользователь-рецепт."""
+    for model_name in ('FavoriteRecipe', 'ShoppingCart'):
+        model = apps.get_model('recipes', model_name)
+        keep = (
+            model.objects
+            .values('user', 'recipe')
+            .annotate(keep_id=Min('id'))
+            .values('keep_id')
+        )
+        model.objects.exclude(id__in=keep).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='favoriterecipe',
+            options={'default_related_name': 'favorite_recipes', 'ordering': ['user'], 'verbose_name': 'Избранный рецепт', 'verbose_name_plural': 'Избранные рецепты'},
+        ),
+        migrations.AlterModelOptions(
+            name='shoppingcart',
+            options={'default_related_name': 'shopping_carts', 'ordering': ['user'], 'verbose_name': 'Список покупок', 'verbose_name_plural': 'Списки покупок'},
+        ),
+        migrations.RunPython(remove_duplicates, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='favoriterecipe',
+            constraint=models.UniqueConstraint(fields=('user', 'recipe'), name='favoriterecipe_unique_user_recipe', violation_error_message={'user, recipe': 'Поля дожный быть уникальны'}),
+        ),
+        migrations.AddConstraint(
+            model_name='shoppingcart',
+            constraint=models.UniqueConstraint(fields=('user', 'recipe'), name='shoppingcart_unique_user_recipe', violation_error_message={'user, recipe': 'Поля дожный быть уникальны'}),
+        ),
+    ]
@@ -0,0 +1,57 @@
+# Generated by Django 4.2.7 on 2026-10-19 08:57
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def fill_counters(apps, schema_editor):
+    """Заполняет денормализованные счётчики по существующим данным."""
+    recipe = apps.get_model('recipes', 'Recipe')
+    user = apps.get_model('users', 'CustomUser')
+    counters = (
+        (recipe, 'favorites_count', 'FavoriteRecipe', 'recipe'),
+        (recipe, 'in_carts_count', 'ShoppingCart', 'recipe'),
+        (user, 'recipes_count', 'Recipe', 'author'),
+    )
+    for model, field, related_name, fk in counters:
+        related = apps.get_model('recipes', related_name)
+        model.objects.update(**{field: Coalesce(Subquery(
+            related.objects
+            .filter(**{fk: OuterRef('pk')})
+            .order_by()
+            .values(fk)
+            .annotate(total=Count('pk'))
+            .values('total')
+        ), 0)})
+    subscription = apps.get_model('users', 'Subscription')
+    user.objects.update(followers_count=Coalesce(Subquery(
+        subscription.objects
+        .filter(following=OuterRef('pk'))
+        .order_by()
+        .values('following')
+        .annotate(total=Count('pk'))
+        .values('total')
+    ), 0))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0002_user_recipe_unique'),
+        ('users', '0003_user_counters'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='favorites_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='В избранном'),
+        ),
+        migrations.AddField(
+            model_name='recipe',
+            name='in_carts_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='В списках покупок'),
+        ),
+        migrations.RunPython(fill_counters, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,57 @@
+# Generated by Django 4.2.7 on 2026-10-19 09:00
+
+from django.db import migrations, models
+
+from foodgram_backend.db import AddIndexConcurrently
+
+RECIPE_TAGS_INDEX = 'recipe_tags_tag_recipe_idx'
+
+
+def create_recipe_tags_index(apps, schema_editor):
+    """
+    Индекс (tag_id, recipe_id) на автоматической M2M-таблице тегов:
+    фильтр по тегу проходит по нему без чтения таблицы.
+    """
+    concurrently = (
+        'CONCURRENTLY '
+        if schema_editor.connection.vendor == 'postgresql' else ''
+    )
+    table = apps.get_model('recipes', 'Recipe').tags.through._meta.db_table
+    schema_editor.execute(
+        f'CREATE INDEX {concurrently}IF NOT EXISTS {RECIPE_TAGS_INDEX} '
+        f'ON {schema_editor.quote_name(table)} (tag_id, recipe_id)'
+    )
+
+
+def drop_recipe_tags_index(apps, schema_editor):
+    concurrently = (
+        'CONCURRENTLY '
+        if schema_editor.connection.vendor == 'postgresql' else ''
+    )
+    schema_editor.execute(
+        f'DROP INDEX {concurrently}IF EXISTS {RECIPE_TAGS_INDEX}'
+    )
+
+
+class Migration(migrations.Migration):
+
+    atomic = False
+
+    dependencies = [
+        ('recipes', '0003_recipe_counters'),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name='recipe',
+            index=models.Index(fields=['-pub_date'], name='recipe_pub_date_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='recipe',
+            index=models.Index(fields=['author', '-pub_date'], name='recipe_author_pub_date_idx'),
+        ),
+        migrations.RunPython(
+            create_recipe_tags_index,
+            drop_recipe_tags_index,
+        ),
+    ]
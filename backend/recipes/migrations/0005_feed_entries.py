@@ -0,0 +1,85 @@
+# Generated by Django 4.2.7 on 2026-10-19 09:21
+
+from collections import defaultdict
+from itertools import islice
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Window
+from django.db.models.functions import RowNumber
+import django.db.models.deletion
+
+from foodgram_backend import constants
+
+
+def fill_feeds(apps, schema_editor):
+    """Заполняет ленты подписчиков последними рецептами авторов."""
+    recipe = apps.get_model('recipes', 'Recipe')
+    feed_entry = apps.get_model('recipes', 'FeedEntry')
+    subscription = apps.get_model('users', 'Subscription')
+
+    recent = defaultdict(list)
+    recipes = (
+        recipe.objects
+        .filter(
+            author__followers_count__lte=constants.FEED_FANOUT_MAX_FOLLOWERS
+        )
+        .annotate(position=Window(
+            RowNumber(),
+            partition_by='author',
+            order_by=('-pub_date', '-id'),
+        ))
+        .filter(position__lte=constants.FEED_BACKFILL_SIZE)
+        .values_list('id', 'author_id', 'pub_date')
+    )
+    for recipe_id, author_id, pub_date in recipes:
+        recent[author_id].append((recipe_id, pub_date))
+
+    entries = (
+        feed_entry(
+            user_id=user_id,
+            recipe_id=recipe_id,
+            author_id=author_id,
+            pub_date=pub_date,
+        )
+        for user_id, author_id in (
+            subscription.objects
+            .values_list('user_id', 'following_id')
+            .iterator()
+        )
+        for recipe_id, pub_date in recent[author_id]
+    )
+    while batch := list(islice(entries, constants.BULK_CREATE_BATCH_SIZE)):
+        feed_entry.objects.bulk_create(batch)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('recipes', '0004_hot_path_indexes'),
+        ('users', '0004_hot_path_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FeedEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('pub_date', models.DateTimeField(verbose_name='Дата публикации')),
+                ('author', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL, verbose_name='Автор рецепта')),
+                ('recipe', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='feed_entries', to='recipes.recipe', verbose_name='Рецепт')),
+                ('user', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='feed_entries', to=settings.AUTH_USER_MODEL, verbose_name='Пользователь')),
+            ],
+            options={
+                'verbose_name': 'Запись ленты',
+                'verbose_name_plural': 'Записи лент',
+                'indexes': [models.Index(fields=['user', '-pub_date', '-recipe'], name='feed_user_pub_date_idx'), models.Index(fields=['user', 'author'], name='feed_user_author_idx')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='feedentry',
+            constraint=models.UniqueConstraint(fields=('user', 'recipe'), name='unique_feed_entry'),
+        ),
+        migrations.RunPython(fill_feeds, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,59 @@
+# Generated by Django 4.2.7 on 2026-10-19 09:31
+
+from itertools import islice
+
+from django.db import migrations, models
+from django.db.models import F, OuterRef, Subquery
+
+from foodgram_backend import constants
+
+
+def fill_changes(apps, schema_editor):
+    """
+    Дата изменения существующих рецептов — дата публикации, журнал
+    начинается с их создания в порядке публикации.
+    """
+    recipe = apps.get_model('recipes', 'Recipe')
+    recipe_change = apps.get_model('recipes', 'RecipeChange')
+    recipe.objects.update(updated_at=F('pub_date'))
+
+    changes = (
+        recipe_change(recipe_id=recipe_id, action='created')
+        for recipe_id in recipe.objects.order_by('pub_date', 'id')
+        .values_list('id', flat=True).iterator()
+    )
+    while batch := list(islice(changes, constants.BULK_CREATE_BATCH_SIZE)):
+        recipe_change.objects.bulk_create(batch)
+    recipe_change.objects.update(created_at=Subquery(
+        recipe.objects.filter(id=OuterRef('recipe_id')).values('pub_date')
+    ))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0007_recipe_ordering_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RecipeChange',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('recipe_id', models.BigIntegerField(verbose_name='Рецепт')),
+                ('action', models.CharField(choices=[('created', 'Создан'), ('updated', 'Изменён'), ('deleted', 'Удалён')], max_length=7, verbose_name='Действие')),
+                ('created_at', models.DateTimeField(auto_now_add=True, db_index=True, verbose_name='Время изменения')),
+            ],
+            options={
+                'verbose_name': 'Изменение рецепта',
+                'verbose_name_plural': 'Изменения рецептов',
+                'ordering': ('id',),
+            },
+        ),
+        migrations.AddField(
+            model_name='recipe',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, verbose_name='Дата изменения'),
+        ),
+        migrations.RunPython(fill_changes, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 4.2.7 on 2026-10-19 10:30
+
+from django.db import migrations, models
+
+import foodgram_backend.db
+from foodgram_backend.db import AddIndexConcurrently
+
+
+class Migration(migrations.Migration):
+
+    atomic = False
+
+    dependencies = [
+        ('recipes', '0010_recipe_ordering_newest'),
+    ]
+
+    operations = [
+        # Существующие записи получают txid = 0 и остаются в журнале
+        # раньше новых в прежнем порядке id.
+        migrations.AddField(
+            model_name='recipechange',
+            name='txid',
+            field=foodgram_backend.db.CommitOrderField(default=0, editable=False, verbose_name='Транзакция'),
+            preserve_default=False,
+        ),
+        migrations.AlterModelOptions(
+            name='recipechange',
+            options={'ordering': ('txid', 'id'), 'verbose_name': 'Изменение рецепта', 'verbose_name_plural': 'Изменения рецептов'},
+        ),
+        AddIndexConcurrently(
+            model_name='recipechange',
+            index=models.Index(fields=['txid', 'id'], name='recipe_change_position_idx'),
+        ),
+    ]
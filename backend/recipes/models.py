@@ -1,12 +1,18 @@
 """
 Модели рецептов.
 """
+import heapq
 
-from django.db import models
+from django.db import connections, models, router
+from django.db.models import Exists, OuterRef, Prefetch, Q, Window
+from django.db.models.expressions import RawSQL
+from django.db.models.functions import RowNumber
 from django.core.validators import MinValueValidator, MaxValueValidator
 
-from users.models import CustomUser
+from users.models import CustomUser, Subscription
 from foodgram_backend import constants
+from foodgram_backend.db import (CommitOrderField, CounterFieldsMixin,
+                                 UserLinkQuerySet)
 from colorfield.fields import ColorField
 
 
@@ -90,7 +96,65 @@ class Tag(models.Model):
         return self.name
 
 
-class Recipe(models.Model):
+class RecipeQuerySet(models.QuerySet):
+    """QuerySet рецептов."""
+
+    def for_user(self, user, fields=None):
+        """
+        Рецепты со всеми данными для RecipeListSerializer.
+
+        Теги и ингредиенты загружаются prefetch-запросами, флаги
+        is_favorited, is_in_shopping_cart и is_subscribed автора
+        вычисляются подзапросами EXISTS, поэтому сериализация
+        страницы не обращается к базе данных.
+
+        fields — имена полей сериализатора, которые будут отданы
+        (None — все): для остальных полей не загружаются столбцы
+        и не выполняются соединения, prefetch-запросы и подзапросы.
+        """
+        def requested(name):
+            return fields is None or name in fields
+
+        queryset = self
+        if fields is not None:
+            columns = {
+                field.name for field in self.model._meta.concrete_fields
+            }
+            queryset = queryset.only('id', *(columns & set(fields)))
+        if requested('tags'):
+            queryset = queryset.prefetch_related('tags')
+        if requested('ingredients'):
+            queryset = queryset.prefetch_related('recipe__ingredient')
+
+        if not user.is_authenticated:
+            if requested('author'):
+                queryset = queryset.select_related('author')
+            return queryset
+        if requested('is_favorited'):
+            queryset = queryset.annotate(
+                is_favorited=Exists(FavoriteRecipe.objects.filter(
+                    user=user, recipe=OuterRef('pk')
+                ))
+            )
+        if requested('is_in_shopping_cart'):
+            queryset = queryset.annotate(
+                is_in_shopping_cart=Exists(ShoppingCart.objects.filter(
+                    user=user, recipe=OuterRef('pk')
+                ))
+            )
+        if requested('author'):
+            queryset = queryset.prefetch_related(Prefetch(
+                'author',
+                queryset=CustomUser.objects.annotate(
+                    is_subscribed=Exists(Subscription.objects.filter(
+                        user=user, following=OuterRef('pk')
+                    ))
+                )
+            ))
+        return queryset
+
+
+class Recipe(CounterFieldsMixin, models.Model):
     """
     Модель рецепта.
 
@@ -108,20 +172,33 @@ class Recipe(models.Model):
         Ингредиенты, использованные в рецепте.
     image : models.ImageField
         Изображение рецепта.
+    image_variants : dict
+        Уменьшенные копии изображения по размерам и форматам,
+        заполняются в фоне (recipes/images.py).
     cooking_time : int
         Время приготовления по рецепту.
     pub_date : DateTimeField
         Дата и время создания рецепта.
+    updated_at : DateTimeField
+        Дата и время последнего изменения рецепта.
+    favorites_count : int
+        Сколько раз рецепт добавлен в избранное.
+    in_carts_count : int
+        Сколько раз рецепт добавлен в список покупок.
 
     Мета:
     -----
         verbose_name (str): удобочитаемое имя модели.
         порядок (список): порядок модели по умолчанию.
+        индексы (список): индексы для ленты, профиля автора и
+            сортировок по популярности и времени приготовления.
 
     Методы:
     -------
         __str__(): возвращает имя рецепта в виде строки.
     """
+    counter_fields = ('favorites_count', 'in_carts_count')
+
     name = models.CharField(
         max_length=constants.RECIPE_NAME_LENGTH,
         verbose_name='Наименование'
@@ -148,6 +225,12 @@ class Recipe(models.Model):
         upload_to='recipes/',
         verbose_name='Изображение',
     )
+    image_variants = models.JSONField(
+        default=dict,
+        blank=True,
+        editable=False,
+        verbose_name='Варианты изображения'
+    )
     cooking_time = models.PositiveSmallIntegerField(
         verbose_name='Время приготовления',
         validators=[
@@ -165,12 +248,46 @@ class Recipe(models.Model):
         auto_now_add=True,
         verbose_name='Дата публикации'
     )
+    updated_at = models.DateTimeField(
+        auto_now=True,
+        verbose_name='Дата изменения'
+    )
+    favorites_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name='В избранном'
+    )
+    in_carts_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name='В списках покупок'
+    )
+
+    objects = RecipeQuerySet.as_manager()
 
     class Meta:
         """Метакласс модели рецепта."""
-        ordering = ['pub_date']
+        ordering = ['-pub_date']
         verbose_name = 'Рецепт'
         verbose_name_plural = 'Рецепты'
+        indexes = [
+            models.Index(
+                fields=['-pub_date'],
+                name='recipe_pub_date_idx'
+            ),
+            models.Index(
+                fields=['author', '-pub_date'],
+                name='recipe_author_pub_date_idx'
+            ),
+            models.Index(
+                fields=['-favorites_count', '-pub_date'],
+                name='recipe_popular_idx'
+            ),
+            models.Index(
+                fields=['cooking_time', '-pub_date'],
+                name='recipe_quickest_idx'
+            ),
+        ]
 
     def __str__(self):
         """Возвращает название рецепта."""
@@ -253,7 +370,7 @@ class CommonUserRecipeModel(models.Model):
 
     Мета:
     -----
-    ordering: Порядок модели по умолчанию `name`
+    ordering: Порядок модели по умолчанию `user`
     constraints Ограничения модели, уникальны `user`, `recipe`.
     """
     user = models.ForeignKey(
@@ -268,14 +385,18 @@ class CommonUserRecipeModel(models.Model):
         verbose_name='Рецепт'
     )
 
+    objects = UserLinkQuerySet.as_manager()
+
+    target_field = 'recipe'
+
     class Meta:
         """Класс Meta для модели CommonUserRecipe."""
         abstract = True
-        ordering = ['name']
+        ordering = ['user']
         constraints = [
             models.UniqueConstraint(
                 fields=['user', 'recipe'],
-                name='unique_user_recipe',
+                name='%(class)s_unique_user_recipe',
                 violation_error_message=(
                     {'user, recipe': 'Поля дожный быть уникальны'}
                 )
@@ -287,7 +408,9 @@ class FavoriteRecipe(CommonUserRecipeModel):
     """
     Унаследован от CommonUserRecipeModel.
     """
-    class Meta:
+    counter_field = 'favorites_count'
+
+    class Meta(CommonUserRecipeModel.Meta):
         """Класс Meta для модели FavoriteRecipe."""
         verbose_name = 'Избранный рецепт'
         verbose_name_plural = 'Избранные рецепты'
@@ -301,7 +424,9 @@ class ShoppingCart(CommonUserRecipeModel):
     """
     Унаследован от CommonUserRecipeModel.
     """
-    class Meta:
+    counter_field = 'in_carts_count'
+
+    class Meta(CommonUserRecipeModel.Meta):
         """Класс Meta для модели ShoppingCard."""
         verbose_name = 'Список покупок'
         verbose_name_plural = 'Списки покупок'
@@ -309,3 +434,384 @@ class ShoppingCart(CommonUserRecipeModel):
 
     def __str__(self):
         return f'Список покупок {self.user}'
+
+
+class FeedEntryQuerySet(models.QuerySet):
+    """
+    QuerySet лент подписок.
+
+    Новый рецепт сразу записывается в ленты подписчиков автора
+    (fan-out-on-write), поэтому чтение ленты не перебирает подписки.
+    Рецепты авторов, у которых больше FEED_FANOUT_MAX_FOLLOWERS
+    подписчиков, не раскладываются: их лента читает напрямую из
+    рецептов (fan-out-on-read), иначе одна публикация писала бы
+    слишком много строк.
+    """
+
+    def fan_out(self, recipe_ids) -> int:
+        """
+        Добавляет рецепты в ленты подписчиков их авторов одним
+        INSERT ... SELECT ... ON CONFLICT DO NOTHING.
+
+        Returns:
+            int: Количество добавленных записей.
+        """
+        if not recipe_ids:
+            return 0
+        connection = connections[router.db_for_write(self.model)]
+        quote_name = connection.ops.quote_name
+
+        def table(model):
+            return quote_name(model._meta.db_table)
+
+        def column(model, name):
+            return quote_name(model._meta.get_field(name).column)
+
+        feed_columns = ', '.join(
+            column(self.model, name)
+            for name in ('user', 'recipe', 'author', 'pub_date')
+        )
+        recipe_author = f'r.{column(Recipe, "author")}'
+        sql = (
+            f'INSERT INTO {table(self.model)} ({feed_columns}) '
+            f'SELECT s.{column(Subscription, "user")}, '
+            f'r.{column(Recipe, "id")}, {recipe_author}, '
+            f'r.{column(Recipe, "pub_date")} '
+            f'FROM {table(Recipe)} r '
+            f'JOIN {table(Subscription)} s '
+            f'ON s.{column(Subscription, "following")} = {recipe_author} '
+            f'JOIN {table(CustomUser)} a '
+            f'ON a.{column(CustomUser, "id")} = {recipe_author} '
+            f'WHERE r.{column(Recipe, "id")} IN '
+            f'({", ".join(["%s"] * len(recipe_ids))}) '
+            f'AND a.{column(CustomUser, "followers_count")} <= %s '
+            'ON CONFLICT DO NOTHING'
+        )
+        with connection.cursor() as cursor:
+            cursor.execute(
+                sql, [*recipe_ids, constants.FEED_FANOUT_MAX_FOLLOWERS]
+            )
+            return cursor.rowcount
+
+    def backfill(self, user, author_ids) -> list:
+        """
+        Добавляет в ленту пользователя последние FEED_BACKFILL_SIZE
+        рецептов каждого из авторов, на которых он подписался.
+        """
+        recipes = (
+            Recipe.objects
+            .filter(
+                author_id__in=author_ids,
+                author__followers_count__lte=(
+                    constants.FEED_FANOUT_MAX_FOLLOWERS
+                ),
+            )
+            .annotate(position=Window(
+                RowNumber(),
+                partition_by='author',
+                order_by=('-pub_date', '-id'),
+            ))
+            .filter(position__lte=constants.FEED_BACKFILL_SIZE)
+            .values_list('id', 'author_id', 'pub_date')
+        )
+        return self.bulk_create(
+            [
+                self.model(
+                    user=user,
+                    recipe_id=recipe_id,
+                    author_id=author_id,
+                    pub_date=pub_date,
+                )
+                for recipe_id, author_id, pub_date in recipes
+            ],
+            batch_size=constants.BULK_CREATE_BATCH_SIZE,
+            ignore_conflicts=True,
+        )
+
+    def timeline(self, user, before=None, limit=constants.FEED_PAGE_MAX_SIZE):
+        """
+        Позиции (pub_date, id) рецептов ленты пользователя от новых
+        к старым, не больше limit, строго после позиции before.
+
+        Оба запроса — к записям ленты и к рецептам авторов без
+        fan-out — ограничены limit и идут по индексам, поэтому
+        стоимость чтения зависит от размера страницы, а не от числа
+        подписок.
+        """
+        def after(queryset, id_field):
+            if before is None:
+                return queryset
+            pub_date, pk = before
+            return queryset.filter(
+                Q(pub_date__lt=pub_date)
+                | Q(pub_date=pub_date, **{f'{id_field}__lt': pk})
+            )
+
+        entries = (
+            after(self.filter(user=user), 'recipe_id')
+            .order_by('-pub_date', '-recipe_id')
+            .values_list('pub_date', 'recipe_id')[:limit]
+        )
+        popular_authors = Subscription.objects.filter(
+            user=user,
+            following__followers_count__gt=(
+                constants.FEED_FANOUT_MAX_FOLLOWERS
+            ),
+        ).values('following_id')
+        pulled = (
+            after(Recipe.objects.filter(author__in=popular_authors), 'id')
+            .order_by('-pub_date', '-id')
+            .values_list('pub_date', 'id')[:limit]
+        )
+
+        positions, seen = [], set()
+        for position in heapq.merge(entries, pulled, reverse=True):
+            # Рецепт мог попасть в ленту, пока подписчиков было меньше.
+            if position[1] in seen:
+                continue
+            seen.add(position[1])
+            positions.append(position)
+            if len(positions) == limit:
+                break
+        return positions
+
+
+class FeedEntry(models.Model):
+    """
+    Запись ленты подписок: рецепт автора, на которого подписан
+    пользователь.
+
+    Атрибуты:
+    ---------
+    user : CustomUser
+        Владелец ленты.
+    recipe : Recipe
+        Рецепт.
+    author : CustomUser
+        Автор рецепта; нужен, чтобы при отписке удалить его рецепты.
+    pub_date : DateTimeField
+        Дата публикации рецепта, порядок ленты.
+    """
+    user = models.ForeignKey(
+        CustomUser,
+        on_delete=models.CASCADE,
+        related_name='feed_entries',
+        db_index=False,
+        verbose_name='Пользователь'
+    )
+    recipe = models.ForeignKey(
+        Recipe,
+        on_delete=models.CASCADE,
+        related_name='feed_entries',
+        verbose_name='Рецепт'
+    )
+    author = models.ForeignKey(
+        CustomUser,
+        on_delete=models.CASCADE,
+        related_name='+',
+        db_index=False,
+        verbose_name='Автор рецепта'
+    )
+    pub_date = models.DateTimeField(verbose_name='Дата публикации')
+
+    objects = FeedEntryQuerySet.as_manager()
+
+    class Meta:
+        """Класс Meta модели FeedEntry."""
+        verbose_name = 'Запись ленты'
+        verbose_name_plural = 'Записи лент'
+        indexes = [
+            models.Index(
+                fields=['user', '-pub_date', '-recipe'],
+                name='feed_user_pub_date_idx'
+            ),
+            models.Index(
+                fields=['user', 'author'],
+                name='feed_user_author_idx'
+            ),
+        ]
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'recipe'],
+                name='unique_feed_entry'
+            )
+        ]
+
+    def __str__(self):
+        return f'{self.recipe} в ленте {self.user}'
+
+
+class RecipeSignature(models.Model):
+    """
+    MinHash-сигнатура множества ингредиентов и тегов рецепта.
+
+    Атрибуты:
+    ---------
+    recipe : Recipe
+        Рецепт.
+    signature : bytes
+        MINHASH_PERMUTATIONS значений uint32.
+    """
+    recipe = models.OneToOneField(
+        Recipe,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='signature',
+        verbose_name='Рецепт'
+    )
+    signature = models.BinaryField(verbose_name='Сигнатура')
+
+    class Meta:
+        """Класс Meta модели RecipeSignature."""
+        verbose_name = 'Сигнатура рецепта'
+        verbose_name_plural = 'Сигнатуры рецептов'
+
+    def __str__(self):
+        return f'Сигнатура {self.recipe_id}'
+
+
+class RecipeBucket(models.Model):
+    """
+    Корзина LSH: хеш одной полосы сигнатуры рецепта. Рецепты с общей
+    корзиной — кандидаты в похожие.
+
+    Атрибуты:
+    ---------
+    recipe : Recipe
+        Рецепт.
+    bucket : int
+        Хеш полосы вместе с её номером.
+    """
+    recipe = models.ForeignKey(
+        Recipe,
+        on_delete=models.CASCADE,
+        related_name='buckets',
+        verbose_name='Рецепт'
+    )
+    bucket = models.BigIntegerField(verbose_name='Корзина')
+
+    class Meta:
+        """Класс Meta модели RecipeBucket."""
+        verbose_name = 'Корзина LSH'
+        verbose_name_plural = 'Корзины LSH'
+        indexes = [
+            models.Index(
+                fields=['bucket', 'recipe'],
+                name='recipe_bucket_idx'
+            ),
+        ]
+
+    def __str__(self):
+        return f'{self.recipe_id} в корзине {self.bucket}'
+
+
+class RecipeChangeQuerySet(models.QuerySet):
+    """
+    QuerySet журнала изменений.
+
+    Журнал читается по позициям (txid, id). id выдаётся при вставке,
+    и транзакция с меньшим id может закоммититься позже, поэтому
+    курсор по id перескочил бы её. Отдаются только записи транзакций,
+    которые уже не могут измениться: на PostgreSQL — с txid меньше
+    pg_snapshot_xmin текущего снимка. Новые записи всегда появляются
+    после отданных, и курсор ничего не пропускает. Долгая транзакция
+    задерживает выдачу записей, пока не завершится.
+    """
+
+    def committed(self):
+        """Записи завершённых транзакций по позициям."""
+        queryset = self.order_by('txid', 'id')
+        if connections[self.db].vendor == 'postgresql':
+            queryset = queryset.filter(txid__lt=RawSQL(
+                'pg_snapshot_xmin(pg_current_snapshot())::text::bigint',
+                [],
+                output_field=models.BigIntegerField(),
+            ))
+        return queryset
+
+    def after(self, position):
+        """Записи после позиции (txid, id)."""
+        txid, change_id = position
+        return self.filter(Q(txid__gt=txid) | Q(txid=txid, id__gt=change_id))
+
+    def last_position(self):
+        """Позиция последней записи или (0, 0) для пустого журнала."""
+        return self.committed().values_list('txid', 'id').last() or (0, 0)
+
+
+class RecipeChange(models.Model):
+    """
+    Запись журнала изменений рецептов для синхронизации клиентов.
+
+    Журнал хранит и удаления, поэтому recipe_id — не внешний ключ:
+    запись переживает рецепт.
+
+    Атрибуты:
+    ---------
+    recipe_id : int
+        Идентификатор рецепта.
+    action : str
+        Создан, изменён или удалён.
+    created_at : DateTimeField
+        Время изменения.
+    txid : int
+        Номер транзакции, записавшей изменение, заполняется базой;
+        вместе с id задаёт позицию записи в журнале.
+    """
+    CREATED = 'created'
+    UPDATED = 'updated'
+    DELETED = 'deleted'
+    ACTIONS = (
+        (CREATED, 'Создан'),
+        (UPDATED, 'Изменён'),
+        (DELETED, 'Удалён'),
+    )
+
+    recipe_id = models.BigIntegerField(verbose_name='Рецепт')
+    action = models.CharField(
+        max_length=constants.RECIPE_CHANGE_ACTION_LENGTH,
+        choices=ACTIONS,
+        verbose_name='Действие'
+    )
+    created_at = models.DateTimeField(
+        auto_now_add=True,
+        db_index=True,
+        verbose_name='Время изменения'
+    )
+    txid = CommitOrderField(verbose_name='Транзакция')
+
+    objects = RecipeChangeQuerySet.as_manager()
+
+    class Meta:
+        """Класс Meta модели RecipeChange."""
+        ordering = ('txid', 'id')
+        verbose_name = 'Изменение рецепта'
+        verbose_name_plural = 'Изменения рецептов'
+        indexes = [
+            models.Index(
+                fields=['txid', 'id'],
+                name='recipe_change_position_idx'
+            ),
+        ]
+
+    def __str__(self):
+        return f'{self.recipe_id}: {self.action}'
+
+    @staticmethod
+    def cursor(position) -> str:
+        """Курсор клиента для позиции (txid, id)."""
+        return '{}-{}'.format(*position)
+
+    @staticmethod
+    def parse_cursor(value):
+        """
+        Позиция (txid, id) по курсору. Числовой курсор — id записи,
+        выданный до появления txid: у таких записей txid равен 0.
+
+        Returns:
+            tuple | None: Позиция или None для некорректного курсора.
+        """
+        txid, separator, change_id = value.rpartition('-')
+        if not change_id.isdigit() or separator and not txid.isdigit():
+            return None
+        return int(txid or 0), int(change_id)
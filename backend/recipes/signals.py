@@ -0,0 +1,115 @@
+"""
+Денормализованные счётчики и ленты подписок при изменениях через ORM:
+админка, каскадное удаление пользователя или рецепта, shell.
+
+Быстрые пути API сигналов не отправляют и обновляют счётчики сами:
+связи меняются одним запросом INSERT/DELETE ... RETURNING
+(UserLinkQuerySet), пакет рецептов создаётся через bulk_create.
+"""
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from foodgram_backend.db import update_counter
+from users.models import CustomUser, Subscription
+from .models import FavoriteRecipe, FeedEntry, Recipe, ShoppingCart
+
+
+def link_key(instance):
+    """Пара (пользователь, цель) связи."""
+    return instance.user_id, getattr(instance, f'{instance.target_field}_id')
+
+
+def deleted_with(origin, model, pk):
+    """
+    Удаляется ли объект `pk` модели `model` вместе со связью:
+    тогда его счётчик обновлять незачем.
+    """
+    return isinstance(origin, model) and origin.pk == pk
+
+
+@receiver(pre_save, sender=FavoriteRecipe)
+@receiver(pre_save, sender=ShoppingCart)
+@receiver(pre_save, sender=Subscription)
+def link_changing(sender, instance, raw=False, **kwargs):
+    """Запоминает прежние пользователя и цель изменяемой связи."""
+    instance._previous_key = None
+    if raw or instance._state.adding:
+        return
+    target = f'{sender.target_field}_id'
+    instance._previous_key = sender.objects.filter(
+        pk=instance.pk
+    ).values_list('user_id', target).first()
+
+
+@receiver(post_save, sender=FavoriteRecipe)
+@receiver(post_save, sender=ShoppingCart)
+@receiver(post_save, sender=Subscription)
+def link_saved(sender, instance, created, raw=False, **kwargs):
+    """Новая связь или связь, перенесённая на другую цель."""
+    if raw:
+        return
+    user_id, target_id = link_key(instance)
+    previous = getattr(instance, '_previous_key', None)
+    if not created:
+        if previous is None or previous == (user_id, target_id):
+            return
+        sender.objects.links_removed(previous[0], [previous[1]])
+    sender.objects.links_added(instance.user, [target_id])
+
+
+@receiver(post_delete, sender=FavoriteRecipe)
+@receiver(post_delete, sender=ShoppingCart)
+@receiver(post_delete, sender=Subscription)
+def link_deleted(sender, instance, origin=None, **kwargs):
+    """Связь удалена из админки или каскадом вместе с пользователем."""
+    user_id, target_id = link_key(instance)
+    target_model = sender._meta.get_field(sender.target_field).related_model
+    if deleted_with(origin, target_model, target_id):
+        return
+    sender.objects.links_removed(user_id, [target_id])
+
+
+@receiver(pre_save, sender=Recipe)
+def recipe_changing(sender, instance, raw=False, update_fields=None,
+                    **kwargs):
+    """Запоминает прежнего автора, если он может измениться."""
+    instance._previous_author_id = None
+    if raw or instance._state.adding:
+        return
+    if update_fields is not None and 'author' not in update_fields:
+        return
+    instance._previous_author_id = sender.objects.filter(
+        pk=instance.pk
+    ).values_list('author_id', flat=True).first()
+
+
+@receiver(post_save, sender=Recipe)
+def recipe_saved(sender, instance, created, raw=False, **kwargs):
+    """
+    Новый рецепт увеличивает recipes_count автора и попадает в ленты
+    подписчиков; смена автора переносит счётчик и записи лент.
+    """
+    if raw:
+        return
+    previous = getattr(instance, '_previous_author_id', None)
+    if not created:
+        if previous is None or previous == instance.author_id:
+            return
+        update_counter(
+            CustomUser.objects.filter(pk=previous), 'recipes_count', -1
+        )
+        FeedEntry.objects.filter(recipe=instance).delete()
+    update_counter(
+        CustomUser.objects.filter(pk=instance.author_id), 'recipes_count', 1
+    )
+    FeedEntry.objects.fan_out([instance.pk])
+
+
+@receiver(post_delete, sender=Recipe)
+def recipe_deleted(sender, instance, origin=None, **kwargs):
+    """Удалённый рецепт уменьшает recipes_count автора."""
+    if deleted_with(origin, CustomUser, instance.author_id):
+        return
+    update_counter(
+        CustomUser.objects.filter(pk=instance.author_id), 'recipes_count', -1
+    )
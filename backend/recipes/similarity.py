@@ -0,0 +1,189 @@
+"""
+Поиск похожих рецептов по MinHash-сигнатурам.
+
+Рецепт описывается множеством токенов: его ингредиентов и тегов.
+Сигнатура — минимумы MINHASH_PERMUTATIONS хеш-функций по токенам,
+доля совпавших позиций двух сигнатур оценивает коэффициент Жаккара
+их множеств. Сигнатура делится на LSH_BANDS полос, хеш каждой полосы
+хранится в RecipeBucket: похожие рецепты почти наверняка совпадают
+хотя бы в одной полосе, поэтому сравниваются только рецепты с общими
+корзинами, а не все пары.
+
+Сигнатуры считаются пакетами матричными операциями numpy.
+"""
+import numpy as np
+from django.db import transaction
+from django.db.models import Count
+
+from foodgram_backend.constants import (BULK_CREATE_BATCH_SIZE, LSH_BANDS,
+                                        LSH_MAX_CANDIDATES,
+                                        MINHASH_PERMUTATIONS, MINHASH_SEED)
+from foodgram_backend.db import on_commit_batch
+from .models import Recipe, RecipeBucket, RecipeIngredient, RecipeSignature
+
+# Хеш-функции вида (a * x + b) mod p с простым p = 2^31 - 1:
+# произведение помещается в uint64, значение — в uint32.
+PRIME = np.uint64((1 << 31) - 1)
+_random = np.random.default_rng(MINHASH_SEED)
+A = _random.integers(1, PRIME, MINHASH_PERMUTATIONS, dtype=np.uint64)
+B = _random.integers(0, PRIME, MINHASH_PERMUTATIONS, dtype=np.uint64)
+BAND_MULTIPLIER = np.uint64(0x100000001B3)
+
+
+def recipe_tokens(recipe_ids):
+    """
+    Токены рецептов: 2 * id для ингредиентов и 2 * id + 1 для тегов.
+
+    Returns:
+        tuple: Идентификаторы рецептов с токенами, массив токенов,
+        сгруппированный по рецептам, и начала групп.
+    """
+    recipe_tags = Recipe.tags.through
+    pairs = [
+        (recipe_id, 2 * ingredient_id)
+        for recipe_id, ingredient_id in RecipeIngredient.objects
+        .filter(recipe_id__in=recipe_ids)
+        .values_list('recipe_id', 'ingredient_id')
+    ] + [
+        (recipe_id, 2 * tag_id + 1)
+        for recipe_id, tag_id in recipe_tags.objects
+        .filter(recipe_id__in=recipe_ids)
+        .values_list('recipe_id', 'tag_id')
+    ]
+    pairs = np.array(pairs, dtype=np.uint64).reshape(-1, 2)
+    pairs = pairs[np.argsort(pairs[:, 0], kind='stable')]
+    recipes, starts = np.unique(pairs[:, 0], return_index=True)
+    return recipes.astype(np.int64), pairs[:, 1], starts
+
+
+def signatures(tokens, starts):
+    """
+    MinHash-сигнатуры групп токенов.
+
+    Returns:
+        np.ndarray: Матрица uint32 размером
+        (число групп, MINHASH_PERMUTATIONS).
+    """
+    hashes = (A[:, None] * tokens[None, :] + B[:, None]) % PRIME
+    return np.minimum.reduceat(hashes, starts, axis=1).T.astype(np.uint32)
+
+
+def band_keys(signature_matrix):
+    """
+    Ключи корзин LSH: хеш каждой полосы сигнатуры вместе с номером
+    полосы, чтобы корзины разных полос не совпадали.
+
+    Returns:
+        np.ndarray: Матрица int64 размером (число сигнатур, LSH_BANDS).
+    """
+    bands = signature_matrix.reshape(
+        len(signature_matrix), LSH_BANDS, -1
+    ).astype(np.uint64)
+    keys = np.broadcast_to(
+        np.arange(1, LSH_BANDS + 1, dtype=np.uint64), bands.shape[:2]
+    ).copy()
+    for row in range(bands.shape[2]):
+        keys = keys * BAND_MULTIPLIER + bands[:, :, row]
+    return keys.view(np.int64)
+
+
+def update_signatures(recipe_ids):
+    """
+    Пересчитывает сигнатуры и корзины рецептов. Удалённые рецепты
+    и рецепты без ингредиентов и тегов остаются без сигнатуры.
+
+    Returns:
+        int: Количество сохранённых сигнатур.
+    """
+    recipe_ids = list(recipe_ids)
+    recipes, tokens, starts = recipe_tokens(recipe_ids)
+    signature_matrix = signatures(tokens, starts) if len(recipes) else None
+    with transaction.atomic():
+        RecipeSignature.objects.filter(recipe_id__in=recipe_ids).delete()
+        RecipeBucket.objects.filter(recipe_id__in=recipe_ids).delete()
+        if signature_matrix is None:
+            return 0
+        # Рецепт могли удалить, пока считалась сигнатура.
+        existing = set(
+            Recipe.objects.filter(id__in=recipes.tolist())
+            .values_list('id', flat=True)
+        )
+        rows = [
+            row for row in zip(
+                recipes.tolist(),
+                signature_matrix,
+                band_keys(signature_matrix).tolist(),
+            )
+            if row[0] in existing
+        ]
+        RecipeSignature.objects.bulk_create(
+            [
+                RecipeSignature(
+                    recipe_id=recipe_id, signature=signature.tobytes()
+                )
+                for recipe_id, signature, _ in rows
+            ],
+            batch_size=BULK_CREATE_BATCH_SIZE,
+        )
+        RecipeBucket.objects.bulk_create(
+            (
+                RecipeBucket(recipe_id=recipe_id, bucket=bucket)
+                for recipe_id, _, buckets in rows
+                for bucket in buckets
+            ),
+            batch_size=BULK_CREATE_BATCH_SIZE,
+        )
+    return len(rows)
+
+
+def recipes_changed(recipe_ids):
+    """
+    Пересчитывает сигнатуры рецептов после коммита транзакции одним
+    пакетом на все рецепты, изменённые в ней.
+    """
+    on_commit_batch(update_signatures, recipe_ids)
+
+
+def similar(recipe_id, limit):
+    """
+    Похожие рецепты по оценке коэффициента Жаккара.
+
+    Кандидаты — рецепты с общими корзинами LSH, не больше
+    LSH_MAX_CANDIDATES с наибольшим числом общих корзин; они
+    ранжируются сравнением сигнатур.
+
+    Returns:
+        list: Пары (id рецепта, сходство) по убыванию сходства.
+    """
+    signature = (
+        RecipeSignature.objects
+        .filter(recipe_id=recipe_id)
+        .values_list('signature', flat=True)
+        .first()
+    )
+    if signature is None:
+        return []
+    signature = np.frombuffer(bytes(signature), dtype=np.uint32)
+    candidates = (
+        RecipeBucket.objects
+        .filter(bucket__in=band_keys(signature[None, :])[0].tolist())
+        .exclude(recipe_id=recipe_id)
+        .values('recipe_id')
+        .annotate(shared=Count('id'))
+        .order_by('-shared', '-recipe_id')
+        .values_list('recipe_id', flat=True)[:LSH_MAX_CANDIDATES]
+    )
+    rows = list(
+        RecipeSignature.objects
+        .filter(recipe_id__in=list(candidates))
+        .values_list('recipe_id', 'signature')
+    )
+    if not rows:
+        return []
+    ids = np.array([recipe_id for recipe_id, _ in rows], dtype=np.int64)
+    matrix = np.frombuffer(
+        b''.join(bytes(value) for _, value in rows), dtype=np.uint32
+    ).reshape(len(rows), -1)
+    scores = (matrix == signature).mean(axis=1)
+    order = np.lexsort((-ids, -scores))[:limit]
+    return list(zip(ids[order].tolist(), scores[order].tolist()))
@@ -0,0 +1,134 @@
+"""
+Тесты денормализованных счётчиков, лент подписок и похожих рецептов.
+"""
+from unittest import mock
+
+from django.test import TestCase
+from django.urls import reverse
+
+from users.models import CustomUser, Subscription
+from .models import FavoriteRecipe, FeedEntry, Recipe, ShoppingCart
+
+
+def make_user(name, **extra):
+    return CustomUser.objects.create_user(
+        email=f'{name}@example.com',
+        username=name,
+        first_name=name,
+        last_name=name,
+        password='password',
+        **extra
+    )
+
+
+def make_recipe(author, name='Рецепт'):
+    return Recipe.objects.create(
+        author=author,
+        name=name,
+        text='Текст',
+        image='recipes/images/recipe.png',
+        cooking_time=10,
+    )
+
+
+class CounterTests(TestCase):
+    """Счётчики при изменениях через админку и каскадное удаление."""
+
+    def setUp(self):
+        self.admin = make_user('admin', is_staff=True, is_superuser=True)
+        self.author = make_user('author')
+        self.reader = make_user('reader')
+        self.client.force_login(self.admin)
+
+    def counters(self, obj, *fields):
+        obj.refresh_from_db(fields=fields)
+        return tuple(getattr(obj, field) for field in fields)
+
+    def test_recipe_created_and_deleted(self):
+        Subscription.objects.create(user=self.reader, following=self.author)
+        recipe = make_recipe(self.author)
+        self.assertEqual(self.counters(self.author, 'recipes_count'), (1,))
+        self.assertTrue(
+            FeedEntry.objects.filter(user=self.reader, recipe=recipe).exists()
+        )
+        self.client.post(
+            reverse('admin:recipes_recipe_delete', args=[recipe.pk]),
+            {'post': 'yes'}
+        )
+        self.assertEqual(self.counters(self.author, 'recipes_count'), (0,))
+
+    def test_recipe_author_changed(self):
+        recipe = make_recipe(self.author)
+        recipe.author = self.reader
+        recipe.save()
+        self.assertEqual(self.counters(self.author, 'recipes_count'), (0,))
+        self.assertEqual(self.counters(self.reader, 'recipes_count'), (1,))
+
+    def test_admin_links(self):
+        recipe = make_recipe(self.author)
+        for model in (FavoriteRecipe, ShoppingCart):
+            self.client.post(
+                reverse(f'admin:recipes_{model._meta.model_name}_add'),
+                {'user': self.reader.pk, 'recipe': recipe.pk}
+            )
+        self.client.post(
+            reverse('admin:users_subscription_add'),
+            {'user': self.reader.pk, 'following': self.author.pk}
+        )
+        self.assertEqual(
+            self.counters(recipe, 'favorites_count', 'in_carts_count'),
+            (1, 1)
+        )
+        self.assertEqual(self.counters(self.author, 'followers_count'), (1,))
+        self.assertTrue(FeedEntry.objects.filter(user=self.reader).exists())
+
+        for model in (FavoriteRecipe, ShoppingCart, Subscription):
+            opts = model._meta
+            changelist = f'admin:{opts.app_label}_{opts.model_name}_changelist'
+            self.client.post(
+                reverse(changelist),
+                {
+                    'action': 'delete_selected',
+                    '_selected_action': list(
+                        model.objects.values_list('pk', flat=True)
+                    ),
+                    'post': 'yes',
+                }
+            )
+        self.assertEqual(
+            self.counters(recipe, 'favorites_count', 'in_carts_count'),
+            (0, 0)
+        )
+        self.assertEqual(self.counters(self.author, 'followers_count'), (0,))
+        self.assertFalse(FeedEntry.objects.filter(user=self.reader).exists())
+
+    def test_user_cascade(self):
+        recipe = make_recipe(self.author)
+        FavoriteRecipe.objects.add(self.reader, recipe.pk)
+        ShoppingCart.objects.add(self.reader, recipe.pk)
+        Subscription.objects.add(self.reader, self.author.pk)
+        self.client.post(
+            reverse('admin:users_customuser_delete', args=[self.reader.pk]),
+            {'post': 'yes'}
+        )
+        self.assertFalse(CustomUser.objects.filter(pk=self.reader.pk).exists())
+        self.assertEqual(
+            self.counters(recipe, 'favorites_count', 'in_carts_count'),
+            (0, 0)
+        )
+        self.assertEqual(self.counters(self.author, 'followers_count'), (0,))
+
+
+class SimilarityTests(TestCase):
+    """Пересчёт сигнатур похожих рецептов."""
+
+    def test_batched_per_transaction(self):
+        author = make_user('author')
+        with mock.patch('recipes.similarity.update_signatures') as update:
+            with self.captureOnCommitCallbacks(execute=True):
+                first = make_recipe(author, 'Первый')
+                second = make_recipe(author, 'Второй')
+                ids = [first.pk, second.pk]
+                first.delete()
+                self.assertFalse(update.called)
+        update.assert_called_once_with(ids)
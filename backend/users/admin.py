@@ -39,6 +39,8 @@ class CustomUserAdmin(UserAdmin):
         'first_name',
         'last_name',
         'is_staff',
+        'recipes_count',
+        'followers_count',
     )
     list_filter = (
         'email',
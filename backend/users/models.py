@@ -1,15 +1,17 @@
 """
 Модуль управления пользователями.
 """
+from django.apps import apps
 from django.contrib.auth.models import AbstractUser
 from django.db import models
 from django.contrib.auth.validators import UnicodeUsernameValidator
 from django.db.models import Q, F
 
 from foodgram_backend import constants
+from foodgram_backend.db import CounterFieldsMixin, UserLinkQuerySet
 
 
-class CustomUser(AbstractUser):
+class CustomUser(CounterFieldsMixin, AbstractUser):
     """
     Модель пользователя.
 
@@ -25,6 +27,10 @@ class CustomUser(AbstractUser):
         Адрес электронной почты пользователя.
     пароль : str
         Пароль пользователя.
+    recipes_count : int
+        Количество рецептов пользователя.
+    followers_count : int
+        Количество подписчиков пользователя.
 
     Мета:
     -----
@@ -37,6 +43,7 @@ class CustomUser(AbstractUser):
     """
     USERNAME_FIELD = 'email'
     REQUIRED_FIELDS = ['username', 'first_name', 'last_name']
+    counter_fields = ('recipes_count', 'followers_count')
 
     first_name = models.CharField(
         max_length=constants.FIRST_NAME_MAX_LENGTH,
@@ -67,6 +74,16 @@ class CustomUser(AbstractUser):
         verbose_name='Пароль',
         help_text='Введите пароль пользователя',
     )
+    recipes_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name='Рецептов'
+    )
+    followers_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name='Подписчиков'
+    )
 
     class Meta:
         """Класс Meta модели User."""
@@ -78,6 +95,25 @@ class CustomUser(AbstractUser):
         return self.username
 
 
+class SubscriptionQuerySet(UserLinkQuerySet):
+    """
+    QuerySet подписок.
+
+    Вместе с подпиской меняется лента подписчика: при подписке в неё
+    добавляются последние рецепты автора, при отписке — удаляются.
+    """
+
+    @staticmethod
+    def _feed():
+        return apps.get_model('recipes', 'FeedEntry').objects
+
+    def _linked(self, user, target_ids):
+        self._feed().backfill(user, target_ids)
+
+    def _unlinked(self, user, target_ids):
+        self._feed().filter(user=user, author_id__in=target_ids).delete()
+
+
 class Subscription(models.Model):
     """
     Представляет подписку между подписчиком и автором.
@@ -95,6 +131,7 @@ class Subscription(models.Model):
     verbose_name (str): удобочитаемое имя модели.
     порядок (список): порядок модели по умолчанию.
     ограничения (список): ограничения модели.
+    индексы (список): индекс для выборки подписчиков автора.
 
     Методы:
     -------
@@ -113,11 +150,22 @@ class Subscription(models.Model):
         verbose_name='На кого подписан автор',
     )
 
+    objects = SubscriptionQuerySet.as_manager()
+
+    target_field = 'following'
+    counter_field = 'followers_count'
+
     class Meta:
         """Класс Meta модели Subscription."""
         verbose_name = 'Подписка'
         verbose_name_plural = 'Подписки'
         ordering = ['user']
+        indexes = [
+            models.Index(
+                fields=['following', 'user'],
+                name='subscription_following_idx'
+            ),
+        ]
         constraints = [
             models.UniqueConstraint(
                 fields=['user', 'following'],